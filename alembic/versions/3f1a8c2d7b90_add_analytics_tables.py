@@ -0,0 +1,56 @@
+"""add analytics_events and performance_metrics tables
+
+Revision ID: 3f1a8c2d7b90
+Revises: fe62c9c355bc
+Create Date: 2026-10-17 09:12:41.517302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1a8c2d7b90'
+down_revision: Union[str, Sequence[str], None] = 'fe62c9c355bc'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('analytics_events',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('event_type', sa.String(length=32), nullable=False),
+    sa.Column('name', sa.String(length=512), nullable=False),
+    sa.Column('session_id', sa.String(length=128), nullable=True),
+    sa.Column('user_ip', sa.String(length=45), nullable=True),
+    sa.Column('country', sa.String(length=100), nullable=True),
+    sa.Column('city', sa.String(length=100), nullable=True),
+    sa.Column('data', sa.JSON(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_analytics_events_id'), 'analytics_events', ['id'], unique=False)
+    op.create_index(op.f('ix_analytics_events_created_at'), 'analytics_events', ['created_at'], unique=False)
+    op.create_table('performance_metrics',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('endpoint', sa.String(length=512), nullable=False),
+    sa.Column('response_time', sa.Float(), nullable=False),
+    sa.Column('status_code', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_performance_metrics_id'), 'performance_metrics', ['id'], unique=False)
+    op.create_index(op.f('ix_performance_metrics_created_at'), 'performance_metrics', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_performance_metrics_created_at'), table_name='performance_metrics')
+    op.drop_index(op.f('ix_performance_metrics_id'), table_name='performance_metrics')
+    op.drop_table('performance_metrics')
+    op.drop_index(op.f('ix_analytics_events_created_at'), table_name='analytics_events')
+    op.drop_index(op.f('ix_analytics_events_id'), table_name='analytics_events')
+    op.drop_table('analytics_events')
@@ -0,0 +1,45 @@
+"""add analytics_rollups table
+
+Revision ID: 7b2e9d4c1a63
+Revises: 3f1a8c2d7b90
+Create Date: 2026-10-17 11:38:05.204117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7b2e9d4c1a63'
+down_revision: Union[str, Sequence[str], None] = '3f1a8c2d7b90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('analytics_rollups',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('period', sa.String(length=8), nullable=False),
+    sa.Column('bucket_start', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('page_views', sa.Integer(), nullable=False),
+    sa.Column('conversions', sa.JSON(), nullable=True),
+    sa.Column('requests', sa.Integer(), nullable=False),
+    sa.Column('errors', sa.Integer(), nullable=False),
+    sa.Column('latency', sa.JSON(), nullable=True),
+    sa.Column('sessions', sa.LargeBinary(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('period', 'bucket_start', name='uq_analytics_rollups_period_bucket')
+    )
+    op.create_index(op.f('ix_analytics_rollups_id'), 'analytics_rollups', ['id'], unique=False)
+    op.create_index(op.f('ix_analytics_rollups_bucket_start'), 'analytics_rollups', ['bucket_start'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_analytics_rollups_bucket_start'), table_name='analytics_rollups')
+    op.drop_index(op.f('ix_analytics_rollups_id'), table_name='analytics_rollups')
+    op.drop_table('analytics_rollups')
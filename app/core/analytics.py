@@ -1,46 +1,152 @@
 import json
 import time
 import hashlib
-from datetime import datetime, timedelta
+import threading
 from typing import Dict, List, Optional, Any
-from collections import defaultdict, Counter
-import geoip2.database
-import geoip2.errors
+from collections import defaultdict
 import os
 import logging
 
+from app.core.event_store import TimeBucketedEventStore, StringDictionary, EndpointMetricsStore, EndpointStats
+from app.core.geoip import GeoIPResolver
+from app.core.sessions import SessionStore
+from app.core.rollups import RollupEngine
+from app.core.realtime import RealTimeCounters
+from app.core.journeys import JourneyEngine
+from app.core.geo_cube import GeoCube, GeoCell
+from app.core.query_cache import QueryCache
+from app.core.route_classifier import normalize_page
+
 logger = logging.getLogger(__name__)
 
+# Event type codes used in the columnar event store
+EVENT_PAGE_VIEW = 0
+EVENT_CONVERSION = 1
+EVENT_USER_BEHAVIOR = 2
+
+# Latency percentiles reported by the performance analytics
+LATENCY_QUANTILES = (0.5, 0.9, 0.95, 0.99, 0.999)
+
 class AnalyticsTracker:
     """Advanced analytics tracker for user behavior and performance metrics"""
     
     def __init__(self):
-        self.events: List[Dict] = []
+        retention_hours = int(os.getenv("ANALYTICS_RETENTION_HOURS", "168"))
+        max_events_per_minute = int(os.getenv("ANALYTICS_MAX_EVENTS_PER_MINUTE", "5000"))
+        
+        # Page, conversion type, action and endpoint names are dictionary-encoded
+        self.names = StringDictionary()
+        self.event_store = TimeBucketedEventStore(
+            schema={
+                "kind": "b",
+                "name": "i",
+                "session_id": None,
+                "user_ip": None,
+                "geo_data": None,
+                "extra": None
+            },
+            retention_hours=retention_hours,
+            max_events_per_minute=max_events_per_minute
+        )
+        self.performance_store = EndpointMetricsStore(
+            retention_hours=int(os.getenv("ANALYTICS_PERFORMANCE_RETENTION_HOURS", "24")),
+            max_endpoints_per_minute=int(os.getenv("ANALYTICS_MAX_ENDPOINTS_PER_MINUTE", "200"))
+        )
         self.page_views: Dict[str, int] = defaultdict(int)
-        self.user_sessions: Dict[str, Dict] = {}
+        session_idle_timeout = int(os.getenv("ANALYTICS_SESSION_IDLE_TIMEOUT", "1800"))
+        
+        # Per-second counters for the real-time dashboard; a session counts as
+        # active until it would be evicted as idle
+        self.realtime = RealTimeCounters(
+            window=int(os.getenv("ANALYTICS_REALTIME_WINDOW", "3600")),
+            session_window=session_idle_timeout
+        )
+        self.sessions = SessionStore(
+            idle_timeout=session_idle_timeout,
+            max_sessions=int(os.getenv("ANALYTICS_MAX_SESSIONS", "50000")),
+            retention_hours=retention_hours,
+            on_activity=self.realtime.record_session_seen,
+            on_overflow=self.realtime.record_session_evicted
+        )
         self.conversions: Dict[str, int] = defaultdict(int)
-        self.performance_metrics: List[Dict] = []
-        self.geographic_data: Dict[str, Dict] = defaultdict(lambda: {"count": 0, "sessions": 0})
-        
-        # Initialize GeoIP database if available
-        self.geoip_reader = None
-        try:
-            geoip_path = os.getenv("GEOIP_DATABASE_PATH", "GeoLite2-City.mmdb")
-            logger.info(f"GEOIP_DATABASE_PATH environment variable: {geoip_path}")
-            logger.info(f"File exists: {os.path.exists(geoip_path)}")
-            if os.path.exists(geoip_path):
-                self.geoip_reader = geoip2.database.Reader(geoip_path)
-                logger.info("GeoIP database loaded successfully")
-            else:
-                logger.warning(f"GeoIP database file not found at: {geoip_path}")
-        except Exception as e:
-            logger.warning(f"Could not load GeoIP database: {e}")
+        
+        # Page transitions and a bounded trie of paths; sessions only keep a cursor
+        self.journeys = JourneyEngine(
+            max_depth=int(os.getenv("ANALYTICS_JOURNEY_MAX_DEPTH", "8")),
+            max_nodes=int(os.getenv("ANALYTICS_JOURNEY_MAX_NODES", "5000")),
+            retention_hours=retention_hours
+        )
+        
+        # Page views, conversions and unique sessions by (hour, country, city)
+        self.geo_cube = GeoCube(
+            self.names,
+            retention_hours=retention_hours,
+            session_precision=int(os.getenv("ANALYTICS_GEO_HLL_PRECISION", "10"))
+        )
+        
+        # Hourly and daily rollups for trend queries, persisted by the sink
+        self.rollups = RollupEngine(
+            hourly_retention_days=int(os.getenv("ANALYTICS_HOURLY_ROLLUP_DAYS", "7")),
+            daily_retention_days=int(os.getenv("ANALYTICS_DAILY_ROLLUP_DAYS", "400"))
+        )
+        
+        # GeoIP lookups go through a cache; most traffic is repeat visitors
+        self.geoip = GeoIPResolver(
+            database_path=os.getenv("GEOIP_DATABASE_PATH", "GeoLite2-City.mmdb"),
+            cache_size=int(os.getenv("GEOIP_CACHE_SIZE", "10000")),
+            ttl=int(os.getenv("GEOIP_CACHE_TTL", "3600")),
+            negative_ttl=int(os.getenv("GEOIP_NEGATIVE_CACHE_TTL", "600"))
+        )
+        
+        # Write-behind persistence, attached at application startup
+        self.sink = None
+        
+        # Counters shared between worker processes, attached when running several
+        self.shared = None
+        
+        # Dashboard queries are memoized for a few seconds; every ingested page
+        # view, conversion or behavior event bumps the version, which invalidates them
+        self.version = 0
+        # Guards the counters above and the version: events are recorded both by the
+        # ingestion consumer's worker thread and by the /track endpoints
+        self._lock = threading.Lock()
+        self.query_cache = QueryCache(
+            ttl=float(os.getenv("ANALYTICS_QUERY_CACHE_TTL", "5")),
+            max_entries=int(os.getenv("ANALYTICS_QUERY_CACHE_SIZE", "256"))
+        )
+    
+    def attach_sink(self, sink):
+        """Persist tracked events and metrics through a write-behind sink"""
+        self.sink = sink
+        with self._lock:
+            self.version += 1
+    
+    def attach_shared_store(self, shared):
+        """Publish counters to a store shared by all workers and read totals from it"""
+        self.shared = shared
+        with self._lock:
+            self.version += 1
+    
+    def _persist_event(self, timestamp: float, event_type: str, name: str, session_id: str,
+                       user_ip: str, geo_data: Optional[Dict], data: Optional[Any]):
+        """Queue an event row for the database (never blocks on it)"""
+        if self.sink is None:
+            return
+        self.sink.enqueue("events", {
+            "event_type": event_type,
+            "name": name,
+            "session_id": session_id,
+            "user_ip": user_ip,
+            "country": geo_data.get("country") if geo_data else None,
+            "city": geo_data.get("city") if geo_data else None,
+            "data": data,
+            "created_at": self.sink.timestamp(timestamp)
+        })
     
     def track_page_view(self, page: str, user_ip: str, user_agent: str, 
-                       referrer: Optional[str] = None, session_id: Optional[str] = None):
+                       referrer: Optional[str] = None, session_id: Optional[str] = None,
+                       timestamp: Optional[float] = None):
         """Track a page view with geographic and user data"""
-        timestamp = datetime.utcnow()
-        
         # Get geographic data
         geo_data = self._get_geographic_data(user_ip)
         
@@ -48,49 +154,50 @@ class AnalyticsTracker:
         if not session_id:
             session_id = self._generate_session_id(user_ip, user_agent)
         
+        self._record_page_view(timestamp or time.time(), page, user_ip, geo_data, session_id, referrer)
+    
+    def _record_page_view(self, now: float, page: str, user_ip: str, geo_data: Optional[Dict],
+                          session_id: str, referrer: Optional[str]):
+        """Record a page view whose location and session are already resolved"""
+        # One key per page template, whether or not counters are shared between workers
+        page = normalize_page(page)
+        page_id = self.names.encode(page)
+        
         # Track page view
-        self.page_views[page] += 1
+        with self._lock:
+            self.version += 1
+            self.page_views[page] += 1
         
         # Track geographic data
         if geo_data:
-            country = geo_data.get("country", "Unknown")
-            city = geo_data.get("city", "Unknown")
-            location_key = f"{country}/{city}"
-            self.geographic_data[location_key]["count"] += 1
+            self.geo_cube.record_page_view(now, geo_data, session_id)
         
         # Track session
-        if session_id not in self.user_sessions:
-            self.user_sessions[session_id] = {
-                "start_time": timestamp,
-                "pages": [],
-                "user_ip": user_ip,
-                "user_agent": user_agent,
-                "geo_data": geo_data
-            }
-        
-        self.user_sessions[session_id]["pages"].append({
-            "page": page,
-            "timestamp": timestamp,
-            "referrer": referrer
-        })
+        session = self.sessions.record_page_view(session_id, now, user_ip, geo_data)
+        session.journey = self.journeys.record_page_view(session.journey, page_id, now)
+        self.rollups.record_page_view(now, session_id)
+        self.realtime.record_page_view(now)
+        if self.shared is not None:
+            self.shared.add("page_view:" + page, now)
+            self.shared.touch_session(session_id, now)
         
         # Log event
-        event = {
-            "type": "page_view",
-            "timestamp": timestamp.isoformat(),
-            "page": page,
-            "user_ip": user_ip,
-            "session_id": session_id,
-            "geo_data": geo_data,
-            "referrer": referrer
-        }
-        self.events.append(event)
+        self.event_store.append(
+            now,
+            kind=EVENT_PAGE_VIEW,
+            name=page_id,
+            session_id=session_id,
+            user_ip=user_ip,
+            geo_data=geo_data,
+            extra=referrer
+        )
+        self._persist_event(now, "page_view", page, session_id, user_ip, geo_data,
+                            {"referrer": referrer} if referrer else None)
     
     def track_conversion(self, conversion_type: str, user_ip: str, user_agent: str,
-                        session_id: Optional[str] = None, metadata: Optional[Dict] = None):
+                        session_id: Optional[str] = None, metadata: Optional[Dict] = None,
+                        timestamp: Optional[float] = None):
         """Track conversion events (contact, booking, review, etc.)"""
-        timestamp = datetime.utcnow()
-        
         # Get geographic data
         geo_data = self._get_geographic_data(user_ip)
         
@@ -98,96 +205,120 @@ class AnalyticsTracker:
         if not session_id:
             session_id = self._generate_session_id(user_ip, user_agent)
         
+        self._record_conversion(timestamp or time.time(), conversion_type, user_ip, geo_data, session_id, metadata)
+    
+    def _record_conversion(self, now: float, conversion_type: str, user_ip: str, geo_data: Optional[Dict],
+                           session_id: str, metadata: Optional[Dict]):
+        """Record a conversion whose location and session are already resolved"""
         # Track conversion
-        self.conversions[conversion_type] += 1
+        with self._lock:
+            self.version += 1
+            self.conversions[conversion_type] += 1
+        self.rollups.record_conversion(now, conversion_type, session_id)
+        self.realtime.record_conversion(now)
+        if self.shared is not None:
+            self.shared.add("conversion:" + conversion_type, now)
+            self.shared.touch_session(session_id, now)
         
         # Track geographic data for conversions
         if geo_data:
-            country = geo_data.get("country", "Unknown")
-            city = geo_data.get("city", "Unknown")
-            location_key = f"{country}/{city}"
-            if "conversions" not in self.geographic_data[location_key]:
-                self.geographic_data[location_key]["conversions"] = defaultdict(int)
-            self.geographic_data[location_key]["conversions"][conversion_type] += 1
+            self.geo_cube.record_conversion(now, geo_data, conversion_type, session_id)
         
         # Log event
-        event = {
-            "type": "conversion",
-            "timestamp": timestamp.isoformat(),
-            "conversion_type": conversion_type,
-            "user_ip": user_ip,
-            "session_id": session_id,
-            "geo_data": geo_data,
-            "metadata": metadata or {}
-        }
-        self.events.append(event)
+        self.event_store.append(
+            now,
+            kind=EVENT_CONVERSION,
+            name=self.names.encode(conversion_type),
+            session_id=session_id,
+            user_ip=user_ip,
+            geo_data=geo_data,
+            extra=metadata or {}
+        )
+        self._persist_event(now, "conversion", conversion_type, session_id, user_ip, geo_data, metadata or {})
     
     def track_performance(self, endpoint: str, response_time: float, status_code: int,
-                         user_ip: str, user_agent: str):
+                         user_ip: str, user_agent: str, timestamp: Optional[float] = None):
         """Track API performance metrics"""
-        timestamp = datetime.utcnow()
-        
-        performance_data = {
-            "timestamp": timestamp.isoformat(),
-            "endpoint": endpoint,
-            "response_time": response_time,
-            "status_code": status_code,
-            "user_ip": user_ip,
-            "user_agent": user_agent
-        }
-        
-        self.performance_metrics.append(performance_data)
-        
-        # Keep only last 1000 performance records
-        if len(self.performance_metrics) > 1000:
-            self.performance_metrics = self.performance_metrics[-1000:]
+        now = timestamp or time.time()
+        # No version bump: every request is tracked, dashboard reads included,
+        # so performance figures rely on the cache TTL alone
+        self.performance_store.add(now, self.names.encode(endpoint), response_time, status_code)
+        self.rollups.record_request(now, response_time, status_code)
+        self.realtime.record_request(now, response_time, status_code)
+        if self.shared is not None:
+            self.shared.add("request:" + endpoint, now)
+            self.shared.add("request_time:" + endpoint, now, response_time)
+            if status_code >= 400:
+                self.shared.add("request_error:" + endpoint, now)
+        
+        if self.sink is not None:
+            self.sink.enqueue("performance", {
+                "endpoint": endpoint,
+                "response_time": response_time,
+                "status_code": status_code,
+                "created_at": self.sink.timestamp(now)
+            })
     
     def track_user_behavior(self, action: str, user_ip: str, user_agent: str,
-                           session_id: Optional[str] = None, data: Optional[Dict] = None):
+                           session_id: Optional[str] = None, data: Optional[Dict] = None,
+                           timestamp: Optional[float] = None):
         """Track user behavior events"""
-        timestamp = datetime.utcnow()
-        
         # Generate session ID if not provided
         if not session_id:
             session_id = self._generate_session_id(user_ip, user_agent)
         
-        event = {
-            "type": "user_behavior",
-            "timestamp": timestamp.isoformat(),
-            "action": action,
-            "user_ip": user_ip,
-            "session_id": session_id,
-            "data": data or {}
-        }
-        self.events.append(event)
+        self._record_user_behavior(timestamp or time.time(), action, user_ip, session_id, data)
+    
+    def _record_user_behavior(self, now: float, action: str, user_ip: str, session_id: str,
+                              data: Optional[Dict]):
+        """Record a behavior event whose session is already resolved"""
+        with self._lock:
+            self.version += 1
+        self.event_store.append(
+            now,
+            kind=EVENT_USER_BEHAVIOR,
+            name=self.names.encode(action),
+            session_id=session_id,
+            user_ip=user_ip,
+            geo_data=None,
+            extra=data or {}
+        )
+        self._persist_event(now, "user_behavior", action, session_id, user_ip, None, data or {})
+        if self.shared is not None:
+            self.shared.add("action:" + action, now)
+    
+    def track_batch(self, events: List[Dict[str, Any]], user_ip: str, user_agent: str,
+                    session_id: Optional[str] = None) -> int:
+        """Track a batch of page view, conversion and behavior events from one visitor.
+        
+        The visitor's location and fallback session ID are resolved once for
+        the whole batch instead of once per event.
+        """
+        default_session_id = session_id or self._generate_session_id(user_ip, user_agent)
+        geo_data = None
+        geo_resolved = False
+        now = time.time()
+        
+        for event in events:
+            event_type = event["type"]
+            event_session_id = event.get("session_id") or default_session_id
+            if event_type == "behavior":
+                self._record_user_behavior(now, event["action"], user_ip, event_session_id, event.get("data"))
+                continue
+            if not geo_resolved:
+                geo_data = self._get_geographic_data(user_ip)
+                geo_resolved = True
+            if event_type == "page_view":
+                self._record_page_view(now, event["page"], user_ip, geo_data, event_session_id, event.get("referrer"))
+            elif event_type == "conversion":
+                self._record_conversion(now, event["conversion_type"], user_ip, geo_data, event_session_id,
+                                        event.get("metadata"))
+        
+        return len(events)
     
     def _get_geographic_data(self, ip_address: str) -> Optional[Dict]:
         """Get geographic data for an IP address"""
-        logger.info(f"Getting geographic data for IP: {ip_address}")
-        logger.info(f"GeoIP reader available: {self.geoip_reader is not None}")
-        
-        if not self.geoip_reader or ip_address in ["127.0.0.1", "localhost", "unknown"]:
-            logger.info(f"Skipping geographic lookup for IP: {ip_address} (localhost or no reader)")
-            return None
-        
-        try:
-            response = self.geoip_reader.city(ip_address)
-            geo_data = {
-                "country": response.country.name,
-                "country_code": response.country.iso_code,
-                "city": response.city.name,
-                "latitude": response.location.latitude,
-                "longitude": response.location.longitude,
-                "timezone": response.location.time_zone
-            }
-            logger.info(f"Found geographic data for {ip_address}: {geo_data}")
-            return geo_data
-        except (geoip2.errors.AddressNotFoundError, geoip2.errors.GeoIP2Error):
-            logger.warning(f"Address not found in GeoIP database: {ip_address}")
-            return None
-        except Exception as e:
-            logger.error(f"Error getting geographic data for {ip_address}: {e}")
-            return None
+        return self.geoip.lookup(ip_address)
     
     def _generate_session_id(self, user_ip: str, user_agent: str) -> str:
         """Generate a unique session ID"""
@@ -196,47 +327,51 @@ class AnalyticsTracker:
     
     def get_analytics_summary(self, hours: int = 24) -> Dict[str, Any]:
         """Get comprehensive analytics summary"""
-        cutoff_time = datetime.utcnow() - timedelta(hours=hours)
-        
-        # Filter events by time
-        recent_events = [e for e in self.events 
-                        if datetime.fromisoformat(e["timestamp"]) >= cutoff_time]
-        
-        # Page views
-        page_views = defaultdict(int)
-        for event in recent_events:
-            if event["type"] == "page_view":
-                page_views[event["page"]] += 1
-        
-        # Conversions
-        conversions = defaultdict(int)
-        for event in recent_events:
-            if event["type"] == "conversion":
-                conversions[event["conversion_type"]] += 1
-        
-        # Geographic data
+        return self._cached_query("summary", hours, self._compute_analytics_summary)
+    
+    def _compute_analytics_summary(self, hours: int) -> Dict[str, Any]:
+        if self.shared is not None:
+            # Totals across all workers
+            page_views = self._shared_counts("page_view:", hours)
+            conversions = self._shared_counts("conversion:", hours)
+        else:
+            # Only the minute buckets inside the window are visited, and only
+            # their encoded (type, name) columns are read
+            page_views = {}
+            conversions = {}
+            for (kind, code), count in self.event_store.count_by(hours, ("kind", "name")).items():
+                if kind == EVENT_PAGE_VIEW:
+                    page_views[self.names.decode(code)] = count
+                elif kind == EVENT_CONVERSION:
+                    conversions[self.names.decode(code)] = count
+        
+        # Geographic data from the hourly geo cube
         geo_summary = {}
-        for location, data in self.geographic_data.items():
-            if data["count"] > 0:
-                geo_summary[location] = {
-                    "page_views": data["count"],
-                    "conversions": dict(data.get("conversions", {})),
-                    "conversion_rate": self._calculate_conversion_rate(data["count"], data.get("conversions", {}))
+        for key, cell in self.geo_cube.window(hours).items():
+            if cell.page_views > 0:
+                country, city = self.geo_cube.location_name(key)
+                geo_summary[f"{country}/{city}"] = {
+                    "page_views": cell.page_views,
+                    "conversions": dict(cell.conversions),
+                    "conversion_rate": self._calculate_conversion_rate(cell.page_views, cell.conversions)
                 }
         
         # Performance metrics
-        recent_performance = [p for p in self.performance_metrics 
-                            if datetime.fromisoformat(p["timestamp"]) >= cutoff_time]
-        
-        avg_response_time = 0
-        if recent_performance:
-            avg_response_time = sum(p["response_time"] for p in recent_performance) / len(recent_performance)
+        if self.shared is not None:
+            endpoint_totals = self._shared_endpoint_totals(hours).values()
+            total_requests = sum(totals["count"] for totals in endpoint_totals)
+            total_errors = sum(totals["errors"] for totals in endpoint_totals)
+            total_time = sum(totals["time"] for totals in endpoint_totals)
+        else:
+            overall = EndpointStats()
+            for stats in self.performance_store.window(hours).values():
+                overall.merge(stats)
+            total_requests, total_errors, total_time = overall.count, overall.errors, overall.total_time
         
         # User sessions
-        active_sessions = [s for s in self.user_sessions.values() 
-                          if s["start_time"] >= cutoff_time]
+        session_summary = self.sessions.get_window_summary(hours)
         
-        return {
+        return self._with_scope({
             "time_period": f"Last {hours} hours",
             "total_page_views": sum(page_views.values()),
             "total_conversions": sum(conversions.values()),
@@ -245,178 +380,277 @@ class AnalyticsTracker:
             "conversions": dict(conversions),
             "geographic_data": geo_summary,
             "performance": {
-                "avg_response_time": round(avg_response_time, 3),
-                "total_requests": len(recent_performance),
-                "error_rate": self._calculate_error_rate(recent_performance)
+                "avg_response_time": round(total_time / total_requests, 3) if total_requests else 0,
+                "total_requests": total_requests,
+                "error_rate": self._calculate_error_rate(total_errors, total_requests)
             },
             "sessions": {
-                "total_sessions": len(active_sessions),
-                "avg_session_duration": self._calculate_avg_session_duration(active_sessions),
-                "avg_pages_per_session": self._calculate_avg_pages_per_session(active_sessions)
+                "total_sessions": session_summary["total_sessions"],
+                "avg_session_duration": session_summary["avg_session_duration"],
+                "avg_pages_per_session": session_summary["avg_pages_per_session"]
             },
             "top_pages": sorted(page_views.items(), key=lambda x: x[1], reverse=True)[:10],
             "top_conversions": sorted(conversions.items(), key=lambda x: x[1], reverse=True)[:10],
             "top_locations": sorted(geo_summary.items(), key=lambda x: x[1]["page_views"], reverse=True)[:10]
-        }
+        }, ["geographic_data", "top_locations", "sessions"])
     
     def get_geographic_analytics(self, hours: int = 24) -> Dict[str, Any]:
         """Get detailed geographic analytics"""
-        cutoff_time = datetime.utcnow() - timedelta(hours=hours)
-        
-        # Filter events by time
-        recent_events = [e for e in self.events 
-                        if datetime.fromisoformat(e["timestamp"]) >= cutoff_time]
-        
-        # Group by country
-        country_data = defaultdict(lambda: {
-            "page_views": 0,
-            "conversions": defaultdict(int),
-            "cities": defaultdict(int),
-            "sessions": set()
-        })
-        
-        for event in recent_events:
-            if event.get("geo_data"):
-                country = event["geo_data"]["country"]
-                city = event["geo_data"]["city"]
-                session_id = event.get("session_id")
-                
-                country_data[country]["sessions"].add(session_id)
-                
-                if event["type"] == "page_view":
-                    country_data[country]["page_views"] += 1
-                    country_data[country]["cities"][city] += 1
-                elif event["type"] == "conversion":
-                    conversion_type = event["conversion_type"]
-                    country_data[country]["conversions"][conversion_type] += 1
+        return self._cached_query("geographic", hours, self._compute_geographic_analytics)
+    
+    def _compute_geographic_analytics(self, hours: int) -> Dict[str, Any]:
+        # Merge the hourly geo cube cells of the window by country
+        country_data = {}
+        for key, cell in self.geo_cube.window(hours).items():
+            country, city = self.geo_cube.location_name(key)
+            data = country_data.get(country)
+            if data is None:
+                data = country_data[country] = {"totals": GeoCell(self.geo_cube.session_precision), "cities": {}}
+            data["totals"].merge(cell)
+            if cell.page_views:
+                data["cities"][city] = data["cities"].get(city, 0) + cell.page_views
         
         # Format data for response
         formatted_data = {}
         for country, data in country_data.items():
+            totals = data["totals"]
             formatted_data[country] = {
-                "page_views": data["page_views"],
-                "unique_sessions": len(data["sessions"]),
-                "conversions": dict(data["conversions"]),
-                "conversion_rate": self._calculate_conversion_rate(data["page_views"], data["conversions"]),
+                "page_views": totals.page_views,
+                "unique_sessions": totals.sessions.count(),
+                "conversions": dict(totals.conversions),
+                "conversion_rate": self._calculate_conversion_rate(totals.page_views, totals.conversions),
                 "top_cities": sorted(data["cities"].items(), key=lambda x: x[1], reverse=True)[:5]
             }
         
-        return {
+        return self._with_scope({
             "time_period": f"Last {hours} hours",
             "countries": formatted_data,
             "total_countries": len(formatted_data),
             "top_countries": sorted(formatted_data.items(), 
                                   key=lambda x: x[1]["page_views"], reverse=True)[:10]
-        }
+        }, ["countries", "total_countries", "top_countries"])
     
     def get_performance_analytics(self, hours: int = 24) -> Dict[str, Any]:
         """Get detailed performance analytics"""
-        cutoff_time = datetime.utcnow() - timedelta(hours=hours)
-        
-        # Filter performance metrics by time
-        recent_performance = [p for p in self.performance_metrics 
-                            if datetime.fromisoformat(p["timestamp"]) >= cutoff_time]
+        return self._cached_query("performance", hours, self._compute_performance_analytics)
+    
+    def _compute_performance_analytics(self, hours: int) -> Dict[str, Any]:
+        endpoint_stats = self.performance_store.window(hours)
+        shared_totals = self._shared_endpoint_totals(hours) if self.shared is not None else None
         
-        if not recent_performance:
+        if not endpoint_stats and not shared_totals:
             return {"error": "No performance data available"}
         
-        # Group by endpoint
-        endpoint_stats = defaultdict(lambda: {
-            "count": 0,
-            "total_time": 0,
-            "status_codes": defaultdict(int),
-            "response_times": []
-        })
-        
-        for metric in recent_performance:
-            endpoint = metric["endpoint"]
-            endpoint_stats[endpoint]["count"] += 1
-            endpoint_stats[endpoint]["total_time"] += metric["response_time"]
-            endpoint_stats[endpoint]["status_codes"][metric["status_code"]] += 1
-            endpoint_stats[endpoint]["response_times"].append(metric["response_time"])
-        
-        # Calculate statistics for each endpoint
+        # Calculate statistics for each endpoint from its latency histogram
         endpoint_analytics = {}
+        overall = EndpointStats()
         for endpoint, stats in endpoint_stats.items():
-            avg_time = stats["total_time"] / stats["count"]
-            response_times = sorted(stats["response_times"])
-            median_time = response_times[len(response_times) // 2]
+            overall.merge(stats)
+            histogram = stats.histogram
+            percentiles = histogram.quantiles(LATENCY_QUANTILES)
+            name = "other" if endpoint == EndpointMetricsStore.OVERFLOW_KEY else self.names.decode(endpoint)
             
-            endpoint_analytics[endpoint] = {
-                "request_count": stats["count"],
-                "avg_response_time": round(avg_time, 3),
-                "median_response_time": round(median_time, 3),
-                "min_response_time": round(min(stats["response_times"]), 3),
-                "max_response_time": round(max(stats["response_times"]), 3),
-                "error_rate": self._calculate_endpoint_error_rate(stats["status_codes"]),
-                "status_codes": dict(stats["status_codes"])
+            endpoint_analytics[name] = {
+                "request_count": stats.count,
+                "avg_response_time": round(histogram.mean, 3),
+                "median_response_time": round(percentiles["p50"], 3),
+                "min_response_time": round(histogram.min, 3),
+                "max_response_time": round(histogram.max, 3),
+                "percentiles": {label: round(value, 3) for label, value in percentiles.items()},
+                "error_rate": self._calculate_endpoint_error_rate(stats.status_codes),
+                "status_codes": dict(stats.status_codes)
             }
         
-        # Overall statistics
-        all_response_times = [m["response_time"] for m in recent_performance]
-        overall_avg = sum(all_response_times) / len(all_response_times)
-        
-        return {
+        overall_percentiles = overall.histogram.quantiles(LATENCY_QUANTILES)
+        total_requests = overall.count
+        overall_avg_response_time = round(overall.histogram.mean, 3)
+        
+        if shared_totals is not None:
+            # Counts and averages cover every worker; latency distributions are
+            # only kept per process, so percentiles come from this worker's sample
+            for name, totals in shared_totals.items():
+                entry = endpoint_analytics.setdefault(name, {})
+                entry["request_count"] = int(totals["count"])
+                entry["avg_response_time"] = round(totals["time"] / totals["count"], 3) if totals["count"] else 0
+                entry["error_rate"] = self._calculate_error_rate(totals["errors"], totals["count"])
+            total_requests = int(sum(totals["count"] for totals in shared_totals.values()))
+            total_time = sum(totals["time"] for totals in shared_totals.values())
+            overall_avg_response_time = round(total_time / total_requests, 3) if total_requests else 0
+        
+        return self._with_scope({
             "time_period": f"Last {hours} hours",
-            "total_requests": len(recent_performance),
-            "overall_avg_response_time": round(overall_avg, 3),
+            "total_requests": total_requests,
+            "overall_avg_response_time": overall_avg_response_time,
+            "overall_percentiles": {label: round(value, 3) for label, value in overall_percentiles.items()} if overall.count else {},
             "endpoints": endpoint_analytics,
             "top_slowest_endpoints": sorted(endpoint_analytics.items(), 
                                           key=lambda x: x[1]["avg_response_time"], reverse=True)[:10],
             "top_most_used_endpoints": sorted(endpoint_analytics.items(), 
                                             key=lambda x: x[1]["request_count"], reverse=True)[:10]
-        }
+        }, ["overall_percentiles", "endpoints.*.percentiles", "endpoints.*.median_response_time",
+            "endpoints.*.min_response_time", "endpoints.*.max_response_time", "endpoints.*.status_codes"])
     
     def get_user_behavior_analytics(self, hours: int = 24) -> Dict[str, Any]:
         """Get user behavior analytics"""
-        cutoff_time = datetime.utcnow() - timedelta(hours=hours)
-        
-        # Filter events by time
-        recent_events = [e for e in self.events 
-                        if datetime.fromisoformat(e["timestamp"]) >= cutoff_time]
-        
-        # User behavior events
-        behavior_events = [e for e in recent_events if e["type"] == "user_behavior"]
-        
-        # Group by action
-        action_counts = Counter(e["action"] for e in behavior_events)
-        
-        # Session analysis
-        active_sessions = [s for s in self.user_sessions.values() 
-                          if s["start_time"] >= cutoff_time]
-        
-        # Calculate session metrics
-        session_durations = []
-        pages_per_session = []
-        
-        for session in active_sessions:
-            if len(session["pages"]) > 1:
-                duration = (session["pages"][-1]["timestamp"] - session["pages"][0]["timestamp"]).total_seconds()
-                session_durations.append(duration)
-            pages_per_session.append(len(session["pages"]))
-        
-        # User journey analysis
-        user_journeys = defaultdict(list)
-        for session in active_sessions:
-            if len(session["pages"]) > 1:
-                journey = [p["page"] for p in session["pages"]]
-                user_journeys[tuple(journey)].append(session)
+        return self._cached_query("user_behavior", hours, self._compute_user_behavior_analytics)
+    
+    def _compute_user_behavior_analytics(self, hours: int) -> Dict[str, Any]:
+        if self.shared is not None:
+            action_counts = self._shared_counts("action:", hours)
+        else:
+            # Group behavior events by action, reading only the (type, name) columns
+            action_counts = {
+                self.names.decode(code): count
+                for (kind, code), count in self.event_store.count_by(hours, ("kind", "name")).items()
+                if kind == EVENT_USER_BEHAVIOR
+            }
         
-        return {
+        # User journeys from the path trie and transition counts
+        now = time.time()
+        total_journeys, top_journeys = self.journeys.top_journeys(hours, now)
+        views, entries, transitions = self.journeys.transition_summary(hours, now)
+        
+        next_pages = {}
+        drop_offs = []
+        for page_id, page_views in views.most_common():
+            summary = self.journeys.summarize_next_pages(page_id, views, transitions)
+            if len(next_pages) < 10:
+                next_pages[self.names.decode(page_id)] = self._format_next_pages(summary)
+            drop_offs.append({
+                "page": self.names.decode(page_id),
+                "views": page_views,
+                "exits": summary["exits"],
+                "exit_rate": round(summary["exit_probability"] * 100, 2)
+            })
+        
+        return self._with_scope({
             "time_period": f"Last {hours} hours",
-            "total_behavior_events": len(behavior_events),
-            "action_breakdown": dict(action_counts),
-            "sessions": {
-                "total_sessions": len(active_sessions),
-                "avg_session_duration": round(sum(session_durations) / len(session_durations), 2) if session_durations else 0,
-                "avg_pages_per_session": round(sum(pages_per_session) / len(pages_per_session), 2) if pages_per_session else 0,
-                "bounce_rate": self._calculate_bounce_rate(active_sessions)
-            },
+            "total_behavior_events": sum(action_counts.values()),
+            "action_breakdown": action_counts,
+            "sessions": self.sessions.get_window_summary(hours),
             "user_journeys": {
-                "total_unique_journeys": len(user_journeys),
-                "most_common_journeys": sorted(user_journeys.items(), 
-                                             key=lambda x: len(x[1]), reverse=True)[:10]
+                "total_unique_journeys": total_journeys,
+                "most_common_journeys": [
+                    {"journey": [self.names.decode(page_id) for page_id in journey], "sessions": count, "truncated": truncated}
+                    for journey, count, truncated in top_journeys
+                ],
+                "entry_pages": [(self.names.decode(page_id), count) for page_id, count in entries.most_common(10)],
+                "next_page_probabilities": next_pages,
+                "drop_off_points": sorted(drop_offs, key=lambda x: x["exits"], reverse=True)[:10]
             }
+        }, ["sessions", "user_journeys"])
+    
+    def get_next_page_probabilities(self, page: str, hours: int = 24) -> Dict[str, Any]:
+        """Get where visitors go after a page"""
+        page = normalize_page(page)
+        page_id = self.names.lookup(page)
+        if page_id is None:
+            return {"page": page, "time_period": f"Last {hours} hours", "views": 0, "next_pages": [], "exit_probability": 0}
+        summary = self.journeys.next_pages(page_id, hours, time.time(), k=10)
+        return self._with_scope(dict(self._format_next_pages(summary), page=page, time_period=f"Last {hours} hours"),
+                                ["views", "next_pages", "exit_probability"])
+    
+    def _format_next_pages(self, summary: Dict[str, Any]) -> Dict[str, Any]:
+        """Decode and round a next-page summary from the journey engine"""
+        return {
+            "views": summary["views"],
+            "next_pages": [
+                {"page": self.names.decode(page_id), "probability": round(probability, 4)}
+                for page_id, probability in summary["next"]
+            ],
+            "exit_probability": round(summary["exit_probability"], 4)
+        }
+    
+    def get_real_time_metrics(self) -> Dict[str, Any]:
+        """Get the sliding-window counters of the last hour"""
+        if self.shared is None:
+            return self.realtime.snapshot()
+        
+        # Minute-granular totals across all workers
+        window_totals = self.shared.totals(self.realtime.window)
+        minute_totals = self.shared.totals(0)
+        
+        def total(totals: Dict[str, float], prefix: str) -> float:
+            return sum(value for name, value in totals.items() if name.startswith(prefix))
+        
+        requests = int(total(window_totals, "request:"))
+        errors = int(total(window_totals, "request_error:"))
+        page_views = int(total(window_totals, "page_view:"))
+        conversions = int(total(window_totals, "conversion:"))
+        minute_requests = int(total(minute_totals, "request:"))
+        return {
+            "window_seconds": self.realtime.window,
+            "requests": requests,
+            "errors": errors,
+            "error_rate": self._calculate_error_rate(errors, requests),
+            "avg_response_time": round(total(window_totals, "request_time:") / requests, 3) if requests else 0,
+            "page_views": page_views,
+            "conversions": conversions,
+            "conversion_rate": round(conversions / page_views * 100, 2) if page_views else 0,
+            "active_sessions": self.shared.active_sessions(self.realtime.session_window),
+            "active_session_window_seconds": self.realtime.session_window,
+            "current_minute_requests": minute_requests,
+            "current_minute_page_views": int(total(minute_totals, "page_view:")),
+            "requests_per_second": round(minute_requests / 60, 2)
+        }
+    
+    def get_rollup_series(self, period: str, count: int) -> List[Dict[str, Any]]:
+        """Get the last ``count`` hourly or daily rollups, newest first"""
+        if self.shared is not None and self.sink is not None:
+            # Other workers' rollups only meet in the database
+            size = 3600 if period == "hour" else 86400
+            since = (int(time.time() // size) - count + 1) * size
+            try:
+                return self.rollups.series(period, count, persisted=self.sink.load_rollups(period, since))
+            except Exception as e:
+                logger.error(f"Failed to load persisted rollups, using this worker's: {e}")
+        return self.rollups.series(period, count)
+    
+    def _cached_query(self, method: str, hours: int, compute) -> Dict[str, Any]:
+        """Get a query result from the cache, computing it if stale"""
+        # Read the version first, so events arriving mid-computation invalidate it
+        version = self.version
+        return self.query_cache.get((method, hours), version, lambda: compute(hours))
+    
+    def _with_scope(self, result: Dict[str, Any], per_worker: List[str]) -> Dict[str, Any]:
+        """Label the fields of a response that only cover this worker when counters are shared.
+        
+        Only counters are shared between workers; geography, sessions,
+        journeys and latency distributions stay in each process.
+        """
+        if self.shared is not None:
+            result["aggregation_scope"] = {"worker_pid": os.getpid(), "per_worker_fields": per_worker}
+        return result
+    
+    def _shared_counts(self, prefix: str, hours: int) -> Dict[str, int]:
+        """Get shared counter totals under a name prefix, keyed by the rest of the name"""
+        return {
+            name[len(prefix):]: int(value)
+            for name, value in self.shared.totals(hours * 3600, prefix).items()
+        }
+    
+    def _shared_endpoint_totals(self, hours: int) -> Dict[str, Dict[str, float]]:
+        """Get request count, error count and total response time per endpoint across workers"""
+        endpoints: Dict[str, Dict[str, float]] = defaultdict(lambda: {"count": 0, "errors": 0, "time": 0.0})
+        for field, prefix in (("count", "request:"), ("errors", "request_error:"), ("time", "request_time:")):
+            for name, value in self.shared.totals(hours * 3600, prefix).items():
+                endpoints[name[len(prefix):]][field] = value if field == "time" else int(value)
+        return dict(endpoints)
+    
+    def get_engine_stats(self) -> Dict[str, Any]:
+        """Get internal statistics of the analytics storage engine"""
+        return {
+            "event_store": self.event_store.get_stats(),
+            "performance_store": self.performance_store.get_stats(),
+            "sessions": self.sessions.get_stats(),
+            "journeys": self.journeys.get_stats(),
+            "geo_cube": self.geo_cube.get_stats(),
+            "rollups": self.rollups.get_stats(),
+            "encoded_names": len(self.names),
+            "persistence": self.sink.get_stats() if self.sink is not None else None,
+            "shared_aggregation": self.shared.get_stats() if self.shared is not None else None,
+            "geoip_cache": self.geoip.get_stats(),
+            "query_cache": self.query_cache.get_stats()
         }
     
     def _calculate_conversion_rate(self, page_views: int, conversions: Dict) -> float:
@@ -430,42 +664,17 @@ class AnalyticsTracker:
         total_conversions = sum(conversions.values())
         return round((total_conversions / total_views * 100), 2) if total_views > 0 else 0
     
-    def _calculate_error_rate(self, performance_metrics: List[Dict]) -> float:
-        """Calculate error rate from performance metrics"""
-        if not performance_metrics:
+    def _calculate_error_rate(self, error_count: int, total_requests: int) -> float:
+        """Calculate error rate from error and request counts"""
+        if not total_requests:
             return 0
-        error_count = sum(1 for m in performance_metrics if m["status_code"] >= 400)
-        return round((error_count / len(performance_metrics) * 100), 2)
+        return round((error_count / total_requests * 100), 2)
     
     def _calculate_endpoint_error_rate(self, status_codes: Dict) -> float:
         """Calculate error rate for a specific endpoint"""
         total_requests = sum(status_codes.values())
         error_requests = sum(count for code, count in status_codes.items() if code >= 400)
         return round((error_requests / total_requests * 100), 2) if total_requests > 0 else 0
-    
-    def _calculate_avg_session_duration(self, sessions: List[Dict]) -> float:
-        """Calculate average session duration"""
-        durations = []
-        for session in sessions:
-            if len(session["pages"]) > 1:
-                duration = (session["pages"][-1]["timestamp"] - session["pages"][0]["timestamp"]).total_seconds()
-                durations.append(duration)
-        return round(sum(durations) / len(durations), 2) if durations else 0
-    
-    def _calculate_avg_pages_per_session(self, sessions: List[Dict]) -> float:
-        """Calculate average pages per session"""
-        if not sessions:
-            return 0
-        total_pages = sum(len(session["pages"]) for session in sessions)
-        return round(total_pages / len(sessions), 2)
-    
-    def _calculate_bounce_rate(self, sessions: List[Dict]) -> float:
-        """Calculate bounce rate (sessions with only one page view)"""
-        if not sessions:
-            return 0.0
-        
-        single_page_sessions = sum(1 for session in sessions if len(session["pages"]) == 1)
-        return (single_page_sessions / len(sessions)) * 100
 
 # Initialize the analytics tracker
 analytics_tracker = AnalyticsTracker() 
\ No newline at end of file
@@ -0,0 +1,88 @@
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import Callable, Iterator, Iterable, List, Optional, Tuple
+from sqlalchemy import select
+from app.models.analytics import AnalyticsEvent
+
+# Columns of an exported event, in CSV column order
+EXPORT_COLUMNS = ("id", "event_type", "name", "session_id", "user_ip", "country", "city", "data", "created_at")
+
+_SELECTED = tuple(getattr(AnalyticsEvent, column) for column in EXPORT_COLUMNS)
+
+
+def iter_event_pages(session_factory: Callable, start: datetime, end: datetime,
+                     cursor: Optional[int] = None, event_type: Optional[str] = None,
+                     page_size: int = 1000) -> Iterator[List[Tuple]]:
+    """Yield pages of persisted events created in ``[start, end)``, ordered by id.
+
+    Pages are fetched with keyset pagination (``id > last id``), each with its
+    own short-lived session, so memory stays at one page however large the
+    range is and no connection is held while the client reads. ``cursor``
+    resumes after the given event id.
+    """
+    last_id = cursor or 0
+    while True:
+        query = select(*_SELECTED).where(
+            AnalyticsEvent.created_at >= start,
+            AnalyticsEvent.created_at < end,
+            AnalyticsEvent.id > last_id
+        )
+        if event_type:
+            query = query.where(AnalyticsEvent.event_type == event_type)
+        query = query.order_by(AnalyticsEvent.id).limit(page_size)
+
+        db = session_factory()
+        try:
+            page = [tuple(row) for row in db.execute(query)]
+        finally:
+            db.close()
+
+        if not page:
+            return
+        yield page
+        if len(page) < page_size:
+            return
+        last_id = page[-1][0]
+
+
+def _row_dict(row: Tuple) -> dict:
+    record = dict(zip(EXPORT_COLUMNS, row))
+    record["created_at"] = record["created_at"].isoformat()
+    return record
+
+
+def ndjson_chunks(pages: Iterable[List[Tuple]]) -> Iterator[bytes]:
+    """Encode each page of events as one chunk of newline-delimited JSON"""
+    for page in pages:
+        yield "".join(json.dumps(_row_dict(row)) + "\n" for row in page).encode()
+
+
+def csv_chunks(pages: Iterable[List[Tuple]]) -> Iterator[bytes]:
+    """Encode pages of events as CSV, header first, one chunk per page"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for page in pages:
+        for row in page:
+            record = _row_dict(row)
+            record["data"] = json.dumps(record["data"]) if record["data"] is not None else ""
+            writer.writerow(record[column] for column in EXPORT_COLUMNS)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    # A range with no events still gets its header
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """Compress a stream of chunks into a single gzip stream"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
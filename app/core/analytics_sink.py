@@ -0,0 +1,216 @@
+import os
+import time
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from typing import Dict, Optional, Any, Callable
+from sqlalchemy import insert
+from app.core.database import SessionLocal
+from app.models.analytics import AnalyticsEvent, PerformanceMetric, AnalyticsRollup
+from app.core.rollups import Rollup
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class AnalyticsSink:
+    """Write-behind persistence of analytics records.
+
+    Tracking calls only append a row to a bounded in-memory queue; a
+    background thread drains the queues in bulk multi-row INSERTs once
+    ``batch_size`` rows are waiting or every ``flush_interval`` seconds.
+    When a queue is full new rows are dropped and counted rather than
+    blocking the request path.
+    """
+
+    def __init__(self, session_factory: Callable, max_queue_size: int = 10000,
+                 batch_size: int = 500, flush_interval: float = 5.0):
+        self.session_factory = session_factory
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        # One queue per target table, keyed by stream name
+        self._models: Dict[str, Any] = {}
+        self._queues: Dict[str, deque] = {}
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._rollup_engine = None
+
+        self.enqueued = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self.flushes = 0
+        self.rollups_written = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def register(self, stream: str, model):
+        """Route a named stream of rows to a model's table"""
+        self._models[stream] = model
+        self._queues.setdefault(stream, deque())
+
+    def enqueue(self, stream: str, row: Dict[str, Any]):
+        """Queue a row for insertion without touching the database"""
+        queue = self._queues[stream]
+        if len(queue) >= self.max_queue_size:
+            self.dropped += 1
+            return
+        queue.append(row)
+        self.enqueued += 1
+        if len(queue) >= self.batch_size:
+            self._wakeup.set()
+
+    @staticmethod
+    def timestamp(epoch: float) -> datetime:
+        """Convert an epoch timestamp for a timezone-aware DateTime column"""
+        return datetime.fromtimestamp(epoch, tz=timezone.utc)
+
+    def start(self):
+        """Start the background flush thread"""
+        if self.running:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="analytics-sink", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Stop the flush thread and write whatever is still queued"""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self) -> int:
+        """Write all queued rows, one multi-row INSERT per batch"""
+        written = 0
+        with self._flush_lock:
+            for stream, queue in self._queues.items():
+                while queue:
+                    batch = []
+                    while queue and len(batch) < self.batch_size:
+                        batch.append(queue.popleft())
+                    written += self._write_batch(self._models[stream], batch)
+            if written:
+                self.flushes += 1
+            if self._rollup_engine is not None:
+                self._persist_rollups()
+        return written
+
+    def _write_batch(self, model, rows) -> int:
+        db = self.session_factory()
+        try:
+            db.execute(insert(model), rows)
+            db.commit()
+            self.written += len(rows)
+            return len(rows)
+        except Exception as e:
+            db.rollback()
+            self.failed += len(rows)
+            logger.error(f"Failed to persist {len(rows)} {model.__tablename__} rows: {e}")
+            return 0
+        finally:
+            db.close()
+
+    def track_rollups(self, engine):
+        """Save the pending rollup deltas of a RollupEngine on every flush"""
+        self._rollup_engine = engine
+        engine.track_deltas()
+
+    def _persist_rollups(self):
+        """Merge the rollup deltas recorded since the last flush into the stored rows"""
+        deltas = self._rollup_engine.collect_pending()
+        if not deltas:
+            return
+        db = self.session_factory()
+        try:
+            # Lock the rows so concurrent workers merge one after another
+            existing = {}
+            for persisted in db.query(AnalyticsRollup).filter(
+                AnalyticsRollup.bucket_start.in_({self.timestamp(delta.bucket_start) for delta in deltas})
+            ).with_for_update():
+                existing[(persisted.period, Rollup.from_row(persisted).bucket_start)] = persisted
+            for delta in deltas:
+                current = existing.get((delta.period, delta.bucket_start))
+                if current is None:
+                    db.add(AnalyticsRollup(**delta.to_row()))
+                    continue
+                merged = Rollup.from_row(current)
+                merged.merge(delta)
+                for column, value in merged.to_row().items():
+                    setattr(current, column, value)
+            db.commit()
+            self.rollups_written += len(deltas)
+        except Exception as e:
+            db.rollback()
+            self._rollup_engine.requeue(deltas)
+            logger.error(f"Failed to persist {len(deltas)} analytics rollups: {e}")
+        finally:
+            db.close()
+
+    def load_rollups(self, period: str, since: float) -> Dict[int, Rollup]:
+        """Read stored rollups of one period starting at or after ``since``, by bucket start"""
+        db = self.session_factory()
+        try:
+            rows = db.query(AnalyticsRollup).filter(
+                AnalyticsRollup.period == period,
+                AnalyticsRollup.bucket_start >= self.timestamp(since)
+            ).all()
+            return {rollup.bucket_start: rollup for rollup in map(Rollup.from_row, rows)}
+        finally:
+            db.close()
+
+    def restore_rollups(self, engine, days: int):
+        """Load the persisted rollups of the last ``days`` days into a RollupEngine"""
+        db = self.session_factory()
+        try:
+            cutoff = self.timestamp(time.time() - days * 86400)
+            rows = db.query(AnalyticsRollup).filter(AnalyticsRollup.bucket_start >= cutoff).all()
+            for row in rows:
+                engine.restore(Rollup.from_row(row))
+            return len(rows)
+        except Exception as e:
+            logger.error(f"Failed to restore analytics rollups: {e}")
+            return 0
+        finally:
+            db.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get queue and write statistics"""
+        return {
+            "running": self.running,
+            "queued": {stream: len(queue) for stream, queue in self._queues.items()},
+            "max_queue_size": self.max_queue_size,
+            "batch_size": self.batch_size,
+            "flush_interval_seconds": self.flush_interval,
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "written": self.written,
+            "failed": self.failed,
+            "flushes": self.flushes,
+            "rollups_written": self.rollups_written
+        }
+
+
+# Global instance
+analytics_sink = AnalyticsSink(
+    SessionLocal,
+    max_queue_size=int(os.getenv("ANALYTICS_SINK_MAX_QUEUE", "10000")),
+    batch_size=int(os.getenv("ANALYTICS_SINK_BATCH_SIZE", "500")),
+    flush_interval=float(os.getenv("ANALYTICS_SINK_FLUSH_INTERVAL", "5"))
+)
+analytics_sink.register("events", AnalyticsEvent)
+analytics_sink.register("performance", PerformanceMetric)
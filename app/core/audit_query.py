@@ -0,0 +1,103 @@
+import json
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from app.core.audit_store import AuditLogStore, Position
+
+# Fields of a formatted audit event, in output order; "cursor" is the event's position
+AUDIT_LOG_FIELDS = ("timestamp", "event_type", "user_ip", "endpoint", "method", "status_code",
+                    "admin_action", "user_agent", "request_data", "response_data", "cursor")
+DEFAULT_FIELDS = AUDIT_LOG_FIELDS[:-1]
+
+
+def format_cursor(position: Position) -> str:
+    """Encode a store position as an opaque cursor"""
+    return "{}.{}.{}".format(*position)
+
+
+def parse_cursor(cursor: str) -> Position:
+    """Decode a cursor from ``format_cursor``; raises ValueError if malformed"""
+    hour, part, offset = (int(value) for value in cursor.split("."))
+    return hour, part, offset
+
+
+def parse_fields(fields: Optional[str]) -> Sequence[str]:
+    """Decode a comma-separated field list; raises ValueError on unknown fields"""
+    if not fields:
+        return DEFAULT_FIELDS
+    selected = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in selected if field not in AUDIT_LOG_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return selected
+
+
+def format_event(event: Dict[str, Any], position: Optional[Position] = None,
+                 fields: Sequence[str] = DEFAULT_FIELDS) -> Dict[str, Any]:
+    """Format an audit log entry for display, keeping only ``fields``"""
+    formatted = {}
+    for field in fields:
+        if field == "cursor":
+            formatted[field] = format_cursor(position) if position is not None else None
+        elif field == "admin_action":
+            formatted[field] = event.get("admin_action", False)
+        elif field == "user_agent":
+            formatted[field] = (event.get("user_agent") or "unknown")[:100]  # Truncate long user agents
+        else:
+            formatted[field] = event.get(field)
+    return formatted
+
+
+def iter_audit_events(store: AuditLogStore, since: float, cursor: Optional[Position] = None,
+                      event_type: Optional[str] = None, ip: Optional[str] = None,
+                      endpoint_prefix: Optional[str] = None, status_min: Optional[int] = None,
+                      status_max: Optional[int] = None,
+                      admin_only: bool = False) -> Iterator[Tuple[Position, Dict[str, Any]]]:
+    """Yield (position, event) for matching events at or after ``since``, newest first.
+
+    Events are read lazily from the store, so a caller that stops early
+    only reads as far as it got. ``cursor`` resumes after the event at that
+    position.
+    """
+    for position, event in store.iter_records(since, before=cursor):
+        if event_type is not None and event.get("event_type") != event_type:
+            continue
+        if ip is not None and event.get("user_ip") != ip:
+            continue
+        if endpoint_prefix is not None and not (event.get("endpoint") or "").startswith(endpoint_prefix):
+            continue
+        status_code = event.get("status_code") or 0
+        if status_min is not None and status_code < status_min:
+            continue
+        if status_max is not None and status_code > status_max:
+            continue
+        if admin_only and not event.get("admin_action", False):
+            continue
+        yield position, event
+
+
+def read_page(events: Iterable[Tuple[Position, Dict[str, Any]]], limit: int,
+              fields: Sequence[str] = DEFAULT_FIELDS) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Take up to ``limit`` events; returns (formatted events, cursor of the next page or None)"""
+    page = []
+    last = None
+    for position, event in events:
+        if len(page) == limit:
+            return page, format_cursor(last)
+        page.append(format_event(event, position, fields))
+        last = position
+    return page, None
+
+
+def ndjson_chunks(events: Iterable[Tuple[Position, Dict[str, Any]]], fields: Sequence[str] = DEFAULT_FIELDS,
+                  limit: Optional[int] = None, chunk_size: int = 500) -> Iterator[bytes]:
+    """Encode events as newline-delimited JSON, ``chunk_size`` lines per chunk"""
+    lines = []
+    for count, (position, event) in enumerate(events):
+        if limit is not None and count >= limit:
+            break
+        lines.append(json.dumps(format_event(event, position, fields)) + "\n")
+        if len(lines) >= chunk_size:
+            yield "".join(lines).encode()
+            lines = []
+    if lines:
+        yield "".join(lines).encode()
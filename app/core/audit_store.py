@@ -0,0 +1,421 @@
+import os
+import re
+import io
+import gzip
+import json
+import time
+import bisect
+import calendar
+import shutil
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional, Any, Iterator, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+HOUR = 3600
+
+# When to fsync the log file after writing
+FSYNC_POLICIES = ("always", "interval", "never")
+
+# Segment files are named <hour>-<part>.log, hour as YYYYmmddHH in UTC
+_SEGMENT_NAME = re.compile(r"^(\d{10})-(\d{3})\.log(\.gz)?$")
+
+# Bytes read at a time when reading a segment backwards
+_READ_BLOCK = 64 * 1024
+
+# (segment hour, part, byte offset) of a record
+Position = Tuple[int, int, int]
+
+
+def _hour_name(hour: int) -> str:
+    return datetime.utcfromtimestamp(hour * HOUR).strftime("%Y%m%d%H")
+
+
+def _parse_hour(name: str) -> int:
+    return calendar.timegm(time.strptime(name, "%Y%m%d%H")) // HOUR
+
+
+class AuditSegment:
+    """One hourly (or size-split) segment file and its sparse index"""
+
+    __slots__ = ("hour", "part", "path", "index_path")
+
+    def __init__(self, directory: str, hour: int, part: int, compressed: bool = False):
+        self.hour = hour
+        self.part = part
+        base = os.path.join(directory, f"{_hour_name(hour)}-{part:03d}.log")
+        self.path = base + ".gz" if compressed else base
+        self.index_path = base + ".idx"
+
+    @property
+    def compressed(self) -> bool:
+        return self.path.endswith(".gz")
+
+    def load_index(self) -> Tuple[List[float], List[int]]:
+        """Read the index as parallel lists of (latest timestamp before offset, offset)"""
+        latest, offsets = [], []
+        try:
+            with open(self.index_path, "r") as f:
+                for line in f:
+                    timestamp, offset = line.split()
+                    latest.append(float(timestamp))
+                    offsets.append(int(offset))
+        except (FileNotFoundError, ValueError):
+            pass
+        return latest, offsets
+
+    def start_offset(self, since: float) -> int:
+        """Get an offset before which every record is older than ``since``"""
+        latest, offsets = self.load_index()
+        # Index timestamps are running maxima, so they are sorted
+        position = bisect.bisect_left(latest, since)
+        return offsets[position - 1] if position else 0
+
+
+class AuditLogStore:
+    """Hourly-partitioned JSON-lines audit log with sparse offset indexes.
+
+    Callers only append (timestamp, line) records to an in-memory buffer; a
+    background thread writes the buffer once ``batch_size`` records are
+    waiting or every ``flush_interval`` seconds. A caller that finds more
+    than ``max_buffer_size`` records waiting flushes them itself, so memory
+    stays bounded without dropping records. The file is fsynced after every
+    flush, at most every ``fsync_interval`` seconds, or never, per ``fsync``.
+
+    A new segment file starts with the first record of each hour, and a new
+    part when a segment passes ``max_bytes``; closed segments are gzipped
+    if ``compress`` is set and dropped after ``retention_hours`` (0 keeps
+    all). Every ``index_interval`` bytes the segment's index records the
+    offset together with the latest timestamp written before it, so a
+    window query opens only the segments of the hours it covers, seeks
+    past everything older, and reads them backwards: newest first, with no
+    sort. Records that arrive late go into the current segment, so the
+    order is by arrival, which trails timestamp order by at most the
+    ingestion delay.
+    """
+
+    def __init__(self, directory: str, legacy_path: Optional[str] = None, batch_size: int = 256,
+                 max_buffer_size: int = 10000, flush_interval: float = 1.0, fsync: str = "interval",
+                 fsync_interval: float = 5.0, max_bytes: int = 50 * 1024 * 1024, retention_hours: int = 0,
+                 compress: bool = False, index_interval: int = 64 * 1024):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}, not {fsync!r}")
+        self.directory = directory
+        self.legacy_path = legacy_path
+        self.batch_size = batch_size
+        self.max_buffer_size = max_buffer_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.max_bytes = max_bytes
+        self.retention_hours = retention_hours
+        self.compress = compress
+        self.index_interval = index_interval
+
+        self._buffer: deque = deque()
+        self._segment: Optional[AuditSegment] = None
+        self._file = None
+        self._index_file = None
+        self._size = 0
+        self._latest = 0.0
+        self._indexed_offset = 0
+        self._last_fsync = 0.0
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+        self.written = 0
+        self.failed = 0
+        self.flushes = 0
+        self.fsyncs = 0
+        self.rotations = 0
+        self.inline_flushes = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def pending(self) -> int:
+        """Records buffered but not yet written"""
+        return len(self._buffer)
+
+    def write_records(self, records: List[Tuple[float, str]]):
+        """Buffer (epoch timestamp, line) records; each line ends in a newline"""
+        self._buffer.extend(records)
+        if not self.running:
+            # Nothing would write them in the background
+            self.flush()
+        elif len(self._buffer) > self.max_buffer_size:
+            self.inline_flushes += 1
+            self.flush()
+        elif len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    def start(self):
+        """Start the background flush thread"""
+        if self.running:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="audit-log-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Stop the flush thread, write whatever is buffered and close the segment"""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+        with self._flush_lock:
+            self._close(sync=self.fsync != "never")
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self) -> int:
+        """Write all buffered records to their segments"""
+        with self._flush_lock:
+            if not self._buffer:
+                return 0
+            records = []
+            while self._buffer:
+                records.append(self._buffer.popleft())
+            try:
+                for timestamp, line in records:
+                    self._write(timestamp, line.encode())
+                self._file.flush()
+                self._index_file.flush()
+                now = time.time()
+                if self.fsync == "always" or (self.fsync == "interval" and now - self._last_fsync >= self.fsync_interval):
+                    os.fsync(self._file.fileno())
+                    self._last_fsync = now
+                    self.fsyncs += 1
+                self.written += len(records)
+                self.flushes += 1
+            except Exception as e:
+                self.failed += len(records)
+                logger.error(f"Failed to write audit log: {e}")
+                self._close(sync=False)
+                return 0
+            return len(records)
+
+    def _write(self, timestamp: float, data: bytes):
+        """Append one record, moving to a new segment when needed (lock held)"""
+        hour = int(timestamp // HOUR)
+        segment = self._segment
+        if segment is None:
+            self._open(hour)
+        elif hour > segment.hour:
+            self._rotate(hour, 0)
+        elif self._size >= self.max_bytes:
+            self._rotate(segment.hour, segment.part + 1)
+
+        if self._size - self._indexed_offset >= self.index_interval:
+            self._index_file.write(f"{self._latest} {self._size}\n")
+            self._indexed_offset = self._size
+        self._file.write(data)
+        self._size += len(data)
+        if timestamp > self._latest:
+            self._latest = timestamp
+
+    def _open(self, hour: int):
+        """Open the newest uncompressed segment of ``hour`` for appending, or start one (lock held)"""
+        os.makedirs(self.directory, exist_ok=True)
+        parts = [segment for segment in self.segments() if segment.hour == hour]
+        if parts and not parts[-1].compressed:
+            segment = parts[-1]
+        else:
+            segment = AuditSegment(self.directory, hour, parts[-1].part + 1 if parts else 0)
+        self._start(segment)
+        if self._size:
+            # Records written before a restart are at most as late as the end of their hour
+            self._latest = min(time.time(), (hour + 1) * HOUR)
+
+    def _close(self, sync: bool):
+        """Close the active segment (lock held)"""
+        if self._file is None:
+            return
+        try:
+            self._file.flush()
+            if sync:
+                os.fsync(self._file.fileno())
+        finally:
+            self._file.close()
+            self._index_file.close()
+            self._file = None
+            self._index_file = None
+            self._segment = None
+
+    def _rotate(self, hour: int, part: int):
+        """Close the active segment and start a new one (lock held)"""
+        closed = self._segment
+        self._close(sync=self.fsync != "never")
+        self.rotations += 1
+        if self.compress:
+            try:
+                with open(closed.path, "rb") as source, gzip.open(closed.path + ".gz", "wb") as target:
+                    shutil.copyfileobj(source, target)
+                os.remove(closed.path)
+            except Exception as e:
+                logger.error(f"Failed to compress audit segment {closed.path}: {e}")
+        self._prune(hour)
+
+        self._start(AuditSegment(self.directory, hour, part))
+
+    def _start(self, segment: AuditSegment):
+        """Make ``segment`` the one records are appended to (lock held)"""
+        self._segment = segment
+        self._file = open(segment.path, "ab")
+        self._index_file = open(segment.index_path, "a")
+        self._size = self._file.tell()
+        self._indexed_offset = self._size
+        self._latest = 0.0
+
+    def _prune(self, current_hour: int):
+        """Delete segments older than the retention period"""
+        if not self.retention_hours:
+            return
+        oldest_hour = current_hour - self.retention_hours
+        for segment in self.segments():
+            if segment.hour >= oldest_hour:
+                break
+            for path in (segment.path, segment.index_path):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def segments(self) -> List[AuditSegment]:
+        """Get all segments, oldest first"""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        segments = []
+        for name in names:
+            match = _SEGMENT_NAME.match(name)
+            if match:
+                segments.append(AuditSegment(self.directory, _parse_hour(match.group(1)),
+                                             int(match.group(2)), compressed=bool(match.group(3))))
+        segments.sort(key=lambda segment: (segment.hour, segment.part))
+        return segments
+
+    def iter_records(self, since: float, before: Optional[Position] = None) -> Iterator[Tuple[Position, Dict[str, Any]]]:
+        """Yield (position, record) for records at or after ``since``, newest first.
+
+        Only segments of the hours from ``since`` on are opened, each read
+        backwards from its end (or from ``before``, exclusive) down to the
+        indexed offset for ``since``. Records of the legacy log file have
+        positions ``(-1, 0, n)``, n counting from its newest record.
+        """
+        # Include records still waiting in the buffer
+        self.flush()
+        with self._flush_lock:
+            active = self._segment
+            active_size = self._size
+
+        since_hour = int(since // HOUR)
+        cutoff = datetime.utcfromtimestamp(since)
+        segments = self.segments()
+        legacy_only = before is not None and before[0] < 0
+        for segment in reversed(segments):
+            if segment.hour < since_hour or legacy_only:
+                break
+            if before is not None and (segment.hour, segment.part) > before[:2]:
+                continue
+            start = segment.start_offset(since)
+            end = active_size if active is not None and segment.path == active.path else None
+            if before is not None and (segment.hour, segment.part) == before[:2]:
+                end = before[2]
+            for offset, line in self._read_backwards(segment, start, end):
+                try:
+                    record = json.loads(line)
+                    if datetime.fromisoformat(record["timestamp"]) >= cutoff:
+                        yield (segment.hour, segment.part, offset), record
+                except (ValueError, KeyError):
+                    continue
+
+        # Records from before hourly segments were written, if the window reaches back that far
+        if self.legacy_path and (before is None or legacy_only) and (not segments or since < segments[0].hour * HOUR):
+            yield from self._iter_legacy(cutoff, before[2] + 1 if legacy_only else 0)
+
+    def _read_backwards(self, segment: AuditSegment, start: int, end: Optional[int]) -> Iterator[Tuple[int, bytes]]:
+        """Yield (offset, line) for the complete lines in [start, end), last first"""
+        try:
+            if segment.compressed:
+                with gzip.open(segment.path, "rb") as f:
+                    f = io.BytesIO(f.read())
+                    yield from self._reverse_lines(f, start, end)
+            else:
+                with open(segment.path, "rb") as f:
+                    yield from self._reverse_lines(f, start, end)
+        except FileNotFoundError:
+            # Pruned while being read
+            return
+
+    @staticmethod
+    def _reverse_lines(f, start: int, end: Optional[int]) -> Iterator[Tuple[int, bytes]]:
+        if end is None:
+            end = f.seek(0, io.SEEK_END)
+        position = end
+        tail = b""
+        while position > start:
+            size = min(_READ_BLOCK, position - start)
+            position -= size
+            f.seek(position)
+            block = f.read(size) + tail
+            lines = block.split(b"\n")
+            # The first piece may be the end of a line that starts in an earlier block
+            tail = lines[0]
+            line_end = position + len(block)
+            for line in reversed(lines[1:]):
+                line_end -= len(line) + 1
+                if line:
+                    yield line_end + 1, line
+        if tail:
+            yield start, tail
+
+    def _iter_legacy(self, cutoff: datetime, skip: int = 0) -> Iterator[Tuple[Position, Dict[str, Any]]]:
+        """Yield matching records of the single pre-segment log file, newest first, from the ``skip``-th"""
+        records = []
+        try:
+            with open(self.legacy_path, "r") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line.strip())
+                        if datetime.fromisoformat(record["timestamp"]) >= cutoff:
+                            records.append(record)
+                    except (ValueError, KeyError):
+                        continue
+        except FileNotFoundError:
+            return
+        records.sort(key=lambda record: record["timestamp"], reverse=True)
+        for n in range(skip, len(records)):
+            yield (-1, 0, n), records[n]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get writer and storage statistics"""
+        segments = self.segments()
+        return {
+            "running": self.running,
+            "buffered_records": self.pending,
+            "written": self.written,
+            "failed": self.failed,
+            "flushes": self.flushes,
+            "inline_flushes": self.inline_flushes,
+            "fsync_policy": self.fsync,
+            "fsyncs": self.fsyncs,
+            "rotations": self.rotations,
+            "segments": len(segments),
+            "oldest_segment_hour": _hour_name(segments[0].hour) if segments else None,
+            "compress": self.compress
+        }
@@ -0,0 +1,294 @@
+import time
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from itertools import islice
+from typing import Dict, List, Iterator, Optional, Any, Sequence
+
+from app.core.sketches import LatencyHistogram
+
+
+class StringDictionary:
+    """Dictionary encoding for low-cardinality string columns"""
+
+    def __init__(self):
+        self._codes: Dict[str, int] = {}
+        self._values: List[str] = []
+        self._lock = threading.Lock()
+
+    def encode(self, value: str) -> int:
+        """Get the integer code for a value, assigning one if needed"""
+        code = self._codes.get(value)
+        if code is None:
+            with self._lock:
+                code = self._codes.get(value)
+                if code is None:
+                    code = len(self._values)
+                    self._values.append(value)
+                    self._codes[value] = code
+        return code
+
+    def decode(self, code: int) -> str:
+        """Get the value for an integer code"""
+        return self._values[code]
+
+    def lookup(self, value: str) -> Optional[int]:
+        """Get the code for a value without assigning one"""
+        return self._codes.get(value)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+
+class _MinuteBucket:
+    """Columns for the events recorded during a single wall-clock minute"""
+
+    __slots__ = ("minute", "columns")
+
+    def __init__(self):
+        self.minute = -1
+        self.columns: Dict[str, Any] = {}
+
+    @staticmethod
+    def _empty_columns(schema: Dict[str, Optional[str]]) -> Dict[str, Any]:
+        # A typecode gives a packed array column, None a plain list of objects
+        return {name: array(typecode) if typecode else [] for name, typecode in schema.items()}
+
+    def reset(self, minute: int, schema: Dict[str, Optional[str]]):
+        self.minute = minute
+        self.columns = self._empty_columns(schema)
+
+
+class TimeBucketedEventStore:
+    """Ring of per-minute columnar event buckets covering a fixed retention window.
+
+    Each minute maps to a slot in the ring (``minute % size``). When a slot is
+    reused for a newer minute its previous contents are discarded, so expiry is
+    O(1) per bucket and the store never holds more than ``retention_minutes``
+    buckets. Window queries only visit the slots that overlap the window.
+
+    Events are stored column-wise, in timestamp order within each bucket
+    whatever order they arrive in: an ``array('d')`` of epoch timestamps plus
+    one column per schema entry. Columns with a typecode are packed arrays
+    (use them for numbers and dictionary-encoded strings), columns without one
+    are plain lists.
+    """
+
+    def __init__(self, schema: Dict[str, Optional[str]], retention_hours: int = 168,
+                 max_events_per_minute: int = 5000):
+        self.schema = dict(schema)
+        self.retention_minutes = max(1, int(retention_hours * 60))
+        self.max_events_per_minute = max_events_per_minute
+        self._full_schema = {"timestamp": "d", **self.schema}
+        self._ring = [_MinuteBucket() for _ in range(self.retention_minutes)]
+        self._lock = threading.Lock()
+        self.dropped_events = 0
+
+    def append(self, timestamp: float, **values):
+        """Store an event in the bucket for its minute"""
+        minute = int(timestamp // 60)
+        bucket = self._ring[minute % self.retention_minutes]
+        with self._lock:
+            if bucket.minute != minute:
+                if bucket.minute > minute:
+                    # Older than anything the slot can still hold
+                    self.dropped_events += 1
+                    return
+                bucket.reset(minute, self._full_schema)
+            columns = bucket.columns
+            if len(columns["timestamp"]) >= self.max_events_per_minute:
+                self.dropped_events += 1
+                return
+            timestamps = columns["timestamp"]
+            if not timestamps or timestamp >= timestamps[-1]:
+                timestamps.append(timestamp)
+                for name in self.schema:
+                    columns[name].append(values[name])
+            else:
+                # Late arrivals (e.g. from the ingestion queue) are inserted in order;
+                # window queries bisect the boundary bucket on its timestamps
+                position = bisect_right(timestamps, timestamp)
+                timestamps.insert(position, timestamp)
+                for name in self.schema:
+                    columns[name].insert(position, values[name])
+
+    def _window_slices(self, hours: float, now: Optional[float]):
+        """Yield (bucket columns, start index) for each bucket overlapping the window"""
+        now = now if now is not None else time.time()
+        cutoff = now - hours * 3600
+        current_minute = int(now // 60)
+        first_minute = int(cutoff // 60)
+        span = min(current_minute - first_minute + 1, self.retention_minutes)
+
+        for minute in range(current_minute - span + 1, current_minute + 1):
+            bucket = self._ring[minute % self.retention_minutes]
+            if bucket.minute != minute:
+                continue
+            columns = bucket.columns
+            start = 0
+            if minute == first_minute:
+                # Only the boundary bucket needs a search on its timestamps
+                start = bisect_left(columns["timestamp"], cutoff)
+            yield columns, start
+
+    def window(self, hours: float, now: Optional[float] = None,
+               columns: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        """Return the columns (all, or only ``columns``) of the events from the last ``hours`` hours, oldest first"""
+        names = list(columns) if columns is not None else list(self._full_schema)
+        result = {name: array(self._full_schema[name]) if self._full_schema[name] else [] for name in names}
+        for bucket_columns, start in self._window_slices(hours, now):
+            with self._lock:
+                # Copy under the lock so every column has the same length
+                for name in names:
+                    values = bucket_columns[name]
+                    result[name] += values[start:] if start else values
+        return result
+
+    def count_by(self, hours: float, columns: Sequence[str], now: Optional[float] = None) -> Counter:
+        """Count the events from the last ``hours`` hours by their values in ``columns``, without copying"""
+        counts: Counter = Counter()
+        for bucket_columns, start in self._window_slices(hours, now):
+            with self._lock:
+                counts.update(islice(zip(*(bucket_columns[name] for name in columns)), start, None))
+        return counts
+
+    def count(self, hours: float, now: Optional[float] = None) -> int:
+        """Count the events from the last ``hours`` hours"""
+        return sum(len(columns["timestamp"]) - start for columns, start in self._window_slices(hours, now))
+
+    def _live_buckets(self) -> List[_MinuteBucket]:
+        oldest_minute = int(time.time() // 60) - self.retention_minutes + 1
+        return [b for b in self._ring if b.minute >= oldest_minute]
+
+    def __len__(self) -> int:
+        return sum(len(b.columns["timestamp"]) for b in self._live_buckets())
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get storage statistics"""
+        live_buckets = self._live_buckets()
+        return {
+            "retention_hours": round(self.retention_minutes / 60, 2),
+            "max_events_per_minute": self.max_events_per_minute,
+            "active_buckets": len(live_buckets),
+            "stored_events": sum(len(b.columns["timestamp"]) for b in live_buckets),
+            "dropped_events": self.dropped_events
+        }
+
+
+class EndpointStats:
+    """Request count, latency and status code aggregates for one endpoint"""
+
+    __slots__ = ("count", "total_time", "errors", "status_codes", "histogram")
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.errors = 0
+        self.status_codes: Dict[int, int] = {}
+        self.histogram = LatencyHistogram()
+
+    def add(self, response_time: float, status_code: int):
+        self.count += 1
+        self.total_time += response_time
+        if status_code >= 400:
+            self.errors += 1
+        self.status_codes[status_code] = self.status_codes.get(status_code, 0) + 1
+        self.histogram.add(response_time)
+
+    def merge(self, other: "EndpointStats"):
+        self.count += other.count
+        self.total_time += other.total_time
+        self.errors += other.errors
+        for code, count in other.status_codes.items():
+            self.status_codes[code] = self.status_codes.get(code, 0) + count
+        self.histogram.merge(other.histogram)
+
+
+class _StatsBucket:
+    """Per-endpoint aggregates for a single wall-clock minute"""
+
+    __slots__ = ("minute", "endpoints")
+
+    def __init__(self):
+        self.minute = -1
+        self.endpoints: Dict[int, EndpointStats] = {}
+
+
+class EndpointMetricsStore:
+    """Ring of per-minute, per-endpoint request aggregates.
+
+    Instead of raw records each minute keeps one ``EndpointStats`` per
+    endpoint, so memory is bounded by retention x endpoints regardless of
+    traffic. Window queries merge the minute aggregates they cover, so the
+    window is resolved to whole minutes.
+    """
+
+    # Key used once a minute has seen ``max_endpoints_per_minute`` endpoints
+    OVERFLOW_KEY = -1
+
+    def __init__(self, retention_hours: int = 24, max_endpoints_per_minute: int = 200):
+        self.retention_minutes = max(1, int(retention_hours * 60))
+        self.max_endpoints_per_minute = max_endpoints_per_minute
+        self._ring = [_StatsBucket() for _ in range(self.retention_minutes)]
+        self._lock = threading.Lock()
+        self.overflowed_requests = 0
+        self.dropped_requests = 0
+
+    def add(self, timestamp: float, endpoint: int, response_time: float, status_code: int):
+        """Record a request against the bucket for its minute"""
+        minute = int(timestamp // 60)
+        bucket = self._ring[minute % self.retention_minutes]
+        with self._lock:
+            if bucket.minute != minute:
+                if bucket.minute > minute:
+                    self.dropped_requests += 1
+                    return
+                bucket.minute = minute
+                bucket.endpoints = {}
+            stats = bucket.endpoints.get(endpoint)
+            if stats is None:
+                if len(bucket.endpoints) >= self.max_endpoints_per_minute:
+                    endpoint = self.OVERFLOW_KEY
+                    self.overflowed_requests += 1
+                    stats = bucket.endpoints.get(endpoint)
+                if stats is None:
+                    stats = bucket.endpoints[endpoint] = EndpointStats()
+            stats.add(response_time, status_code)
+
+    def iter_minutes(self, hours: float, now: Optional[float] = None) -> Iterator[Dict[int, EndpointStats]]:
+        """Yield the per-endpoint aggregates of each minute in the window"""
+        now = now if now is not None else time.time()
+        current_minute = int(now // 60)
+        first_minute = int((now - hours * 3600) // 60)
+        span = min(current_minute - first_minute + 1, self.retention_minutes)
+        for minute in range(current_minute - span + 1, current_minute + 1):
+            bucket = self._ring[minute % self.retention_minutes]
+            if bucket.minute == minute:
+                yield bucket.endpoints
+
+    def window(self, hours: float, now: Optional[float] = None) -> Dict[int, EndpointStats]:
+        """Merge the per-endpoint aggregates of the last ``hours`` hours"""
+        merged: Dict[int, EndpointStats] = {}
+        for endpoints in self.iter_minutes(hours, now):
+            # Merge under the lock; the current minute may still be updated
+            with self._lock:
+                for endpoint, stats in endpoints.items():
+                    target = merged.get(endpoint)
+                    if target is None:
+                        target = merged[endpoint] = EndpointStats()
+                    target.merge(stats)
+        return merged
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get storage statistics"""
+        oldest_minute = int(time.time() // 60) - self.retention_minutes + 1
+        live_buckets = [b for b in self._ring if b.minute >= oldest_minute]
+        return {
+            "retention_hours": round(self.retention_minutes / 60, 2),
+            "max_endpoints_per_minute": self.max_endpoints_per_minute,
+            "active_buckets": len(live_buckets),
+            "endpoint_series": sum(len(b.endpoints) for b in live_buckets),
+            "overflowed_requests": self.overflowed_requests,
+            "dropped_requests": self.dropped_requests
+        }
@@ -0,0 +1,112 @@
+import time
+import threading
+from typing import Dict, Optional, Any, Tuple
+
+from app.core.sketches import HyperLogLog
+
+HOUR = 3600
+
+# (country code, city id)
+LocationKey = Tuple[str, int]
+
+
+class GeoCell:
+    """Counters for one location in one hour (or merged over a window)"""
+
+    __slots__ = ("page_views", "conversions", "sessions")
+
+    def __init__(self, precision: int):
+        self.page_views = 0
+        self.conversions: Dict[str, int] = {}
+        self.sessions = HyperLogLog(precision)
+
+    def merge(self, other: "GeoCell"):
+        self.page_views += other.page_views
+        for conversion_type, count in other.conversions.items():
+            self.conversions[conversion_type] = self.conversions.get(conversion_type, 0) + count
+        self.sessions.merge(other.sessions)
+
+
+class GeoCube:
+    """Geographic counters pre-aggregated by (hour, country code, city).
+
+    Each page view or conversion with a resolved location updates one cell,
+    and a window query merges the cells of at most ``hours`` hour buckets.
+    Unique sessions are HyperLogLog sketches, so they merge across hours
+    and cities without keeping session ids. City names are
+    dictionary-encoded; country names are kept once per country code.
+    """
+
+    def __init__(self, names, retention_hours: int = 168, session_precision: int = 10):
+        self.names = names
+        self.retention_hours = retention_hours
+        self.session_precision = session_precision
+        self._hours: Dict[int, Dict[LocationKey, GeoCell]] = {}
+        self.country_names: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def _cell(self, timestamp: float, geo_data: Dict) -> GeoCell:
+        """Get (creating if needed) the cell for a location and hour (lock held)"""
+        hour = int(timestamp // HOUR)
+        cells = self._hours.get(hour)
+        if cells is None:
+            cells = self._hours[hour] = {}
+            oldest_hour = hour - self.retention_hours
+            for expired in [h for h in self._hours if h < oldest_hour]:
+                del self._hours[expired]
+
+        country = geo_data.get("country") or "Unknown"
+        country_code = geo_data.get("country_code") or country
+        self.country_names[country_code] = country
+        key = (country_code, self.names.encode(geo_data.get("city") or "Unknown"))
+        cell = cells.get(key)
+        if cell is None:
+            cell = cells[key] = GeoCell(self.session_precision)
+        return cell
+
+    def record_page_view(self, timestamp: float, geo_data: Dict, session_id: Optional[str]):
+        with self._lock:
+            cell = self._cell(timestamp, geo_data)
+            cell.page_views += 1
+            if session_id:
+                cell.sessions.add(session_id)
+
+    def record_conversion(self, timestamp: float, geo_data: Dict, conversion_type: str,
+                          session_id: Optional[str]):
+        with self._lock:
+            cell = self._cell(timestamp, geo_data)
+            cell.conversions[conversion_type] = cell.conversions.get(conversion_type, 0) + 1
+            if session_id:
+                cell.sessions.add(session_id)
+
+    def window(self, hours: int, now: Optional[float] = None) -> Dict[LocationKey, GeoCell]:
+        """Merge the cells of the last ``hours`` hours by location"""
+        current_hour = int((now if now is not None else time.time()) // HOUR)
+        first_hour = current_hour - hours + 1
+        merged: Dict[LocationKey, GeoCell] = {}
+        with self._lock:
+            # Visit the stored hours (at most the retention) rather than every hour asked for
+            for hour, cells in self._hours.items():
+                if hour < first_hour or hour > current_hour:
+                    continue
+                for key, cell in cells.items():
+                    total = merged.get(key)
+                    if total is None:
+                        total = merged[key] = GeoCell(self.session_precision)
+                    total.merge(cell)
+        return merged
+
+    def location_name(self, key: LocationKey) -> Tuple[str, str]:
+        """Get the (country, city) names of a location key"""
+        country_code, city_id = key
+        return self.country_names.get(country_code, country_code), self.names.decode(city_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get storage statistics"""
+        with self._lock:
+            return {
+                "hours": len(self._hours),
+                "cells": sum(len(cells) for cells in self._hours.values()),
+                "countries": len(self.country_names),
+                "session_precision": self.session_precision
+            }
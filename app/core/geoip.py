@@ -0,0 +1,168 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Any
+import geoip2.database
+import geoip2.errors
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Addresses that never resolve to a location
+_SKIPPED_ADDRESSES = frozenset({"127.0.0.1", "localhost", "unknown"})
+
+# Marker stored for addresses the database does not know about
+_NOT_FOUND = object()
+
+
+class GeoIPResolver:
+    """GeoIP lookups backed by a bounded LRU cache with TTL and negative entries.
+
+    The MMDB file is opened memory-mapped and re-opened when a newer file is
+    dropped in at the same path (checked at most every ``reload_interval``
+    seconds).
+    """
+
+    def __init__(self, database_path: str, cache_size: int = 10000, ttl: int = 3600,
+                 negative_ttl: int = 600, reload_interval: int = 60):
+        self.database_path = database_path
+        self.cache_size = cache_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.reload_interval = reload_interval
+
+        self._reader = None
+        self._database_mtime: Optional[float] = None
+        self._next_reload_check = 0.0
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.reloads = 0
+
+        self._load_reader()
+
+    @property
+    def available(self) -> bool:
+        return self._reader is not None
+
+    def _load_reader(self):
+        """Open (or re-open) the GeoIP database in memory-mapped mode"""
+        try:
+            if not os.path.exists(self.database_path):
+                logger.warning("GeoIP database file not found at: %s", self.database_path)
+                return
+            mtime = os.path.getmtime(self.database_path)
+            reader = geoip2.database.Reader(self.database_path, mode=geoip2.database.MODE_MMAP)
+        except Exception as e:
+            logger.warning("Could not load GeoIP database: %s", e)
+            return
+
+        with self._lock:
+            old_reader = self._reader
+            self._reader = reader
+            self._database_mtime = mtime
+            # Cached results may be stale against the new database
+            self._cache.clear()
+        if old_reader is not None:
+            self.reloads += 1
+            old_reader.close()
+        logger.info("GeoIP database loaded from %s", self.database_path)
+
+    def _maybe_reload(self, now: float):
+        """Re-open the database if a new file has been dropped in"""
+        if now < self._next_reload_check:
+            return
+        self._next_reload_check = now + self.reload_interval
+        try:
+            mtime = os.path.getmtime(self.database_path)
+        except OSError:
+            return
+        if mtime != self._database_mtime:
+            self._load_reader()
+
+    def reload(self):
+        """Force the database to be re-opened"""
+        self._load_reader()
+
+    def lookup(self, ip_address: str) -> Optional[Dict]:
+        """Get geographic data for an IP address"""
+        if ip_address in _SKIPPED_ADDRESSES:
+            return None
+
+        now = time.time()
+        self._maybe_reload(now)
+        if self._reader is None:
+            return None
+
+        with self._lock:
+            entry = self._cache.get(ip_address)
+            if entry is not None:
+                expires_at, geo_data = entry
+                if expires_at > now:
+                    self._cache.move_to_end(ip_address)
+                    if geo_data is _NOT_FOUND:
+                        self.negative_hits += 1
+                        return None
+                    self.hits += 1
+                    return geo_data
+                del self._cache[ip_address]
+            self.misses += 1
+
+        geo_data = self._query(ip_address)
+
+        with self._lock:
+            if geo_data is _NOT_FOUND:
+                self._cache[ip_address] = (now + self.negative_ttl, _NOT_FOUND)
+            elif geo_data is not None:
+                self._cache[ip_address] = (now + self.ttl, geo_data)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+                self.evictions += 1
+
+        return None if geo_data is _NOT_FOUND else geo_data
+
+    def _query(self, ip_address: str):
+        """Query the database, returning _NOT_FOUND for unknown addresses"""
+        try:
+            response = self._reader.city(ip_address)
+            return {
+                "country": response.country.name,
+                "country_code": response.country.iso_code,
+                "city": response.city.name,
+                "latitude": response.location.latitude,
+                "longitude": response.location.longitude,
+                "timezone": response.location.time_zone
+            }
+        except (geoip2.errors.AddressNotFoundError, ValueError):
+            # Unknown or malformed addresses are cached as negative entries
+            logger.debug("Address not found in GeoIP database: %s", ip_address)
+            return _NOT_FOUND
+        except geoip2.errors.GeoIP2Error as e:
+            logger.warning("GeoIP lookup failed for %s: %s", ip_address, e)
+            return None
+        except Exception as e:
+            logger.error("Error getting geographic data for %s: %s", ip_address, e)
+            return None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            "database_loaded": self.available,
+            "database_path": self.database_path,
+            "cache_entries": len(self._cache),
+            "cache_size": self.cache_size,
+            "ttl_seconds": self.ttl,
+            "negative_ttl_seconds": self.negative_ttl,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "reloads": self.reloads,
+            "hit_ratio": round((self.hits + self.negative_hits) / lookups * 100, 2) if lookups else 0
+        }
@@ -0,0 +1,108 @@
+import asyncio
+from collections import Counter
+from typing import Callable, List, Optional, Any, Dict
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class IngestionQueue:
+    """Bounded asyncio queue that moves per-request bookkeeping off the request path.
+
+    Producers call ``submit`` from the event loop; it never waits. A single
+    consumer task takes everything that is queued (up to ``batch_size``
+    records) and hands the batch to ``processor`` in a worker thread, so
+    blocking work such as GeoIP lookups and file writes does not stall the
+    loop. When the queue is full the record is refused and counted under
+    its kind; the caller decides what of it must still be kept. ``stop``
+    drains what is queued before returning.
+    """
+
+    def __init__(self, processor: Callable[[List[Any]], None], max_size: int = 10000,
+                 batch_size: int = 256):
+        self.processor = processor
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._consumer: Optional[asyncio.Task] = None
+
+        self.enqueued = 0
+        self.processed = 0
+        self.batches = 0
+        self.failed = 0
+        self.max_depth = 0
+        self.dropped: Counter = Counter()
+
+    @property
+    def running(self) -> bool:
+        return self._consumer is not None and not self._consumer.done()
+
+    def submit(self, record: Any, kind: str = "request") -> bool:
+        """Queue a record; returns False if it was not queued (not running or full)"""
+        if not self.running:
+            return False
+        try:
+            self._queue.put_nowait(record)
+        except asyncio.QueueFull:
+            self.dropped[kind] += 1
+            return False
+        self.enqueued += 1
+        depth = self._queue.qsize()
+        if depth > self.max_depth:
+            self.max_depth = depth
+        return True
+
+    async def start(self):
+        """Start the consumer task on the running event loop"""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._consumer = asyncio.create_task(self._consume(), name="ingestion-consumer")
+
+    async def stop(self, timeout: float = 10.0):
+        """Process everything still queued, then stop the consumer"""
+        if not self.running:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Ingestion queue drain timed out with {self._queue.qsize()} records left")
+        self._consumer.cancel()
+        try:
+            await self._consumer
+        except asyncio.CancelledError:
+            pass
+        self._consumer = None
+
+    async def _consume(self):
+        queue = self._queue
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < self.batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+            try:
+                await asyncio.to_thread(self.processor, batch)
+                self.processed += len(batch)
+                self.batches += 1
+            except Exception as e:
+                self.failed += len(batch)
+                logger.error(f"Failed to process {len(batch)} ingested records: {e}")
+            finally:
+                for _ in batch:
+                    queue.task_done()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get queue statistics"""
+        return {
+            "running": self.running,
+            "depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_depth": self.max_depth,
+            "max_size": self.max_size,
+            "batch_size": self.batch_size,
+            "enqueued": self.enqueued,
+            "processed": self.processed,
+            "batches": self.batches,
+            "failed": self.failed,
+            "dropped": dict(self.dropped),
+            "avg_batch_size": round(self.processed / self.batches, 2) if self.batches else 0
+        }
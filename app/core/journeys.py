@@ -0,0 +1,200 @@
+import heapq
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Any, Tuple
+
+HOUR = 3600
+
+
+class _TrieNode:
+    """Number of sessions whose path starts with the pages leading to this node.
+
+    ``truncated`` counts the sessions that went on past this node but could
+    not be followed (``max_depth`` or ``max_nodes`` reached).
+    """
+
+    __slots__ = ("count", "truncated", "children")
+
+    def __init__(self):
+        self.count = 0
+        self.truncated = 0
+        self.children: Dict[int, "_TrieNode"] = {}
+
+
+class _JourneyWindow:
+    """Journey counts for one hour"""
+
+    __slots__ = ("root", "nodes", "views", "entries", "transitions", "truncated_paths")
+
+    def __init__(self):
+        self.root = _TrieNode()
+        self.nodes = 0
+        self.views: Counter = Counter()
+        self.entries: Counter = Counter()
+        # transitions[from_page][to_page] -> count
+        self.transitions: Dict[int, Counter] = {}
+        self.truncated_paths = 0
+
+
+class JourneyCursor:
+    """Where a live session currently is in its journey"""
+
+    __slots__ = ("hour", "node", "page", "depth")
+
+    def __init__(self, hour: int, node: Optional[_TrieNode], page: int, depth: int):
+        self.hour = hour
+        self.node = node
+        self.page = page
+        self.depth = depth
+
+
+class JourneyEngine:
+    """Page-to-page transition counts and a bounded prefix trie of session paths.
+
+    Each page view moves the session's cursor one step: the transition from
+    the previous page is counted and the trie node for the path so far is
+    incremented. Paths are counted in the hour their session started and
+    transitions in the hour they happened, so a window query merges only
+    the hours inside it. A trie stops growing at ``max_depth`` pages and
+    at ``max_nodes`` nodes per hour; sessions that go past either are
+    still counted at the deepest node they reached.
+    """
+
+    def __init__(self, max_depth: int = 8, max_nodes: int = 5000, retention_hours: int = 168):
+        self.max_depth = max_depth
+        self.max_nodes = max_nodes
+        self.retention_hours = retention_hours
+        self._windows: Dict[int, _JourneyWindow] = {}
+        self._lock = threading.Lock()
+
+    def _window(self, hour: int) -> _JourneyWindow:
+        window = self._windows.get(hour)
+        if window is None:
+            window = self._windows[hour] = _JourneyWindow()
+            oldest_hour = hour - self.retention_hours
+            for expired in [h for h in self._windows if h < oldest_hour]:
+                del self._windows[expired]
+        return window
+
+    def record_page_view(self, cursor: Optional[JourneyCursor], page: int, timestamp: float) -> JourneyCursor:
+        """Advance a session's cursor to ``page`` and return the new cursor"""
+        hour = int(timestamp // HOUR)
+        with self._lock:
+            current = self._window(hour)
+            current.views[page] += 1
+
+            if cursor is None:
+                # First page of a session
+                current.entries[page] += 1
+                node = current.root.children.get(page)
+                if node is None and current.nodes < self.max_nodes:
+                    node = current.root.children[page] = _TrieNode()
+                    current.nodes += 1
+                if node is None:
+                    current.truncated_paths += 1
+                else:
+                    node.count += 1
+                return JourneyCursor(hour, node, page, 1)
+
+            transitions = current.transitions.get(cursor.page)
+            if transitions is None:
+                transitions = current.transitions[cursor.page] = Counter()
+            transitions[page] += 1
+
+            node = cursor.node
+            if node is not None and cursor.depth < self.max_depth:
+                path_window = self._windows.get(cursor.hour)
+                child = node.children.get(page)
+                if child is None and path_window is not None and path_window.nodes < self.max_nodes:
+                    child = node.children[page] = _TrieNode()
+                    path_window.nodes += 1
+                if child is None:
+                    node.truncated += 1
+                    if path_window is not None:
+                        path_window.truncated_paths += 1
+                else:
+                    child.count += 1
+                node = child
+            elif node is not None:
+                # Past max_depth: the path stays counted at its deepest node
+                node.truncated += 1
+                node = None
+            cursor.node = node
+            cursor.page = page
+            cursor.depth += 1
+            return cursor
+
+    def _hours(self, hours: int, now: float) -> List[_JourneyWindow]:
+        """Get the windows inside the last ``hours`` hours (lock held)"""
+        current_hour = int(now // HOUR)
+        first_hour = current_hour - hours + 1
+        return [window for hour, window in self._windows.items() if first_hour <= hour <= current_hour]
+
+    def top_journeys(self, hours: int, now: float, k: int = 10, min_length: int = 2) -> Tuple[int, List[Tuple[Tuple[int, ...], int, bool]]]:
+        """Get the number of distinct journeys and the ``k`` most common as (pages, sessions, truncated).
+
+        Sessions that ended at a path and sessions cut off there are
+        separate journeys; the latter are reported as truncated.
+        """
+        journeys: Counter = Counter()
+        with self._lock:
+            for window in self._hours(hours, now):
+                stack = [((page,), node) for page, node in window.root.children.items()]
+                while stack:
+                    path, node = stack.pop()
+                    if len(path) >= min_length:
+                        # Sessions that ended exactly here, not deeper
+                        ended = node.count - node.truncated - sum(child.count for child in node.children.values())
+                        if ended > 0:
+                            journeys[path, False] += ended
+                        if node.truncated:
+                            journeys[path, True] += node.truncated
+                    for page, child in node.children.items():
+                        stack.append((path + (page,), child))
+        top = heapq.nlargest(k, journeys.items(), key=lambda item: item[1])
+        return len(journeys), [(path, count, truncated) for (path, truncated), count in top]
+
+    def transition_summary(self, hours: int, now: float) -> Tuple[Counter, Counter, Dict[int, Counter]]:
+        """Merge page views, entries and transitions over the last ``hours`` hours"""
+        views: Counter = Counter()
+        entries: Counter = Counter()
+        transitions: Dict[int, Counter] = {}
+        with self._lock:
+            for window in self._hours(hours, now):
+                views.update(window.views)
+                entries.update(window.entries)
+                for page, targets in window.transitions.items():
+                    merged = transitions.get(page)
+                    if merged is None:
+                        merged = transitions[page] = Counter()
+                    merged.update(targets)
+        return views, entries, transitions
+
+    def next_pages(self, page: int, hours: int, now: float, k: int = 5) -> Dict[str, Any]:
+        """Get the probability of each next page (and of leaving) after ``page``"""
+        views, _, transitions = self.transition_summary(hours, now)
+        return self.summarize_next_pages(page, views, transitions, k)
+
+    @staticmethod
+    def summarize_next_pages(page: int, views: Counter, transitions: Dict[int, Counter], k: int = 5) -> Dict[str, Any]:
+        """Get next-page probabilities for ``page`` from a ``transition_summary``"""
+        targets = transitions.get(page, Counter())
+        page_views = views.get(page, 0)
+        exits = max(page_views - sum(targets.values()), 0)
+        return {
+            "views": page_views,
+            "next": [(target, count / page_views if page_views else 0.0) for target, count in targets.most_common(k)],
+            "exits": exits,
+            "exit_probability": exits / page_views if page_views else 0.0
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get storage statistics"""
+        with self._lock:
+            return {
+                "windows": len(self._windows),
+                "trie_nodes": sum(window.nodes for window in self._windows.values()),
+                "max_nodes_per_window": self.max_nodes,
+                "max_depth": self.max_depth,
+                "truncated_paths": sum(window.truncated_paths for window in self._windows.values())
+            }
@@ -0,0 +1,95 @@
+import time
+import threading
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+class QueryCache:
+    """Short-lived memo of query results keyed by (method, arguments).
+
+    An entry is reused while it is younger than ``ttl`` seconds and was
+    computed at the caller's current data version, so anything ingested
+    since makes the next read recompute. Concurrent misses on the same key
+    wait for one computation instead of each running their own. Cached
+    results are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, ttl: float = 5.0, max_entries: int = 256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # key -> (version, expires at, value)
+        self._entries: Dict[Hashable, Tuple[Any, float, Any]] = {}
+        self._key_locks: Dict[Hashable, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.shared_computations = 0
+
+    def _fresh(self, key: Hashable, version: Any):
+        """Get the entry for ``key`` if it can still be used (lock held)"""
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version and entry[1] > time.monotonic():
+            return entry
+        return None
+
+    def get(self, key: Hashable, version: Any, compute: Callable[[], Any]) -> Any:
+        """Get the cached result for ``key`` at ``version``, computing it on a miss"""
+        if self.ttl <= 0:
+            return compute()
+
+        with self._lock:
+            entry = self._fresh(key, version)
+            if entry is not None:
+                self.hits += 1
+                return entry[2]
+            key_lock = self._key_locks.get(key)
+            if key_lock is None:
+                key_lock = self._key_locks[key] = threading.Lock()
+
+        with key_lock:
+            # Another caller may have computed it while this one waited
+            with self._lock:
+                entry = self._fresh(key, version)
+                if entry is not None:
+                    self.hits += 1
+                    self.shared_computations += 1
+                    return entry[2]
+                self.misses += 1
+
+            value = compute()
+
+            with self._lock:
+                self._entries[key] = (version, time.monotonic() + self.ttl, value)
+                if len(self._entries) > self.max_entries:
+                    self._evict()
+            return value
+
+    def _evict(self):
+        """Drop expired entries, then the oldest, until under the size limit (lock held)"""
+        now = time.monotonic()
+        for key in [key for key, entry in self._entries.items() if entry[1] <= now]:
+            del self._entries[key]
+            self._key_locks.pop(key, None)
+        while len(self._entries) > self.max_entries:
+            key = next(iter(self._entries))
+            del self._entries[key]
+            self._key_locks.pop(key, None)
+
+    def clear(self):
+        """Forget every cached result"""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "ttl_seconds": self.ttl,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "shared_computations": self.shared_computations,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+            }
@@ -0,0 +1,150 @@
+import math
+import time
+import threading
+from typing import Dict, Optional, Any, Tuple
+
+
+class RateLimitDecision:
+    """Outcome of one rate limit check, with what the X-RateLimit headers report"""
+
+    __slots__ = ("allowed", "remaining", "limit", "reset_time", "window")
+
+    def __init__(self, allowed: bool, remaining: int, limit: int, reset_time: float, window: int):
+        self.allowed = allowed
+        self.remaining = remaining
+        self.limit = limit
+        self.reset_time = reset_time
+        self.window = window
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "remaining": self.remaining,
+            "limit": self.limit,
+            "reset_time": self.reset_time,
+            "window": self.window
+        }
+
+
+def sliding_estimate(index: int, current: int, previous: int, window: int, now: float) -> float:
+    """Estimate the requests in the trailing window from two fixed-window counts"""
+    return previous * (1 - (now - index * window) / window) + current
+
+
+def _reset_time(index: int, current: int, previous: int, limit: int, window: int, now: float) -> float:
+    """Get when the next request will be allowed (for a key with none remaining)"""
+    start = index * window
+    if current < limit and previous > 0:
+        # Later in this window, once enough of the previous one has slid out
+        return max(start + window * (1 - (limit - current) / previous), now)
+    # In the next window, once enough of this one has slid out
+    return start + window + window * (1 - limit / current)
+
+
+def remaining_and_reset(index: int, current: int, previous: int, estimate: float, limit: int,
+               window: int, now: float) -> Tuple[int, float]:
+    """Get (remaining, reset time); reset is the window rollover unless none remain"""
+    remaining = max(0, math.ceil(limit - estimate))
+    if remaining:
+        return remaining, (index + 1) * window
+    return 0, _reset_time(index, current, previous, limit, window, now)
+
+
+class SlidingWindowCounter:
+    """Sliding-window-counter rate limit state with constant memory per key.
+
+    Each key keeps only the index of its current fixed window and the counts
+    of that window and the one before it. The number of requests in the
+    trailing ``window`` seconds is estimated by weighting the previous
+    window's count by how much of it still overlaps, which approximates a
+    log of request times without storing them. Keys idle for two whole
+    windows hold no information any more and are evicted by a periodic
+    sweep.
+    """
+
+    def __init__(self, sweep_interval: float = 60.0):
+        self.sweep_interval = sweep_interval
+        # window length -> key -> (window index, count in that window, count in the window before)
+        self._state: Dict[int, Dict[Any, Tuple[int, int, int]]] = {}
+        self._lock = threading.Lock()
+        self._next_sweep = time.time() + sweep_interval
+
+        self.checks = 0
+        self.rejected = 0
+        self.evicted = 0
+
+    def _counts(self, keys: Dict[Any, Tuple[int, int, int]], key: Any, window: int,
+                now: float) -> Tuple[int, int, int, float]:
+        """Get (window index, current count, previous count, estimate) for a key (lock held)"""
+        index = int(now // window)
+        state = keys.get(key)
+        if state is None:
+            current = previous = 0
+        elif state[0] == index:
+            current, previous = state[1], state[2]
+        elif state[0] == index - 1:
+            current, previous = 0, state[1]
+        else:
+            current = previous = 0
+        return index, current, previous, sliding_estimate(index, current, previous, window, now)
+
+    def hit(self, key: Any, limit: int, window: int,
+            now: Optional[float] = None) -> Tuple[bool, int, float]:
+        """Count a request against ``key`` if allowed; returns (allowed, remaining, reset time)"""
+        if now is None:
+            now = time.time()
+        with self._lock:
+            if now >= self._next_sweep:
+                self._sweep(now)
+            self.checks += 1
+            keys = self._state.get(window)
+            if keys is None:
+                keys = self._state[window] = {}
+            index, current, previous, estimate = self._counts(keys, key, window, now)
+            allowed = estimate < limit
+            if allowed:
+                current += 1
+                estimate += 1
+                keys[key] = (index, current, previous)
+            else:
+                self.rejected += 1
+            remaining, reset = remaining_and_reset(index, current, previous, estimate, limit, window, now)
+            return allowed, remaining, reset
+
+    def peek(self, key: Any, limit: int, window: int,
+             now: Optional[float] = None) -> Tuple[int, float]:
+        """Get (remaining, reset time) for ``key`` without counting a request"""
+        if now is None:
+            now = time.time()
+        with self._lock:
+            index, current, previous, estimate = self._counts(self._state.get(window, {}), key, window, now)
+            return remaining_and_reset(index, current, previous, estimate, limit, window, now)
+
+    def _sweep(self, now: float):
+        """Evict keys whose windows have both expired (lock held)"""
+        for window, keys in self._state.items():
+            oldest_index = int(now // window) - 1
+            idle = [key for key, state in keys.items() if state[0] < oldest_index]
+            for key in idle:
+                del keys[key]
+            self.evicted += len(idle)
+        self._next_sweep = now + self.sweep_interval
+
+    def sweep(self, now: Optional[float] = None):
+        """Evict idle keys now"""
+        with self._lock:
+            self._sweep(now if now is not None else time.time())
+
+    def __len__(self) -> int:
+        return sum(len(keys) for keys in self._state.values())
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get limiter statistics"""
+        with self._lock:
+            return {
+                "engine": "sliding_window_counter",
+                "keys": sum(len(keys) for keys in self._state.values()),
+                "checks": self.checks,
+                "rejected": self.rejected,
+                "evicted": self.evicted,
+                "sweep_interval_seconds": self.sweep_interval
+            }
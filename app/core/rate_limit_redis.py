@@ -0,0 +1,180 @@
+import time
+import asyncio
+from typing import Dict, List, Optional, Any, Tuple
+import logging
+
+from app.core.rate_limit import SlidingWindowCounter, sliding_estimate, remaining_and_reset
+
+try:
+    import redis
+    from redis import asyncio as redis_asyncio
+except ImportError:  # optional; only needed for RATE_LIMIT_BACKEND=redis
+    redis = None
+    redis_asyncio = None
+
+logger = logging.getLogger(__name__)
+
+# Sliding window counter over a hash {i: window index, c: current count, p: previous count}.
+# ARGV: limit, window (seconds), now (milliseconds), 1 to count the request or 0 to only read.
+# Returns {allowed, window index, current count, previous count}.
+SLIDING_WINDOW_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local window_ms = tonumber(ARGV[2]) * 1000
+local now_ms = tonumber(ARGV[3])
+local index = math.floor(now_ms / window_ms)
+local state = redis.call('HMGET', KEYS[1], 'i', 'c', 'p')
+local stored = tonumber(state[1])
+local current, previous = 0, 0
+if stored == index then
+    current, previous = tonumber(state[2]) or 0, tonumber(state[3]) or 0
+elseif stored == index - 1 then
+    previous = tonumber(state[2]) or 0
+end
+local estimate = previous * (1 - (now_ms - index * window_ms) / window_ms) + current
+local allowed = 0
+if tonumber(ARGV[4]) == 1 and estimate < limit then
+    allowed = 1
+    current = current + 1
+    redis.call('HSET', KEYS[1], 'i', index, 'c', current, 'p', previous)
+    redis.call('PEXPIRE', KEYS[1], window_ms * 2)
+end
+return {allowed, index, current, previous}
+"""
+
+
+class RedisSlidingWindowCounter:
+    """Sliding-window-counter limiter whose state lives on a Redis-protocol server.
+
+    Each check runs a script that reads, updates and expires the key's two
+    window counts atomically, so all workers and nodes share one limit.
+    Keys expire on the server after two idle windows. Checks are awaited on
+    an asyncio client, so a slow server never blocks the event loop, and
+    the checks that arrive while a round trip is in flight are sent
+    together as one pipeline of up to ``max_batch`` EVALSHAs. When the
+    server cannot be reached, checks go to an in-process counter and the
+    server is retried after ``retry_interval`` seconds.
+    """
+
+    def __init__(self, client, key_prefix: str = "ratelimit:", retry_interval: float = 5.0,
+                 fallback: Optional[SlidingWindowCounter] = None, max_batch: int = 256):
+        self.client = client
+        self.key_prefix = key_prefix.encode()
+        self.retry_interval = retry_interval
+        self.fallback = fallback or SlidingWindowCounter()
+        self.max_batch = max_batch
+        self._script = client.register_script(SLIDING_WINDOW_SCRIPT)
+        self._retry_at = 0.0
+        # (keys, args, future) waiting for the next pipeline
+        self._queue: List[Tuple[list, list, asyncio.Future]] = []
+        self._sending = False
+
+        self.checks = 0
+        self.rejected = 0
+        self.fallback_checks = 0
+        self.errors = 0
+        self.round_trips = 0
+
+    @classmethod
+    def from_url(cls, url: str, timeout: float = 0.05, **kwargs) -> "RedisSlidingWindowCounter":
+        """Connect to the server at ``url`` (needs the ``redis`` package)"""
+        if redis_asyncio is None:
+            raise RuntimeError("The redis package is required for the Redis rate limit backend")
+        client = redis_asyncio.Redis.from_url(url, socket_timeout=timeout, socket_connect_timeout=timeout)
+        return cls(client, **kwargs)
+
+    @property
+    def available(self) -> bool:
+        return time.time() >= self._retry_at
+
+    async def _run(self, key: Any, limit: int, window: int, now: float,
+                   count: bool) -> Optional[Tuple[int, int, int, int]]:
+        """Run the script for a key; None if the server could not be reached"""
+        if not self.available:
+            return None
+        future = asyncio.get_running_loop().create_future()
+        self._queue.append((
+            [self.key_prefix + (key if isinstance(key, bytes) else str(key).encode())],
+            [limit, window, int(now * 1000), 1 if count else 0],
+            future
+        ))
+        if not self._sending:
+            self._sending = True
+            asyncio.get_running_loop().create_task(self._send())
+        result = await future
+        if result is None:
+            return None
+        allowed, index, current, previous = result
+        return int(allowed), int(index), int(current), int(previous)
+
+    async def _send(self):
+        """Send queued checks in pipelines until the queue is empty"""
+        try:
+            while self._queue:
+                batch, self._queue = self._queue[:self.max_batch], self._queue[self.max_batch:]
+                try:
+                    pipeline = self.client.pipeline(transaction=False)
+                    for keys, args, _ in batch:
+                        await self._script(keys=keys, args=args, client=pipeline)
+                    results = await pipeline.execute()
+                    self.round_trips += 1
+                except Exception as e:
+                    self._unavailable(e)
+                    results = [None] * len(batch)
+                for (_, _, future), result in zip(batch, results):
+                    if not future.done():
+                        future.set_result(result)
+        finally:
+            self._sending = False
+
+    def _unavailable(self, error: Exception):
+        """Switch to in-process limits until the retry interval has passed"""
+        self.errors += 1
+        if self.available:
+            logger.error(f"Rate limit backend unavailable, using in-process limits for "
+                         f"{self.retry_interval}s: {error}")
+        self._retry_at = time.time() + self.retry_interval
+
+    async def hit(self, key: Any, limit: int, window: int,
+                  now: Optional[float] = None) -> Tuple[bool, int, float]:
+        """Count a request against ``key`` if allowed; returns (allowed, remaining, reset time)"""
+        if now is None:
+            now = time.time()
+        result = await self._run(key, limit, window, now, count=True)
+        if result is None:
+            self.fallback_checks += 1
+            return self.fallback.hit(key, limit, window, now)
+
+        allowed, index, current, previous = result
+        self.checks += 1
+        if not allowed:
+            self.rejected += 1
+        estimate = sliding_estimate(index, current, previous, window, now)
+        remaining, reset = remaining_and_reset(index, current, previous, estimate, limit, window, now)
+        return bool(allowed), remaining, reset
+
+    async def peek(self, key: Any, limit: int, window: int,
+                   now: Optional[float] = None) -> Tuple[int, float]:
+        """Get (remaining, reset time) for ``key`` without counting a request"""
+        if now is None:
+            now = time.time()
+        result = await self._run(key, limit, window, now, count=False)
+        if result is None:
+            return self.fallback.peek(key, limit, window, now)
+
+        _, index, current, previous = result
+        estimate = sliding_estimate(index, current, previous, window, now)
+        return remaining_and_reset(index, current, previous, estimate, limit, window, now)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get limiter statistics"""
+        return {
+            "engine": "redis_sliding_window_counter",
+            "available": self.available,
+            "checks": self.checks,
+            "rejected": self.rejected,
+            "errors": self.errors,
+            "round_trips": self.round_trips,
+            "queued_checks": len(self._queue),
+            "fallback_checks": self.fallback_checks,
+            "fallback": self.fallback.get_stats()
+        }
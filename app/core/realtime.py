@@ -0,0 +1,152 @@
+import time
+import threading
+from array import array
+from typing import Dict, Optional, Any
+
+
+class SlidingWindowCounter:
+    """Per-second ring of counts with a running total over the whole window.
+
+    Adding to the current second is O(1). Seconds that fall out of the
+    window are subtracted from the total as the head advances, so reading
+    the window total never scans it; the work of expiring old seconds is
+    amortized over the writes and reads that move time forward.
+    """
+
+    __slots__ = ("window", "_counts", "_head", "_total")
+
+    def __init__(self, window: int = 3600, typecode: str = "q"):
+        self.window = window
+        self._counts = array(typecode, bytes(array(typecode).itemsize * window))
+        self._head = int(time.time())  # Newest second held by the ring
+        self._total = 0
+
+    def _advance(self, second: int):
+        """Move the head forward to ``second``, expiring what leaves the window"""
+        head = self._head
+        if second <= head:
+            return
+        counts = self._counts
+        window = self.window
+        if second - head >= window:
+            for slot in range(window):
+                counts[slot] = 0
+            self._total = 0
+        else:
+            for s in range(head + 1, second + 1):
+                slot = s % window
+                self._total -= counts[slot]
+                counts[slot] = 0
+        self._head = second
+
+    def _slot(self, timestamp: float) -> Optional[int]:
+        second = int(timestamp)
+        self._advance(second)
+        if second <= self._head - self.window:
+            return None
+        return second % self.window
+
+    def add(self, timestamp: float, value=1):
+        """Add to the count of the second ``timestamp`` falls in"""
+        slot = self._slot(timestamp)
+        if slot is not None:
+            self._counts[slot] += value
+            self._total += value
+
+    def subtract(self, timestamp: float, value=1):
+        """Take back a count added earlier, if its second is still in the window"""
+        slot = self._slot(timestamp)
+        if slot is not None:
+            self._counts[slot] -= value
+            self._total -= value
+
+    def total(self, now: Optional[float] = None):
+        """Get the sum over the whole window"""
+        self._advance(int(now if now is not None else time.time()))
+        return self._total
+
+    def recent(self, seconds: int, now: Optional[float] = None):
+        """Get the sum over the last ``seconds`` seconds (O(seconds))"""
+        second = int(now if now is not None else time.time())
+        self._advance(second)
+        counts = self._counts
+        window = self.window
+        return sum(counts[s % window] for s in range(second - min(seconds, window) + 1, second + 1))
+
+
+class RealTimeCounters:
+    """Sliding-window counters behind the real-time dashboard.
+
+    Requests, errors, response time, page views and conversions are counted
+    per second over ``window`` seconds. Active sessions are counted by the
+    second each session was last seen in: when a session is seen again its
+    previous second is decremented and the current one incremented, so the
+    total is the number of sessions seen within ``session_window`` seconds.
+    """
+
+    def __init__(self, window: int = 3600, session_window: int = 1800):
+        self.window = window
+        self.session_window = session_window
+        self.requests = SlidingWindowCounter(window)
+        self.errors = SlidingWindowCounter(window)
+        self.response_time = SlidingWindowCounter(window, typecode="d")
+        self.page_views = SlidingWindowCounter(window)
+        self.conversions = SlidingWindowCounter(window)
+        self.active_sessions = SlidingWindowCounter(session_window)
+        self._lock = threading.Lock()
+
+    def record_request(self, timestamp: float, response_time: float, status_code: int):
+        with self._lock:
+            self.requests.add(timestamp)
+            self.response_time.add(timestamp, response_time)
+            if status_code >= 400:
+                self.errors.add(timestamp)
+
+    def record_page_view(self, timestamp: float):
+        with self._lock:
+            self.page_views.add(timestamp)
+
+    def record_conversion(self, timestamp: float):
+        with self._lock:
+            self.conversions.add(timestamp)
+
+    def record_session_seen(self, timestamp: float, previously_seen: Optional[float]):
+        """Move a session's activity from the second it was last seen to ``timestamp``"""
+        with self._lock:
+            if previously_seen is not None:
+                self.active_sessions.subtract(previously_seen)
+            self.active_sessions.add(timestamp)
+
+    def record_session_evicted(self, last_seen: float):
+        """Take back the activity of a session dropped before it went idle"""
+        with self._lock:
+            self.active_sessions.subtract(last_seen)
+
+    def snapshot(self, now: Optional[float] = None) -> Dict[str, Any]:
+        """Read every counter at one instant"""
+        now = now if now is not None else time.time()
+        with self._lock:
+            requests = self.requests.total(now)
+            errors = self.errors.total(now)
+            response_time = self.response_time.total(now)
+            page_views = self.page_views.total(now)
+            conversions = self.conversions.total(now)
+            active_sessions = self.active_sessions.total(now)
+            minute_requests = self.requests.recent(60, now)
+            minute_page_views = self.page_views.recent(60, now)
+
+        return {
+            "window_seconds": self.window,
+            "requests": requests,
+            "errors": errors,
+            "error_rate": round(errors / requests * 100, 2) if requests else 0,
+            "avg_response_time": round(response_time / requests, 3) if requests else 0,
+            "page_views": page_views,
+            "conversions": conversions,
+            "conversion_rate": round(conversions / page_views * 100, 2) if page_views else 0,
+            "active_sessions": active_sessions,
+            "active_session_window_seconds": self.session_window,
+            "current_minute_requests": minute_requests,
+            "current_minute_page_views": minute_page_views,
+            "requests_per_second": round(minute_requests / 60, 2)
+        }
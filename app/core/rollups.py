@@ -0,0 +1,228 @@
+import time
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Any
+
+from app.core.sketches import LatencyHistogram, HyperLogLog
+
+HOUR = 3600
+DAY = 86400
+
+
+class Rollup:
+    """Pre-aggregated counters for one hour or one day"""
+
+    __slots__ = ("period", "bucket_start", "page_views", "conversions", "requests", "errors",
+                 "latency", "sessions")
+
+    def __init__(self, period: str, bucket_start: int):
+        self.period = period
+        self.bucket_start = bucket_start  # Epoch seconds at the start of the bucket
+        self.page_views = 0
+        self.conversions: Dict[str, int] = {}
+        self.requests = 0
+        self.errors = 0
+        self.latency = LatencyHistogram()
+        self.sessions = HyperLogLog()
+
+    @property
+    def total_conversions(self) -> int:
+        return sum(self.conversions.values())
+
+    @property
+    def conversion_rate(self) -> float:
+        return round(self.total_conversions / self.page_views * 100, 2) if self.page_views else 0
+
+    def merge(self, other: "Rollup"):
+        """Add the contents of another rollup for the same bucket into this one"""
+        self.page_views += other.page_views
+        for conversion_type, count in other.conversions.items():
+            self.conversions[conversion_type] = self.conversions.get(conversion_type, 0) + count
+        self.requests += other.requests
+        self.errors += other.errors
+        self.latency.merge(other.latency)
+        self.sessions.merge(other.sessions)
+
+    def to_row(self) -> Dict[str, Any]:
+        """Serialize the rollup for the analytics_rollups table"""
+        return {
+            "period": self.period,
+            "bucket_start": datetime.fromtimestamp(self.bucket_start, tz=timezone.utc),
+            "page_views": self.page_views,
+            "conversions": dict(self.conversions),
+            "requests": self.requests,
+            "errors": self.errors,
+            "latency": self.latency.to_dict(),
+            "sessions": self.sessions.to_bytes()
+        }
+
+    @classmethod
+    def from_row(cls, row) -> "Rollup":
+        """Rebuild a rollup from an analytics_rollups row"""
+        bucket_start = row.bucket_start
+        if bucket_start.tzinfo is None:
+            bucket_start = bucket_start.replace(tzinfo=timezone.utc)
+        rollup = cls(row.period, int(bucket_start.timestamp()))
+        rollup.page_views = row.page_views or 0
+        rollup.conversions = dict(row.conversions or {})
+        rollup.requests = row.requests or 0
+        rollup.errors = row.errors or 0
+        if row.latency:
+            rollup.latency = LatencyHistogram.from_dict(row.latency)
+        if row.sessions:
+            rollup.sessions = HyperLogLog.from_bytes(row.sessions)
+        return rollup
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Format the rollup for API responses"""
+        percentiles = self.latency.quantiles((0.5, 0.95, 0.99))
+        return {
+            "bucket_start": self.bucket_start,
+            "page_views": self.page_views,
+            "conversions": self.total_conversions,
+            "conversions_by_type": dict(self.conversions),
+            "conversion_rate": self.conversion_rate,
+            "requests": self.requests,
+            "error_rate": round(self.errors / self.requests * 100, 2) if self.requests else 0,
+            "avg_response_time": round(self.latency.mean, 3),
+            "p95_response_time": round(percentiles["p95"], 3) if self.requests else 0,
+            "p99_response_time": round(percentiles["p99"], 3) if self.requests else 0,
+            "unique_sessions": self.sessions.count()
+        }
+
+
+class RollupEngine:
+    """Incrementally maintained hourly and daily analytics rollups.
+
+    Every tracked event updates the rollup for its hour and its UTC day, so
+    trend queries read one pre-aggregated row per bucket instead of scanning
+    events. Once a persistence layer calls ``track_deltas``, the same update
+    is also applied to a pending delta rollup; it takes the deltas with
+    ``collect_pending`` and merges them into the stored rows, so several
+    workers can save the same bucket without overwriting each other.
+    """
+
+    PERIODS = (("hour", HOUR), ("day", DAY))
+
+    def __init__(self, hourly_retention_days: int = 7, daily_retention_days: int = 400):
+        self.retention = {"hour": hourly_retention_days * DAY, "day": daily_retention_days * DAY}
+        self.retention_days = max(hourly_retention_days, daily_retention_days)
+        self._rollups: Dict[str, Dict[int, Rollup]] = {"hour": {}, "day": {}}
+        self._pending: Dict[tuple, Rollup] = {}
+        # Deltas are only kept while something collects them
+        self._track_deltas = False
+        self._lock = threading.Lock()
+
+    def track_deltas(self):
+        """Start keeping pending deltas for ``collect_pending``"""
+        with self._lock:
+            self._track_deltas = True
+
+    def _buckets_for(self, timestamp: float) -> List[Rollup]:
+        """Get the hourly and daily rollups and pending deltas for a timestamp (lock held)"""
+        rollups = []
+        pending = self._pending
+        for period, size in self.PERIODS:
+            bucket_start = int(timestamp // size) * size
+            by_start = self._rollups[period]
+            rollup = by_start.get(bucket_start)
+            if rollup is None:
+                rollup = by_start[bucket_start] = Rollup(period, bucket_start)
+                self._expire(period, bucket_start)
+            rollups.append(rollup)
+            if self._track_deltas:
+                delta = pending.get((period, bucket_start))
+                if delta is None:
+                    delta = pending[(period, bucket_start)] = Rollup(period, bucket_start)
+                rollups.append(delta)
+        return rollups
+
+    def _expire(self, period: str, newest_start: int):
+        oldest_start = newest_start - self.retention[period]
+        by_start = self._rollups[period]
+        for bucket_start in [b for b in by_start if b < oldest_start]:
+            del by_start[bucket_start]
+        # Deltas that were never collected expire with their buckets
+        for key in [key for key in self._pending if key[0] == period and key[1] < oldest_start]:
+            del self._pending[key]
+
+    def record_page_view(self, timestamp: float, session_id: Optional[str]):
+        with self._lock:
+            for rollup in self._buckets_for(timestamp):
+                rollup.page_views += 1
+                if session_id:
+                    rollup.sessions.add(session_id)
+
+    def record_conversion(self, timestamp: float, conversion_type: str, session_id: Optional[str]):
+        with self._lock:
+            for rollup in self._buckets_for(timestamp):
+                rollup.conversions[conversion_type] = rollup.conversions.get(conversion_type, 0) + 1
+                if session_id:
+                    rollup.sessions.add(session_id)
+
+    def record_request(self, timestamp: float, response_time: float, status_code: int):
+        with self._lock:
+            for rollup in self._buckets_for(timestamp):
+                rollup.requests += 1
+                if status_code >= 400:
+                    rollup.errors += 1
+                rollup.latency.add(response_time)
+
+    def series(self, period: str, count: int, now: Optional[float] = None,
+               persisted: Optional[Dict[int, Rollup]] = None) -> List[Dict[str, Any]]:
+        """Get the last ``count`` hourly or daily rollups, newest first.
+
+        With ``persisted`` (stored rollups by bucket start) the stored rows
+        plus this process's unsaved deltas are reported instead of the
+        in-memory rollups, which only hold what this process has seen.
+        """
+        size = HOUR if period == "hour" else DAY
+        current_start = int((now if now is not None else time.time()) // size) * size
+        by_start = self._rollups[period]
+        result = []
+        with self._lock:
+            for i in range(count):
+                bucket_start = current_start - i * size
+                if persisted is None:
+                    rollup = by_start.get(bucket_start) or Rollup(period, bucket_start)
+                else:
+                    rollup = Rollup(period, bucket_start)
+                    if bucket_start in persisted:
+                        rollup.merge(persisted[bucket_start])
+                    if (period, bucket_start) in self._pending:
+                        rollup.merge(self._pending[(period, bucket_start)])
+                result.append(rollup.to_dict())
+        return result
+
+    def collect_pending(self) -> List[Rollup]:
+        """Take the deltas recorded since the last call"""
+        with self._lock:
+            pending = list(self._pending.values())
+            self._pending = {}
+        return pending
+
+    def requeue(self, deltas: List[Rollup]):
+        """Put back deltas that could not be saved"""
+        with self._lock:
+            for delta in deltas:
+                current = self._pending.get((delta.period, delta.bucket_start))
+                if current is None:
+                    self._pending[(delta.period, delta.bucket_start)] = delta
+                else:
+                    current.merge(delta)
+
+    def restore(self, rollup: Rollup):
+        """Load a persisted rollup, merging it with anything recorded since startup"""
+        with self._lock:
+            by_start = self._rollups[rollup.period]
+            current = by_start.get(rollup.bucket_start)
+            if current is None:
+                by_start[rollup.bucket_start] = rollup
+            else:
+                current.merge(rollup)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get storage statistics"""
+        stats: Dict[str, Any] = {period: len(by_start) for period, by_start in self._rollups.items()}
+        stats["pending"] = len(self._pending)
+        return stats
@@ -0,0 +1,182 @@
+import re
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from starlette.requests import Request
+
+# (path prefix, method or None for any, rate limit key); the first listed match wins
+RATE_LIMIT_RULES = (
+    ("/api/contact/send-message", None, "contact_send_message"),
+    ("/api/contact/book-call", None, "contact_book_call"),
+    ("/api/reviews", "POST", "review_create"),
+    ("/api/newsletter/subscribe", None, "newsletter_subscribe"),
+    ("/api/resume/download", None, "resume_download"),
+    ("/api/auth/login", None, "admin_login"),
+    ("/api/auth/change-password", None, "admin_change_password"),
+    ("/api/analytics", "GET", "admin_analytics"),
+    ("/api/experience", None, "admin_dashboard"),
+    ("/api/projects", None, "admin_dashboard"),
+    ("/api/reviews/admin", None, "admin_dashboard"),
+    ("/api/newsletter/admin", None, "admin_dashboard"),
+    ("/api/contact/admin", None, "admin_dashboard"),
+    ("/api/leads", None, "admin_dashboard"),
+    ("/api/admin", None, "admin_general"),
+)
+DEFAULT_RATE_LIMIT_KEY = "api_general"
+
+# (path prefix, method or None for any, audit event type); unmatched paths are typed by status
+EVENT_TYPE_RULES = (
+    ("/api/auth/login", None, "admin_login"),
+    ("/api/auth/change-password", None, "admin_change_password"),
+    ("/api/contact/send-message", None, "contact_message"),
+    ("/api/contact/book-call", None, "call_booking"),
+    ("/api/reviews", None, "review_action"),
+    ("/api/newsletter/subscribe", None, "newsletter_subscription"),
+    ("/api/resume/download", None, "resume_download"),
+    ("/api/admin", None, "admin_action"),
+)
+
+# Main website pages whose views are tracked; admin pages are not
+FRONTEND_ROUTES = frozenset(("/", "/about", "/projects", "/experience", "/contact", "/resume"))
+
+# User actions tracked as behavior; admin and auth actions are not
+USER_ACTIONS = {
+    ("/api/contact/send-message", "POST"): "contact_form_submit",
+    ("/api/contact/book-call", "POST"): "call_booking",
+    ("/api/reviews", "POST"): "review_submit",
+    ("/api/newsletter/subscribe", "POST"): "newsletter_signup",
+    ("/api/resume/download", "GET"): "resume_download",
+    ("/api/analytics/track/conversion", "POST"): "conversion_tracked",
+    ("/api/analytics/track/behavior", "POST"): "behavior_tracked"
+}
+
+
+# Reported for requests that matched no route, whatever their path
+UNMATCHED_ROUTE = "<unmatched>"
+
+# Path segments that look like ids: numbers, hex digests and UUIDs
+_ID_SEGMENT = re.compile(r"^(\d+|[0-9a-fA-F]{8,}|[0-9a-fA-F]{8}-[0-9a-fA-F-]{27})$")
+
+
+def route_template(scope: Dict[str, Any]) -> str:
+    """Get the path template of the route that handled a request, e.g. ``/api/projects/{project_id}``"""
+    route = scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED_ROUTE
+
+
+def normalize_page(path: str) -> str:
+    """Reduce a client-reported page path to a template by dropping the query and replacing id segments"""
+    path = path.split("?", 1)[0].split("#", 1)[0]
+    return "/".join("{id}" if _ID_SEGMENT.match(segment) else segment for segment in path.split("/"))
+
+
+class RouteClass:
+    """How the security middleware treats a (method, path): immutable and shared between requests"""
+
+    __slots__ = ("rate_limit_key", "event_type", "frontend_route", "action")
+
+    def __init__(self, rate_limit_key: str, event_type: Optional[str], frontend_route: bool, action: Optional[str]):
+        object.__setattr__(self, "rate_limit_key", rate_limit_key)
+        object.__setattr__(self, "event_type", event_type)
+        object.__setattr__(self, "frontend_route", frontend_route)
+        object.__setattr__(self, "action", action)
+
+    def __setattr__(self, name: str, value: Any):
+        raise AttributeError("RouteClass is immutable")
+
+    def __repr__(self) -> str:
+        return (f"RouteClass(rate_limit_key={self.rate_limit_key!r}, event_type={self.event_type!r}, "
+                f"frontend_route={self.frontend_route!r}, action={self.action!r})")
+
+    @property
+    def admin_action(self) -> bool:
+        return self.rate_limit_key.startswith("admin_")
+
+    @property
+    def user_action(self) -> bool:
+        return self.action is not None
+
+    def audit_event_type(self, status_code: int) -> str:
+        """Get the audit event type for a response with ``status_code``"""
+        if self.event_type is not None:
+            return self.event_type
+        return "error" if status_code >= 400 else "api_request"
+
+
+class PrefixTrie:
+    """Character trie of path prefix rules.
+
+    Matching walks the path once, only as far as it shares a prefix with
+    some rule, and returns the value of the first listed rule whose prefix
+    and method match, so rule order keeps the meaning of a chain of
+    ``startswith`` checks.
+    """
+
+    def __init__(self, rules: Iterable[Tuple[str, Optional[str], str]]):
+        self._root: Dict[Any, Any] = {}
+        for priority, (prefix, method, value) in enumerate(rules):
+            node = self._root
+            for char in prefix:
+                node = node.setdefault(char, {})
+            # None cannot be a path character, so it holds the rules ending here
+            node.setdefault(None, []).append((priority, method, value))
+
+    def match(self, method: str, path: str, default: Optional[str] = None) -> Optional[str]:
+        """Get the value of the first rule matching (method, path), or ``default``"""
+        best = None
+        node = self._root
+        for char in path:
+            node = node.get(char)
+            if node is None:
+                break
+            for rule in node.get(None, ()):
+                if (rule[1] is None or rule[1] == method) and (best is None or rule[0] < best[0]):
+                    best = rule
+        return best[2] if best is not None else default
+
+
+class RouteClassifier:
+    """Classifies requests for rate limiting, auditing and analytics with one lookup.
+
+    The rule tables are compiled into prefix tries once. Each distinct
+    descriptor is built once and shared, and recent (method, path) pairs are
+    memoized up to ``max_entries``. ``classify`` keeps the descriptor on
+    ``request.state.route_class`` so later callers reuse it.
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._rate_limit_keys = PrefixTrie(RATE_LIMIT_RULES)
+        self._event_types = PrefixTrie(EVENT_TYPE_RULES)
+        self._descriptors: Dict[Tuple, RouteClass] = {}
+        self._cache: Dict[Tuple[str, str], RouteClass] = {}
+
+    def lookup(self, method: str, path: str) -> RouteClass:
+        """Get the descriptor for (method, path)"""
+        route = self._cache.get((method, path))
+        if route is not None:
+            return route
+
+        fields = (
+            self._rate_limit_keys.match(method, path, DEFAULT_RATE_LIMIT_KEY),
+            self._event_types.match(method, path),
+            path in FRONTEND_ROUTES,
+            USER_ACTIONS.get((path, method))
+        )
+        route = self._descriptors.get(fields)
+        if route is None:
+            route = self._descriptors.setdefault(fields, RouteClass(*fields))
+        if len(self._cache) >= self.max_entries:
+            # Paths with ids are unbounded; start over rather than track recency
+            self._cache.clear()
+        self._cache[(method, path)] = route
+        return route
+
+    def classify(self, request: Request) -> RouteClass:
+        """Get the descriptor for a request, cached on ``request.state``"""
+        route = getattr(request.state, "route_class", None)
+        if route is None:
+            route = request.state.route_class = self.lookup(request.method, request.scope["path"])
+        return route
+
+
+route_classifier = RouteClassifier()
@@ -1,13 +1,21 @@
 import time
+import asyncio
 import hashlib
 import json
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Any, Tuple
 from fastapi import HTTPException, Request
-from collections import defaultdict
 import os
 import logging
 
+from app.core.config import settings
+from app.core.rate_limit import SlidingWindowCounter, RateLimitDecision
+from app.core.rate_limit_redis import RedisSlidingWindowCounter, redis as redis_client
+from app.core.audit_store import AuditLogStore
+from app.core.security_alerts import SecurityAlertEngine
+from app.core.security_summary import SecuritySummary
+from app.core.query_cache import QueryCache
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -16,7 +24,10 @@ class RateLimiter:
     """Rate limiter for API endpoints"""
     
     def __init__(self):
-        self.requests: Dict[str, List[float]] = defaultdict(list)
+        # Two counters per client and endpoint instead of a timestamp per request
+        self.engine = self._create_engine()
+        # The Redis engine's checks are coroutines, the in-process engine's are not
+        self._async_engine = asyncio.iscoroutinefunction(self.engine.hit)
         self.limits = {
             # Contact endpoints
             "contact_send_message": {"requests": 20, "window": 300},  # 20 requests per 5 minutes
@@ -42,6 +53,27 @@ class RateLimiter:
             "api_general": {"requests": 1000, "window": 3600},        # 1000 requests per hour
         }
     
+    def _create_engine(self):
+        """Create the limiter engine: in-process, or shared through Redis when configured"""
+        local = SlidingWindowCounter(
+            sweep_interval=float(os.getenv("RATE_LIMIT_SWEEP_INTERVAL", "60"))
+        )
+        if os.getenv("RATE_LIMIT_BACKEND", "memory") != "redis":
+            return local
+        if redis_client is None:
+            # Asked for explicitly; per-worker limits would quietly multiply the allowance
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis needs the redis package (pip install redis)")
+        try:
+            return RedisSlidingWindowCounter.from_url(
+                settings.REDIS_URL,
+                timeout=float(os.getenv("RATE_LIMIT_REDIS_TIMEOUT", "0.05")),
+                retry_interval=float(os.getenv("RATE_LIMIT_REDIS_RETRY_INTERVAL", "5")),
+                fallback=local
+            )
+        except Exception as e:
+            logger.error(f"Could not set up the Redis rate limit backend, using in-process limits: {e}")
+            return local
+    
     def _get_client_ip(self, request: Request) -> str:
         """Get client IP address"""
         # Check for forwarded headers (for proxy/load balancer)
@@ -61,69 +93,70 @@ class RateLimiter:
         """Get user agent for additional identification"""
         return request.headers.get("User-Agent", "unknown")
     
-    def _generate_key(self, request: Request, endpoint: str) -> str:
+    def _generate_key(self, request: Request, endpoint: str) -> bytes:
         """Generate unique key for rate limiting"""
-        client_ip = self._get_client_ip(request)
-        user_agent = self._get_user_agent(request)
+        client_ip, user_agent = self.identify(request)
         
         # Create a hash of IP + User-Agent + Endpoint
         key_data = f"{client_ip}:{user_agent}:{endpoint}"
-        return hashlib.md5(key_data.encode()).hexdigest()
+        return hashlib.md5(key_data.encode()).digest()
     
-    def is_rate_limited(self, request: Request, endpoint: str) -> bool:
-        """Check if request should be rate limited"""
-        # Skip rate limiting in development mode
-        if os.getenv("ENVIRONMENT", "development") == "development":
-            return False
-            
-        key = self._generate_key(request, endpoint)
-        now = time.time()
+    def identify(self, request: Request) -> Tuple[str, str]:
+        """Get the client IP and user agent of a request, worked out once and kept on ``request.state``"""
+        state = request.state
+        client_ip = getattr(state, "client_ip", None)
+        if client_ip is None:
+            client_ip = state.client_ip = self._get_client_ip(request)
+            state.user_agent = self._get_user_agent(request)
+        return client_ip, state.user_agent
+    
+    async def _hit(self, key: bytes, limit: int, window: int) -> Tuple[bool, int, float]:
+        if self._async_engine:
+            return await self.engine.hit(key, limit, window)
+        return self.engine.hit(key, limit, window)
+    
+    async def _peek(self, key: bytes, limit: int, window: int) -> Tuple[int, float]:
+        if self._async_engine:
+            return await self.engine.peek(key, limit, window)
+        return self.engine.peek(key, limit, window)
+    
+    async def check(self, request: Request, endpoint: str) -> RateLimitDecision:
+        """Count a request against its limit and decide whether it may proceed.
         
-        # Get rate limit config
+        The client is hashed and its counter updated once; the decision also
+        carries the remaining allowance and reset time for the response headers.
+        The key is kept on ``request.state.rate_limit_key``. Shared backends
+        are awaited so they never block the event loop.
+        """
         limit_config = self.limits.get(endpoint, self.limits["api_general"])
         max_requests = limit_config["requests"]
         window = limit_config["window"]
         
-        # Clean old requests outside the window
-        self.requests[key] = [req_time for req_time in self.requests[key] 
-                            if now - req_time < window]
+        key = request.state.rate_limit_key = self._generate_key(request, endpoint)
         
-        # Check if limit exceeded
-        if len(self.requests[key]) >= max_requests:
-            return True
+        # Skip rate limiting in development mode
+        if os.getenv("ENVIRONMENT", "development") == "development":
+            remaining, reset_time = await self._peek(key, max_requests, window)
+            return RateLimitDecision(True, remaining, max_requests, reset_time, window)
         
-        # Add current request
-        self.requests[key].append(now)
-        return False
+        allowed, remaining, reset_time = await self._hit(key, max_requests, window)
+        return RateLimitDecision(allowed, remaining, max_requests, reset_time, window)
     
-    def get_remaining_requests(self, request: Request, endpoint: str) -> Dict[str, Any]:
+    async def is_rate_limited(self, request: Request, endpoint: str) -> bool:
+        """Check if request should be rate limited"""
+        return not (await self.check(request, endpoint)).allowed
+    
+    async def get_remaining_requests(self, request: Request, endpoint: str) -> Dict[str, Any]:
         """Get remaining requests and reset time"""
-        key = self._generate_key(request, endpoint)
-        now = time.time()
-        
         limit_config = self.limits.get(endpoint, self.limits["api_general"])
-        max_requests = limit_config["requests"]
-        window = limit_config["window"]
-        
-        # Clean old requests
-        self.requests[key] = [req_time for req_time in self.requests[key] 
-                            if now - req_time < window]
-        
-        remaining = max(0, max_requests - len(self.requests[key]))
-        
-        # Calculate reset time
-        if self.requests[key]:
-            oldest_request = min(self.requests[key])
-            reset_time = oldest_request + window
-        else:
-            reset_time = now
-        
-        return {
-            "remaining": remaining,
-            "limit": max_requests,
-            "reset_time": reset_time,
-            "window": window
-        }
+        key = self._generate_key(request, endpoint)
+        remaining, reset_time = await self._peek(key, limit_config["requests"], limit_config["window"])
+        return RateLimitDecision(remaining > 0, remaining, limit_config["requests"], reset_time,
+                                 limit_config["window"]).to_dict()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get limiter statistics"""
+        return self.engine.get_stats()
 
 class AuditLogger:
     """Audit logger for security events"""
@@ -131,6 +164,55 @@ class AuditLogger:
     def __init__(self):
         self.log_file = "audit.log"
         self.sensitive_fields = {"password", "token", "secret", "key"}
+        
+        # Records are buffered, written by a background thread once started, and
+        # stored in hourly segments; audit.log is only read for older history
+        self.store = AuditLogStore(
+            os.getenv("AUDIT_LOG_DIR", "audit_logs"),
+            legacy_path=self.log_file,
+            batch_size=int(os.getenv("AUDIT_LOG_BATCH_SIZE", "256")),
+            max_buffer_size=int(os.getenv("AUDIT_LOG_MAX_BUFFER", "10000")),
+            flush_interval=float(os.getenv("AUDIT_LOG_FLUSH_INTERVAL", "1")),
+            fsync=os.getenv("AUDIT_LOG_FSYNC", "interval"),
+            fsync_interval=float(os.getenv("AUDIT_LOG_FSYNC_INTERVAL", "5")),
+            max_bytes=int(os.getenv("AUDIT_LOG_MAX_BYTES", str(50 * 1024 * 1024))),
+            retention_hours=int(os.getenv("AUDIT_LOG_RETENTION_HOURS", "0")),
+            compress=os.getenv("AUDIT_LOG_COMPRESS", "false").lower() == "true"
+        )
+        
+        # Alert state is updated as events are logged rather than rebuilt from the log
+        self.alerts = SecurityAlertEngine(
+            window_hours=int(os.getenv("SECURITY_ALERT_WINDOW_HOURS", "24")),
+            retention_hours=int(os.getenv("SECURITY_ALERT_RETENTION_HOURS", "168")),
+            max_ips_per_hour=int(os.getenv("SECURITY_ALERT_MAX_IPS", "10000"))
+        )
+        
+        # One scan per window serves every admin security endpoint for a few seconds
+        self.summaries = QueryCache(
+            ttl=float(os.getenv("SECURITY_SUMMARY_CACHE_TTL", "5")),
+            max_entries=int(os.getenv("SECURITY_SUMMARY_CACHE_SIZE", "16"))
+        )
+    
+    def start(self):
+        """Write audit records from a background thread instead of the caller"""
+        self.store.start()
+        self._replay_alerts()
+    
+    def _replay_alerts(self):
+        """Rebuild alert state from the events logged in the alert window"""
+        since = time.time() - self.alerts.window_hours * 3600
+        records = (
+            (datetime.fromisoformat(record["timestamp"]).replace(tzinfo=timezone.utc).timestamp(), record)
+            for _, record in self.store.iter_records(since)
+        )
+        try:
+            self.alerts.replay(records)
+        except (ValueError, KeyError) as e:
+            logger.warning(f"Could not rebuild security alert state from the audit log: {e}")
+    
+    def stop(self):
+        """Write buffered audit records and close the log file"""
+        self.store.stop()
     
     def _sanitize_data(self, data: Any) -> Any:
         """Remove sensitive data from logs"""
@@ -152,15 +234,57 @@ class AuditLogger:
                   request_data: Optional[Dict] = None, 
                   response_data: Optional[Dict] = None,
                   user_id: Optional[str] = None,
-                  admin_action: bool = False):
+                  admin_action: bool = False,
+                  timestamp: Optional[float] = None):
         """Log security event"""
-        timestamp = datetime.utcnow().isoformat()
+        self.log_events([{
+            "event_type": event_type,
+            "user_ip": user_ip,
+            "user_agent": user_agent,
+            "endpoint": endpoint,
+            "method": method,
+            "status_code": status_code,
+            "request_data": request_data,
+            "response_data": response_data,
+            "user_id": user_id,
+            "admin_action": admin_action,
+            "timestamp": timestamp
+        }])
+    
+    def log_events(self, events: List[Dict[str, Any]]):
+        """Log several security events (``log_event`` keyword dicts) with a single write"""
+        records = []
+        for event in events:
+            log_entry = self._build_entry(**event)
+            timestamp = event.get("timestamp") or time.time()
+            records.append((timestamp, json.dumps(log_entry) + "\n"))
+            self.alerts.record(timestamp, log_entry)
+            
+            # Also log to console for important events
+            if log_entry["admin_action"] or log_entry["status_code"] >= 400:
+                logger.info(f"AUDIT: {log_entry['event_type']} - {log_entry['method']} {log_entry['endpoint']} - Status: {log_entry['status_code']} - IP: {log_entry['user_ip']}")
+        
+        # Buffered; written in the background
+        self.store.write_records(records)
+    
+    def _build_entry(self, event_type: str, user_ip: str, user_agent: str,
+                     endpoint: str, method: str, status_code: int,
+                     request_data: Optional[Dict] = None,
+                     response_data: Optional[Dict] = None,
+                     user_id: Optional[str] = None,
+                     admin_action: bool = False,
+                     timestamp: Optional[float] = None) -> Dict[str, Any]:
+        """Build a sanitized log entry"""
+        if timestamp is None:
+            timestamp = datetime.utcnow().isoformat()
+        else:
+            timestamp = datetime.utcfromtimestamp(timestamp).isoformat()
         
         # Sanitize sensitive data
         sanitized_request = self._sanitize_data(request_data) if request_data else None
         sanitized_response = self._sanitize_data(response_data) if response_data else None
         
-        log_entry = {
+        return {
             "timestamp": timestamp,
             "event_type": event_type,
             "user_ip": user_ip,
@@ -173,84 +297,32 @@ class AuditLogger:
             "request_data": sanitized_request,
             "response_data": sanitized_response
         }
-        
-        # Write to log file
-        try:
-            with open(self.log_file, "a") as f:
-                f.write(json.dumps(log_entry) + "\n")
-        except Exception as e:
-            logger.error(f"Failed to write audit log: {e}")
-        
-        # Also log to console for important events
-        if admin_action or status_code >= 400:
-            logger.info(f"AUDIT: {event_type} - {method} {endpoint} - Status: {status_code} - IP: {user_ip}")
     
     def get_recent_events(self, hours: int = 24, event_type: Optional[str] = None) -> List[Dict]:
-        """Get recent audit events"""
-        events = []
-        cutoff_time = datetime.utcnow() - timedelta(hours=hours)
-        
-        try:
-            with open(self.log_file, "r") as f:
-                for line in f:
-                    try:
-                        event = json.loads(line.strip())
-                        event_time = datetime.fromisoformat(event["timestamp"])
-                        
-                        if event_time >= cutoff_time:
-                            if event_type is None or event["event_type"] == event_type:
-                                events.append(event)
-                    except json.JSONDecodeError:
-                        continue
-        except FileNotFoundError:
-            pass
-        
-        return sorted(events, key=lambda x: x["timestamp"], reverse=True)
+        """Get recent audit events, newest first"""
+        since = time.time() - hours * 3600
+        return [
+            event for _, event in self.store.iter_records(since)
+            if event_type is None or event["event_type"] == event_type
+        ]
     
     def get_security_alerts(self, hours: int = 24) -> List[Dict]:
         """Get security alerts from recent events"""
-        events = self.get_recent_events(hours)
-        alerts = []
-        
-        # Check for suspicious patterns
-        ip_activity = defaultdict(list)
-        failed_logins = []
-        rate_limit_violations = []
-        
-        for event in events:
-            ip_activity[event["user_ip"]].append(event)
-            
-            if event["event_type"] == "admin_login" and event["status_code"] == 401:
-                failed_logins.append(event)
-            
-            if event["event_type"] == "rate_limit_exceeded":
-                rate_limit_violations.append(event)
-        
-        # Generate alerts
-        for ip, activities in ip_activity.items():
-            if len(activities) > 50:  # High activity
-                alerts.append({
-                    "type": "high_activity",
-                    "ip": ip,
-                    "count": len(activities),
-                    "description": f"High activity detected from IP {ip}: {len(activities)} requests"
-                })
-        
-        if len(failed_logins) > 10:
-            alerts.append({
-                "type": "failed_logins",
-                "count": len(failed_logins),
-                "description": f"Multiple failed login attempts: {len(failed_logins)}"
-            })
-        
-        if rate_limit_violations:
-            alerts.append({
-                "type": "rate_limit_violations",
-                "count": len(rate_limit_violations),
-                "description": f"Rate limit violations: {len(rate_limit_violations)}"
-            })
-        
-        return alerts
+        return self.alerts.get_alerts(hours)
+    
+    def get_suspicious_activity(self, hours: int = 24) -> List[Dict]:
+        """Get suspicious activity patterns per IP from recent events"""
+        return self.alerts.get_suspicious_activity(hours)
+    
+    def get_summary(self, hours: int = 24) -> SecuritySummary:
+        """Get every security aggregate for the last ``hours`` hours, cached briefly"""
+        # Every request is audited, so the summary is reused for the TTL rather than per data version
+        return self.summaries.get(hours, None, lambda: self._compute_summary(hours))
+    
+    def _compute_summary(self, hours: int) -> SecuritySummary:
+        # Stream the window from the store instead of holding it as a list
+        since = time.time() - hours * 3600
+        return SecuritySummary.build(hours, (event for _, event in self.store.iter_records(since)))
 
 class SecurityUtils:
     """Security utility functions"""
@@ -0,0 +1,320 @@
+import time
+import threading
+from collections import deque
+from typing import Dict, List, Optional, Any, Iterable, Tuple
+
+from app.core.sketches import HyperLogLog
+
+HOUR = 3600
+
+# More audit events than this from one IP in the window is high activity
+HIGH_ACTIVITY_THRESHOLD = 50
+# More failed admin logins than this from one IP is suspicious
+IP_FAILED_LOGIN_THRESHOLD = 5
+# More failed admin logins than this overall raises an alert
+FAILED_LOGIN_ALERT_THRESHOLD = 10
+# More distinct user agents than this from one IP is suspicious
+USER_AGENT_THRESHOLD = 3
+
+
+class _IPActivity:
+    """What one IP did in one hour"""
+
+    __slots__ = ("requests", "failed_logins", "rate_limited", "agents", "agent_samples",
+                 "recent", "failed_login_events", "rate_limit_events")
+
+    def __init__(self, agent_precision: int, max_samples: int):
+        self.requests = 0
+        self.failed_logins = 0
+        self.rate_limited = 0
+        self.agents = HyperLogLog(agent_precision)
+        self.agent_samples: List[str] = []
+        self.recent: deque = deque(maxlen=max_samples)
+        self.failed_login_events: deque = deque(maxlen=max_samples)
+        self.rate_limit_events: deque = deque(maxlen=max_samples)
+
+
+class _AlertHour:
+    """Per-IP activity and overall counts for one hour"""
+
+    __slots__ = ("ips", "failed_logins", "rate_limited", "untracked_requests")
+
+    def __init__(self):
+        self.ips: Dict[str, _IPActivity] = {}
+        self.failed_logins = 0
+        self.rate_limited = 0
+        self.untracked_requests = 0
+
+
+def _add_sample(samples: deque, event: Dict[str, Any], replay: bool):
+    """Keep the newest events; replays arrive newest first"""
+    if not replay:
+        samples.append(event)
+    elif len(samples) < samples.maxlen:
+        samples.appendleft(event)
+
+
+class SecurityAlertEngine:
+    """Incrementally maintained security alert state, fed one audit event at a time.
+
+    Events are counted per IP in hourly buckets: requests, failed admin
+    logins, rate limit violations, a HyperLogLog of user agents and a few
+    recent sample events. Running per-IP totals over the last
+    ``window_hours`` hours are kept alongside, adding each event and
+    subtracting whole hours as they leave the window, together with the
+    set of IPs whose totals cross an alert threshold; a query for that
+    window only visits flagged IPs. Other windows merge the hourly buckets
+    they cover. An hour tracks at most ``max_ips_per_hour`` IPs; events
+    from further IPs are only counted in the hour's totals.
+    """
+
+    def __init__(self, window_hours: int = 24, retention_hours: int = 168, max_ips_per_hour: int = 10000,
+                 max_samples: int = 5, agent_precision: int = 8):
+        self.window_hours = window_hours
+        self.retention_hours = max(retention_hours, window_hours)
+        self.max_ips_per_hour = max_ips_per_hour
+        self.max_samples = max_samples
+        self.agent_precision = agent_precision
+
+        self._hours: Dict[int, _AlertHour] = {}
+        self._current_hour: Optional[int] = None
+        # ip -> [requests, failed logins, rate limit violations, {user agent: hours seen}] over the window
+        self._totals: Dict[str, List[Any]] = {}
+        self._flagged: set = set()
+        self._lock = threading.Lock()
+
+        self.recorded = 0
+        self.untracked_ips = 0
+
+    def record(self, timestamp: float, event: Dict[str, Any], replay: bool = False):
+        """Count an audit log entry; ``replay`` marks older entries fed newest first"""
+        hour = int(timestamp // HOUR)
+        ip = event.get("user_ip") or "unknown"
+        failed_login = event.get("event_type") == "admin_login" and event.get("status_code") == 401
+        rate_limited = event.get("event_type") == "rate_limit_exceeded"
+
+        with self._lock:
+            if self._current_hour is None or hour > self._current_hour:
+                self._advance(hour)
+            if hour <= self._current_hour - self.retention_hours:
+                return
+            self.recorded += 1
+
+            bucket = self._hours.get(hour)
+            if bucket is None:
+                bucket = self._hours[hour] = _AlertHour()
+            if failed_login:
+                bucket.failed_logins += 1
+            if rate_limited:
+                bucket.rate_limited += 1
+
+            activity = bucket.ips.get(ip)
+            if activity is None:
+                if len(bucket.ips) >= self.max_ips_per_hour:
+                    bucket.untracked_requests += 1
+                    self.untracked_ips += 1
+                    return
+                activity = bucket.ips[ip] = _IPActivity(self.agent_precision, self.max_samples)
+
+            activity.requests += 1
+            _add_sample(activity.recent, event, replay)
+            if failed_login:
+                activity.failed_logins += 1
+                _add_sample(activity.failed_login_events, event, replay)
+            if rate_limited:
+                activity.rate_limited += 1
+                _add_sample(activity.rate_limit_events, event, replay)
+            user_agent = event.get("user_agent") or ""
+            activity.agents.add(user_agent)
+            new_agent = user_agent not in activity.agent_samples and len(activity.agent_samples) < self.max_samples
+            if new_agent:
+                activity.agent_samples.append(user_agent)
+
+            if hour > self._current_hour - self.window_hours:
+                totals = self._totals.get(ip)
+                if totals is None:
+                    totals = self._totals[ip] = [0, 0, 0, {}]
+                totals[0] += 1
+                totals[1] += failed_login
+                totals[2] += rate_limited
+                if new_agent:
+                    # Count hours per agent so one agent seen every hour is still one agent
+                    totals[3][user_agent] = totals[3].get(user_agent, 0) + 1
+                self._flag(ip, totals)
+
+    def replay(self, entries: Iterable[Tuple[float, Dict[str, Any]]]):
+        """Rebuild state from stored (timestamp, entry) pairs, newest first"""
+        for timestamp, entry in entries:
+            self.record(timestamp, entry, replay=True)
+
+    def _flag(self, ip: str, totals: List[Any]):
+        """Update whether an IP is flagged from its window totals (lock held)"""
+        if (totals[0] > HIGH_ACTIVITY_THRESHOLD or totals[1] > IP_FAILED_LOGIN_THRESHOLD
+                or totals[2] or len(totals[3]) > USER_AGENT_THRESHOLD):
+            self._flagged.add(ip)
+        else:
+            self._flagged.discard(ip)
+
+    def _advance(self, hour: int):
+        """Move the window to end at ``hour``, subtracting hours that leave it (lock held)"""
+        previous = self._current_hour
+        self._current_hour = hour
+        if previous is not None:
+            for leaving in range(previous - self.window_hours + 1, hour - self.window_hours + 1):
+                bucket = self._hours.get(leaving)
+                if bucket is None:
+                    continue
+                for ip, activity in bucket.ips.items():
+                    totals = self._totals[ip]
+                    totals[0] -= activity.requests
+                    totals[1] -= activity.failed_logins
+                    totals[2] -= activity.rate_limited
+                    agents = totals[3]
+                    for agent in activity.agent_samples:
+                        if agents.get(agent, 0) > 1:
+                            agents[agent] -= 1
+                        else:
+                            agents.pop(agent, None)
+                    if totals[0] <= 0:
+                        del self._totals[ip]
+                        self._flagged.discard(ip)
+                    else:
+                        self._flag(ip, totals)
+        oldest_hour = hour - self.retention_hours
+        for expired in [h for h in self._hours if h <= oldest_hour]:
+            del self._hours[expired]
+
+    def _window(self, hours: int) -> List[_AlertHour]:
+        """Get the buckets of the last ``hours`` hours, newest first (lock held)"""
+        current_hour = int(time.time() // HOUR)
+        if self._current_hour is None or current_hour > self._current_hour:
+            self._advance(current_hour)
+        return [self._hours[hour] for hour in range(current_hour, current_hour - hours, -1) if hour in self._hours]
+
+    def _candidate_ips(self, hours: int, window: List[_AlertHour]) -> Iterable[str]:
+        """IPs that may cross a threshold in the window (lock held)"""
+        if hours == self.window_hours:
+            return list(self._flagged)
+        ips = set()
+        for bucket in window:
+            ips.update(bucket.ips)
+        return ips
+
+    def _ip_summary(self, ip: str, window: List[_AlertHour]) -> Dict[str, Any]:
+        """Merge one IP's hourly activity over a window (lock held)"""
+        activities = [bucket.ips[ip] for bucket in window if ip in bucket.ips]
+        summary = {
+            "requests": sum(activity.requests for activity in activities),
+            "failed_logins": sum(activity.failed_logins for activity in activities),
+            "rate_limited": sum(activity.rate_limited for activity in activities),
+            "activities": activities
+        }
+        agent_samples = []
+        for activity in activities:
+            for agent in activity.agent_samples:
+                if agent not in agent_samples:
+                    agent_samples.append(agent)
+        if len(agent_samples) > USER_AGENT_THRESHOLD or sum(len(a.agent_samples) for a in activities) > USER_AGENT_THRESHOLD:
+            agents = HyperLogLog(self.agent_precision)
+            for activity in activities:
+                agents.merge(activity.agents)
+            summary["user_agent_count"] = max(agents.count(), len(agent_samples))
+        else:
+            summary["user_agent_count"] = len(agent_samples)
+        summary["user_agents"] = agent_samples[:self.max_samples]
+        return summary
+
+    def _newest(self, activities: List[_AlertHour], field: str) -> List[Dict[str, Any]]:
+        """Get up to ``max_samples`` sample events of a kind, newest first"""
+        events = []
+        for activity in activities:
+            events.extend(reversed(getattr(activity, field)))
+            if len(events) >= self.max_samples:
+                break
+        return events[:self.max_samples]
+
+    def get_alerts(self, hours: int = 24) -> List[Dict[str, Any]]:
+        """Get security alerts for the last ``hours`` hours"""
+        alerts = []
+        with self._lock:
+            window = self._window(hours)
+            for ip in self._candidate_ips(hours, window):
+                requests = sum(bucket.ips[ip].requests for bucket in window if ip in bucket.ips)
+                if requests > HIGH_ACTIVITY_THRESHOLD:
+                    alerts.append({
+                        "type": "high_activity",
+                        "ip": ip,
+                        "count": requests,
+                        "description": f"High activity detected from IP {ip}: {requests} requests"
+                    })
+            failed_logins = sum(bucket.failed_logins for bucket in window)
+            rate_limited = sum(bucket.rate_limited for bucket in window)
+
+        if failed_logins > FAILED_LOGIN_ALERT_THRESHOLD:
+            alerts.append({
+                "type": "failed_logins",
+                "count": failed_logins,
+                "description": f"Multiple failed login attempts: {failed_logins}"
+            })
+        if rate_limited:
+            alerts.append({
+                "type": "rate_limit_violations",
+                "count": rate_limited,
+                "description": f"Rate limit violations: {rate_limited}"
+            })
+        return alerts
+
+    def get_suspicious_activity(self, hours: int = 24) -> List[Dict[str, Any]]:
+        """Get suspicious patterns per IP for the last ``hours`` hours"""
+        suspicious = []
+        with self._lock:
+            window = self._window(hours)
+            for ip in self._candidate_ips(hours, window):
+                summary = self._ip_summary(ip, window)
+                activities = summary["activities"]
+                if summary["requests"] > HIGH_ACTIVITY_THRESHOLD:
+                    suspicious.append({
+                        "type": "high_activity",
+                        "ip": ip,
+                        "count": summary["requests"],
+                        "description": f"High activity detected: {summary['requests']} requests",
+                        "events": self._newest(activities, "recent")
+                    })
+                if summary["failed_logins"] > IP_FAILED_LOGIN_THRESHOLD:
+                    suspicious.append({
+                        "type": "failed_logins",
+                        "ip": ip,
+                        "count": summary["failed_logins"],
+                        "description": f"Multiple failed login attempts: {summary['failed_logins']}",
+                        "events": self._newest(activities, "failed_login_events")
+                    })
+                if summary["rate_limited"]:
+                    suspicious.append({
+                        "type": "rate_limit_violations",
+                        "ip": ip,
+                        "count": summary["rate_limited"],
+                        "description": f"Rate limit violations: {summary['rate_limited']}",
+                        "events": self._newest(activities, "rate_limit_events")
+                    })
+                if summary["user_agent_count"] > USER_AGENT_THRESHOLD:
+                    suspicious.append({
+                        "type": "multiple_user_agents",
+                        "ip": ip,
+                        "count": summary["user_agent_count"],
+                        "description": f"Multiple user agents from same IP: {summary['user_agent_count']}",
+                        "user_agents": summary["user_agents"]
+                    })
+        return suspicious
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get engine statistics"""
+        with self._lock:
+            return {
+                "window_hours": self.window_hours,
+                "hours": len(self._hours),
+                "tracked_ips": sum(len(bucket.ips) for bucket in self._hours.values()),
+                "window_ips": len(self._totals),
+                "flagged_ips": len(self._flagged),
+                "recorded": self.recorded,
+                "untracked_ips": self.untracked_ips
+            }
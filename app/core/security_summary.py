@@ -0,0 +1,70 @@
+from typing import Dict, List, Any, Iterable, Tuple
+
+# Rate limit violations kept per endpoint for display
+RECENT_VIOLATIONS = 10
+# Entries in the top IP and status code lists
+TOP_ENTRIES = 10
+
+
+class SecuritySummary:
+    """Every aggregate the admin security endpoints report for one window.
+
+    Built from a single newest-first pass over the window's audit events:
+    the number of events, counts by event type, IP and status code,
+    admin actions and errors, and rate limit violations by endpoint. Alerts
+    and suspicious patterns are not part of it; they come straight from the
+    incrementally maintained alert state. Summaries are shared between
+    requests and must be treated as read-only.
+    """
+
+    def __init__(self, hours: int):
+        self.hours = hours
+        self.total_requests = 0
+        self.event_counts: Dict[str, int] = {}
+        self.ip_activity: Dict[str, int] = {}
+        self.status_codes: Dict[int, int] = {}
+        self.admin_actions = 0
+        self.errors = 0
+        # endpoint -> {"count": ..., "recent_violations": [...]}
+        self.violations_by_endpoint: Dict[str, Dict[str, Any]] = {}
+        self.total_violations = 0
+
+    @classmethod
+    def build(cls, hours: int, events: Iterable[Dict[str, Any]]) -> "SecuritySummary":
+        """Aggregate the window's events, newest first, in one pass"""
+        summary = cls(hours)
+        for event in events:
+            summary.add(event)
+        return summary
+
+    def add(self, event: Dict[str, Any]):
+        """Count one audit event"""
+        self.total_requests += 1
+
+        event_type = event["event_type"]
+        self.event_counts[event_type] = self.event_counts.get(event_type, 0) + 1
+        ip = event["user_ip"]
+        self.ip_activity[ip] = self.ip_activity.get(ip, 0) + 1
+        status_code = event["status_code"]
+        self.status_codes[status_code] = self.status_codes.get(status_code, 0) + 1
+        if event.get("admin_action", False):
+            self.admin_actions += 1
+        if status_code >= 400:
+            self.errors += 1
+
+        if event_type == "rate_limit_exceeded":
+            self.total_violations += 1
+            violations = self.violations_by_endpoint.get(event["endpoint"])
+            if violations is None:
+                violations = self.violations_by_endpoint[event["endpoint"]] = {"count": 0, "recent_violations": []}
+            violations["count"] += 1
+            if len(violations["recent_violations"]) < RECENT_VIOLATIONS:
+                violations["recent_violations"].append(event)
+
+    def top_ips(self) -> List[Tuple[str, int]]:
+        """Get the most active IPs"""
+        return sorted(self.ip_activity.items(), key=lambda x: x[1], reverse=True)[:TOP_ENTRIES]
+
+    def top_status_codes(self) -> List[Tuple[int, int]]:
+        """Get the most frequent status codes"""
+        return sorted(self.status_codes.items(), key=lambda x: x[1], reverse=True)[:TOP_ENTRIES]
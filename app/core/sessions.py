@@ -0,0 +1,179 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Any, Callable
+
+
+class Session:
+    """Compact per-visitor session state"""
+
+    __slots__ = ("session_id", "start_time", "last_seen", "page_count", "user_ip", "geo_data", "journey")
+
+    def __init__(self, session_id: str, start_time: float, user_ip: str, geo_data: Optional[Dict]):
+        self.session_id = session_id
+        self.start_time = start_time
+        self.last_seen = start_time
+        self.page_count = 0
+        self.user_ip = user_ip
+        self.geo_data = geo_data
+        self.journey = None  # Cursor owned by the journey engine
+
+    @property
+    def duration(self) -> float:
+        return self.last_seen - self.start_time
+
+    @property
+    def bounced(self) -> bool:
+        return self.page_count == 1
+
+
+class _MinuteAggregate:
+    """Running totals for the sessions that started in one minute"""
+
+    __slots__ = ("sessions", "pages", "bounces", "multi_page_sessions", "duration_total")
+
+    def __init__(self):
+        self.sessions = 0
+        self.pages = 0
+        self.bounces = 0
+        self.multi_page_sessions = 0
+        self.duration_total = 0.0
+
+
+class SessionStore:
+    """Bounded session store with idle-timeout eviction and running aggregates.
+
+    Sessions are kept in least-recently-seen order, so idle and overflow
+    eviction both pop from the front in O(1). Every page view also updates
+    totals for the minute the session started in, which is what the summary
+    endpoints read; evicting a session does not change those totals.
+
+    ``on_activity(timestamp, previously_seen)`` is called for every page view
+    with the session's previous last-seen time (None for a new session).
+    ``on_overflow(last_seen)`` is called for each session evicted by the cap,
+    so activity counted for it can be taken back; a returning id starts a
+    new session.
+    """
+
+    def __init__(self, idle_timeout: int = 1800, max_sessions: int = 50000, retention_hours: int = 168,
+                 on_activity: Optional[Callable[[float, Optional[float]], None]] = None,
+                 on_overflow: Optional[Callable[[float], None]] = None):
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.retention_hours = retention_hours
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._by_minute: Dict[int, _MinuteAggregate] = {}
+        self._lock = threading.Lock()
+        self.on_activity = on_activity
+        self.on_overflow = on_overflow
+        self.evicted_idle = 0
+        self.evicted_overflow = 0
+
+    def record_page_view(self, session_id: str, timestamp: float,
+                         user_ip: str, geo_data: Optional[Dict]) -> Session:
+        """Add a page view to a session, starting the session if needed"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            previously_seen = None
+            if session is None:
+                session = Session(session_id, timestamp, user_ip, geo_data)
+                self._sessions[session_id] = session
+                aggregate = self._minute_aggregate(int(timestamp // 60))
+                aggregate.sessions += 1
+                aggregate.bounces += 1
+            else:
+                self._sessions.move_to_end(session_id)
+                aggregate = self._minute_aggregate(int(session.start_time // 60))
+                if session.page_count == 1:
+                    aggregate.bounces -= 1
+                    aggregate.multi_page_sessions += 1
+                previously_seen = session.last_seen
+                previous_duration = session.duration
+                session.last_seen = max(session.last_seen, timestamp)
+                aggregate.duration_total += session.duration - previous_duration
+
+            session.page_count += 1
+            aggregate.pages += 1
+            if self.on_activity is not None:
+                self.on_activity(session.last_seen, previously_seen)
+            self._evict(timestamp)
+        return session
+
+    def _minute_aggregate(self, minute: int) -> _MinuteAggregate:
+        aggregate = self._by_minute.get(minute)
+        if aggregate is None:
+            aggregate = self._by_minute[minute] = _MinuteAggregate()
+            # A new minute is the natural point to drop expired ones
+            oldest_minute = minute - self.retention_hours * 60
+            for expired in [m for m in self._by_minute if m < oldest_minute]:
+                del self._by_minute[expired]
+        return aggregate
+
+    def _evict(self, now: float):
+        """Drop idle sessions and enforce the session cap (lock held)"""
+        sessions = self._sessions
+        idle_cutoff = now - self.idle_timeout
+        while sessions:
+            oldest = next(iter(sessions.values()))
+            if oldest.last_seen >= idle_cutoff:
+                break
+            sessions.popitem(last=False)
+            self.evicted_idle += 1
+        while len(sessions) > self.max_sessions:
+            _, evicted = sessions.popitem(last=False)
+            self.evicted_overflow += 1
+            if self.on_overflow is not None:
+                self.on_overflow(evicted.last_seen)
+
+    def get(self, session_id: str) -> Optional[Session]:
+        return self._sessions.get(session_id)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def active_count(self, seconds: float, now: Optional[float] = None) -> int:
+        """Count sessions seen in the last ``seconds`` seconds"""
+        cutoff = (now if now is not None else time.time()) - seconds
+        count = 0
+        with self._lock:
+            for session in reversed(self._sessions.values()):
+                if session.last_seen < cutoff:
+                    break
+                count += 1
+        return count
+
+    def get_window_summary(self, hours: int, now: Optional[float] = None) -> Dict[str, Any]:
+        """Summarize the sessions that started in the last ``hours`` hours"""
+        now = now if now is not None else time.time()
+        current_minute = int(now // 60)
+        # Nothing older than the retention is kept, so don't look for it
+        first_minute = int((now - min(hours, self.retention_hours) * 3600) // 60)
+        totals = _MinuteAggregate()
+        with self._lock:
+            for minute in range(first_minute, current_minute + 1):
+                aggregate = self._by_minute.get(minute)
+                if aggregate is None:
+                    continue
+                totals.sessions += aggregate.sessions
+                totals.pages += aggregate.pages
+                totals.bounces += aggregate.bounces
+                totals.multi_page_sessions += aggregate.multi_page_sessions
+                totals.duration_total += aggregate.duration_total
+
+        return {
+            "total_sessions": totals.sessions,
+            "avg_session_duration": round(totals.duration_total / totals.multi_page_sessions, 2) if totals.multi_page_sessions else 0,
+            "avg_pages_per_session": round(totals.pages / totals.sessions, 2) if totals.sessions else 0,
+            "bounce_rate": (totals.bounces / totals.sessions) * 100 if totals.sessions else 0.0
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get storage statistics"""
+        return {
+            "live_sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "idle_timeout_seconds": self.idle_timeout,
+            "minute_aggregates": len(self._by_minute),
+            "evicted_idle": self.evicted_idle,
+            "evicted_overflow": self.evicted_overflow
+        }
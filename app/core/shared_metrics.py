@@ -0,0 +1,217 @@
+import os
+import time
+import sqlite3
+import threading
+from collections import defaultdict
+from typing import Dict, Optional, Any
+import logging
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS counter_deltas (
+        name TEXT NOT NULL,
+        minute INTEGER NOT NULL,
+        value REAL NOT NULL,
+        PRIMARY KEY (name, minute)
+    ) WITHOUT ROWID""",
+    "CREATE INDEX IF NOT EXISTS ix_counter_deltas_minute ON counter_deltas (minute)",
+    """CREATE TABLE IF NOT EXISTS session_activity (
+        session_id TEXT PRIMARY KEY,
+        last_seen REAL NOT NULL
+    ) WITHOUT ROWID""",
+    "CREATE INDEX IF NOT EXISTS ix_session_activity_last_seen ON session_activity (last_seen)",
+)
+
+
+class SharedMetricsStore:
+    """Counters shared by all worker processes through a SQLite WAL file.
+
+    Each worker adds to named per-minute counters in memory and a background
+    thread folds those deltas into the shared file every ``flush_interval``
+    seconds with one upsert per (name, minute). Readers sum the minutes of a
+    window across all workers. WAL mode lets workers read while another
+    writes. Session last-seen times are shared the same way so active
+    sessions are counted once however many workers served them. Reads add
+    this worker's unpublished deltas to the stored rows without writing.
+
+    Callers should use bounded names (route templates, not raw paths); as a
+    backstop a worker publishes at most ``max_names`` distinct names and
+    counts any further ones under ``<kind>:other``.
+    """
+
+    OTHER = "other"
+
+    def __init__(self, path: str, flush_interval: float = 1.0, retention_hours: int = 168,
+                 session_window: int = 1800, max_names: int = 5000):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.retention_hours = retention_hours
+        self.session_window = session_window
+        self.max_names = max_names
+        self._names: set = set()
+
+        self._pending: Dict[tuple, float] = defaultdict(float)
+        self._pending_sessions: Dict[str, float] = {}
+        self._pending_lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._next_prune = 0.0
+
+        self.flushes = 0
+        self.flushed_deltas = 0
+        self.failed_flushes = 0
+        self.overflowed = 0
+
+        self._connection = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        for statement in _SCHEMA:
+            self._connection.execute(statement)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def add(self, name: str, timestamp: float, value: float = 1):
+        """Add to a named counter for the minute ``timestamp`` falls in"""
+        with self._pending_lock:
+            if name not in self._names:
+                if len(self._names) >= self.max_names:
+                    self.overflowed += 1
+                    name = name.split(":", 1)[0] + ":" + self.OTHER
+                self._names.add(name)
+            self._pending[(name, int(timestamp // 60))] += value
+
+    def touch_session(self, session_id: str, timestamp: float):
+        """Record that a session was active at ``timestamp``"""
+        with self._pending_lock:
+            if timestamp > self._pending_sessions.get(session_id, 0):
+                self._pending_sessions[session_id] = timestamp
+
+    def start(self):
+        """Start the background flush thread"""
+        if self.running:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="shared-metrics", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the flush thread and publish the remaining deltas"""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stopping.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self) -> int:
+        """Publish this worker's pending deltas to the shared file"""
+        now = time.time()
+        # Readers hold the file lock while they read the file and then the
+        # pending deltas, so deltas in flight are never missing from both
+        with self._db_lock:
+            with self._pending_lock:
+                pending, self._pending = self._pending, defaultdict(float)
+                sessions, self._pending_sessions = self._pending_sessions, {}
+            if not pending and not sessions:
+                return 0
+            try:
+                connection = self._connection
+                connection.execute("BEGIN IMMEDIATE")
+                connection.executemany(
+                    "INSERT INTO counter_deltas (name, minute, value) VALUES (?, ?, ?) "
+                    "ON CONFLICT (name, minute) DO UPDATE SET value = value + excluded.value",
+                    [(name, minute, value) for (name, minute), value in pending.items()]
+                )
+                connection.executemany(
+                    "INSERT INTO session_activity (session_id, last_seen) VALUES (?, ?) "
+                    "ON CONFLICT (session_id) DO UPDATE SET last_seen = max(last_seen, excluded.last_seen)",
+                    list(sessions.items())
+                )
+                if now >= self._next_prune:
+                    self._prune(now)
+                connection.execute("COMMIT")
+            except sqlite3.Error as e:
+                if self._connection.in_transaction:
+                    self._connection.execute("ROLLBACK")
+                self.failed_flushes += 1
+                logger.error(f"Failed to publish {len(pending)} shared analytics deltas: {e}")
+                # Keep the deltas for the next attempt
+                with self._pending_lock:
+                    for key, value in pending.items():
+                        self._pending[key] += value
+                    for session_id, last_seen in sessions.items():
+                        self._pending_sessions[session_id] = max(last_seen, self._pending_sessions.get(session_id, 0))
+                return 0
+
+        self.flushes += 1
+        self.flushed_deltas += len(pending)
+        return len(pending)
+
+    def _prune(self, now: float):
+        """Delete minutes and sessions that have left their windows (transaction open)"""
+        oldest_minute = int(now // 60) - self.retention_hours * 60
+        self._connection.execute("DELETE FROM counter_deltas WHERE minute < ?", (oldest_minute,))
+        self._connection.execute("DELETE FROM session_activity WHERE last_seen < ?", (now - self.session_window,))
+        self._next_prune = now + 60
+
+    def totals(self, seconds: float, prefix: str = "", now: Optional[float] = None) -> Dict[str, float]:
+        """Sum every counter named ``prefix*`` over the last ``seconds`` seconds, across workers"""
+        now = now if now is not None else time.time()
+        first_minute = int((now - seconds) // 60) + 1 if seconds >= 60 else int(now // 60)
+        query = "SELECT name, SUM(value) FROM counter_deltas WHERE minute >= ?"
+        params: list = [first_minute]
+        if prefix:
+            # Range scan on the primary key instead of LIKE, which would need escaping
+            query += " AND name >= ? AND name < ?"
+            params += [prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)]
+        query += " GROUP BY name"
+        with self._db_lock:
+            totals = {name: value for name, value in self._connection.execute(query, params)}
+            # A worker always sees its own writes, published or not
+            with self._pending_lock:
+                for (name, minute), value in self._pending.items():
+                    if minute >= first_minute and name.startswith(prefix):
+                        totals[name] = totals.get(name, 0) + value
+        return totals
+
+    def active_sessions(self, seconds: Optional[float] = None, now: Optional[float] = None) -> int:
+        """Count the sessions any worker has seen in the last ``seconds`` seconds"""
+        cutoff = (now if now is not None else time.time()) - (seconds or self.session_window)
+        with self._db_lock:
+            with self._pending_lock:
+                unpublished = [session_id for session_id, last_seen in self._pending_sessions.items()
+                               if last_seen >= cutoff]
+            count = self._connection.execute(
+                "SELECT COUNT(*) FROM session_activity WHERE last_seen >= ?", (cutoff,)
+            ).fetchone()[0]
+            # Unpublished sessions the file already counts as active are not counted twice
+            for i in range(0, len(unpublished), 500):
+                chunk = unpublished[i:i + 500]
+                count += len(chunk) - self._connection.execute(
+                    f"SELECT COUNT(*) FROM session_activity WHERE last_seen >= ? "
+                    f"AND session_id IN ({','.join('?' * len(chunk))})", [cutoff, *chunk]
+                ).fetchone()[0]
+        return count
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get flush statistics"""
+        return {
+            "path": self.path,
+            "running": self.running,
+            "pid": os.getpid(),
+            "pending_deltas": len(self._pending),
+            "pending_sessions": len(self._pending_sessions),
+            "flush_interval_seconds": self.flush_interval,
+            "flushes": self.flushes,
+            "flushed_deltas": self.flushed_deltas,
+            "failed_flushes": self.failed_flushes,
+            "names": len(self._names),
+            "overflowed_names": self.overflowed
+        }
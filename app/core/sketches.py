@@ -0,0 +1,221 @@
+import math
+import hashlib
+from typing import Dict, Iterable, Optional, Any
+
+
+class LatencyHistogram:
+    """Log-bucketed latency histogram with bounded relative error.
+
+    Values are counted in buckets whose boundaries grow geometrically by
+    ``gamma = (1 + accuracy) / (1 - accuracy)``, so any quantile is reported
+    within ``accuracy`` relative error of the true value. Updates are O(1),
+    histograms merge by adding bucket counts, and the number of buckets is
+    capped by collapsing the lowest ones together.
+    """
+
+    __slots__ = ("accuracy", "max_buckets", "_gamma_log", "buckets", "zero_count",
+                 "count", "total", "min", "max")
+
+    # Values at or below this (in seconds) are counted as zero
+    MIN_VALUE = 1e-6
+
+    def __init__(self, accuracy: float = 0.01, max_buckets: int = 2048):
+        self.accuracy = accuracy
+        self.max_buckets = max_buckets
+        self._gamma_log = math.log((1 + accuracy) / (1 - accuracy))
+        self.buckets: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float, count: int = 1):
+        """Record a value"""
+        self.count += count
+        self.total += value * count
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+        if value <= self.MIN_VALUE:
+            self.zero_count += count
+            return
+        index = math.ceil(math.log(value) / self._gamma_log)
+        buckets = self.buckets
+        buckets[index] = buckets.get(index, 0) + count
+        if len(buckets) > self.max_buckets:
+            self._collapse()
+
+    def _collapse(self):
+        """Fold the two lowest buckets together to bound memory"""
+        lowest, second = sorted(self.buckets)[:2]
+        self.buckets[second] += self.buckets.pop(lowest)
+
+    def merge(self, other: "LatencyHistogram"):
+        """Add the contents of another histogram into this one"""
+        if not other.count:
+            return
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.zero_count += other.zero_count
+        buckets = self.buckets
+        for index, count in other.buckets.items():
+            buckets[index] = buckets.get(index, 0) + count
+        while len(buckets) > self.max_buckets:
+            self._collapse()
+
+    def _bucket_value(self, index: int) -> float:
+        # Midpoint (in relative terms) of the bucket (gamma^(i-1), gamma^i]
+        return 2 * math.exp(index * self._gamma_log) / (1 + math.exp(self._gamma_log))
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Get the approximate value at quantile ``q`` (0..1)"""
+        if not self.count:
+            return None
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return max(self.min, 0.0)
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if rank < seen:
+                # Never report outside the observed range
+                return min(max(self._bucket_value(index), self.min), self.max)
+        return self.max
+
+    def quantiles(self, qs: Iterable[float]) -> Dict[str, Optional[float]]:
+        """Get several quantiles keyed like ``p50`` / ``p999``"""
+        result = {}
+        for q in qs:
+            label = "p" + f"{q * 100:g}".replace(".", "")
+            result[label] = self.quantile(q)
+        return result
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize the histogram to plain JSON types"""
+        return {
+            "accuracy": self.accuracy,
+            "zero_count": self.zero_count,
+            "count": self.count,
+            "total": self.total,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+            "buckets": {str(index): count for index, count in self.buckets.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LatencyHistogram":
+        """Rebuild a histogram serialized with ``to_dict``"""
+        histogram = cls(accuracy=data.get("accuracy", 0.01))
+        histogram.zero_count = data.get("zero_count", 0)
+        histogram.count = data.get("count", 0)
+        histogram.total = data.get("total", 0.0)
+        if histogram.count:
+            histogram.min = data["min"]
+            histogram.max = data["max"]
+        histogram.buckets = {int(index): count for index, count in data.get("buckets", {}).items()}
+        return histogram
+
+
+class HyperLogLog:
+    """Fixed-size distinct counter (HyperLogLog with linear counting for small sets).
+
+    Uses ``2 ** precision`` one-byte registers, giving a standard error of
+    about ``1.04 / sqrt(2 ** precision)``. Sketches with the same precision
+    merge by taking the register-wise maximum. Until a sketch has touched
+    ``2 ** precision / 64`` registers it keeps them in a small dict instead,
+    so the many sketches that only ever see a handful of values stay small.
+    """
+
+    __slots__ = ("precision", "registers", "sparse")
+
+    def __init__(self, precision: int = 12, registers: Optional[bytes] = None):
+        self.precision = precision
+        self.registers: Optional[bytearray] = bytearray(registers) if registers is not None else None
+        self.sparse: Optional[Dict[int, int]] = None if registers is not None else {}
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+    def _densify(self):
+        registers = bytearray(1 << self.precision)
+        for index, rank in self.sparse.items():
+            registers[index] = rank
+        self.registers = registers
+        self.sparse = None
+
+    def add(self, value: str):
+        """Add a value to the set"""
+        hashed = self._hash(value)
+        index = hashed >> (64 - self.precision)
+        remaining_bits = 64 - self.precision
+        rest = hashed & ((1 << remaining_bits) - 1)
+        rank = remaining_bits - rest.bit_length() + 1
+        sparse = self.sparse
+        if sparse is not None:
+            if rank > sparse.get(index, 0):
+                sparse[index] = rank
+                if len(sparse) > (1 << self.precision) >> 6:
+                    self._densify()
+        elif rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: "HyperLogLog"):
+        """Add the contents of another sketch into this one"""
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches with different precision")
+        if other.sparse is not None:
+            for index, rank in other.sparse.items():
+                if self.sparse is not None:
+                    if rank > self.sparse.get(index, 0):
+                        self.sparse[index] = rank
+                elif rank > self.registers[index]:
+                    self.registers[index] = rank
+            if self.sparse is not None and len(self.sparse) > (1 << self.precision) >> 6:
+                self._densify()
+            return
+        if self.sparse is not None:
+            self._densify()
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def count(self) -> int:
+        """Estimate the number of distinct values added"""
+        size = 1 << self.precision
+        if self.sparse is not None:
+            zeros = size - len(self.sparse)
+            harmonic_sum = zeros + sum(2.0 ** -rank for rank in self.sparse.values())
+        else:
+            zeros = self.registers.count(0)
+            harmonic_sum = sum(2.0 ** -rank for rank in self.registers)
+        alpha = 0.7213 / (1 + 1.079 / size)
+        estimate = alpha * size * size / harmonic_sum
+        if estimate <= 2.5 * size and zeros:
+            # Linear counting is more accurate for small cardinalities
+            estimate = size * math.log(size / zeros)
+        return int(round(estimate))
+
+    def to_bytes(self) -> bytes:
+        if self.sparse is not None:
+            registers = bytearray(1 << self.precision)
+            for index, rank in self.sparse.items():
+                registers[index] = rank
+            return bytes(registers)
+        return bytes(self.registers)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "HyperLogLog":
+        return cls(precision=len(data).bit_length() - 1, registers=data)
@@ -1,135 +1,218 @@
 from fastapi import Request, Response
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from app.core.security import rate_limiter, audit_logger
 from app.core.analytics import analytics_tracker
+from app.core.ingestion import IngestionQueue
+from app.core.route_classifier import route_classifier, route_template
 import time
-import json
+import os
 
-class SecurityMiddleware(BaseHTTPMiddleware):
-    """Security middleware for rate limiting and audit logging"""
+
+def process_request_records(records: list):
+    """Run the analytics and audit bookkeeping for a batch of requests"""
+    audit_events = []
+    for record in records:
+        if record.get("tracking_batch"):
+            # Submitted by the batch tracking endpoint; no audit event of its own
+            analytics_tracker.track_batch(**record["tracking_batch"])
+            continue
+        if record.get("performance"):
+            analytics_tracker.track_performance(**record["performance"])
+        if record.get("page_view"):
+            analytics_tracker.track_page_view(**record["page_view"])
+        if record.get("behavior"):
+            analytics_tracker.track_user_behavior(**record["behavior"])
+        audit_events.append(record["audit"])
     
-    async def dispatch(self, request: Request, call_next):
-        start_time = time.time()
+    # One audit file write per batch
+    audit_logger.log_events(audit_events)
+
+
+# Bookkeeping queued by the middleware, consumed in the background
+ingestion_queue = IngestionQueue(
+    process_request_records,
+    max_size=int(os.getenv("INGESTION_QUEUE_SIZE", "10000")),
+    batch_size=int(os.getenv("INGESTION_BATCH_SIZE", "256"))
+)
+
+
+class SecurityMiddleware:
+    """Security middleware for rate limiting and audit logging.
+    
+    A plain ASGI middleware: the application's ``send`` is wrapped to add
+    the security and rate limit headers to the response start message and
+    to note the status and body size as they pass, so responses, including
+    streamed ones, go straight through without being buffered or run in
+    extra tasks.
+    """
+    
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        # Skip rate limiting for OPTIONS requests (preflight CORS)
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
         
-        # Get client info
-        client_ip = self._get_client_ip(request)
-        user_agent = request.headers.get("User-Agent", "unknown")
+        start_time = time.time()
+        # Only headers and state are read; the body is left to the application
+        request = Request(scope)
         
-        # Determine endpoint for rate limiting
-        endpoint = self._get_endpoint_key(request)
+        # Get client info, shared with the limiter through request.state
+        client_ip, user_agent = rate_limiter.identify(request)
         
-        # Skip rate limiting for OPTIONS requests (preflight CORS)
-        if request.method == "OPTIONS":
-            response = await call_next(request)
-            return response
+        # One classification gives the rate limit key, event type and analytics flags
+        route = route_classifier.classify(request)
+        endpoint = route.rate_limit_key
         
-        # Check rate limiting
-        if rate_limiter.is_rate_limited(request, endpoint):
+        # Check rate limiting; one counter update gives the decision and the header values
+        decision = await rate_limiter.check(request, endpoint)
+        if not decision.allowed:
             # Log rate limit violation
-            audit_logger.log_event(
-                event_type="rate_limit_exceeded",
-                user_ip=client_ip,
-                user_agent=user_agent,
-                endpoint=str(request.url.path),
-                method=request.method,
-                status_code=429,
-                request_data=self._get_request_data(request),
-                admin_action=endpoint.startswith("admin_")
-            )
+            self._submit({
+                "audit": {
+                    "event_type": "rate_limit_exceeded",
+                    "user_ip": client_ip,
+                    "user_agent": user_agent,
+                    "endpoint": str(request.url.path),
+                    "method": request.method,
+                    "status_code": 429,
+                    "request_data": self._get_request_data(request),
+                    "admin_action": route.admin_action,
+                    "timestamp": start_time
+                }
+            }, kind="rate_limit")
             
             # Return rate limit response with CORS headers
-            remaining_info = rate_limiter.get_remaining_requests(request, endpoint)
             response = JSONResponse(
                 status_code=429,
                 content={
                     "error": "Rate limit exceeded",
-                    "message": f"Too many requests. Try again in {int(remaining_info['reset_time'] - time.time())} seconds.",
-                    "remaining_requests": remaining_info["remaining"],
-                    "limit": remaining_info["limit"],
-                    "reset_time": remaining_info["reset_time"]
+                    "message": f"Too many requests. Try again in {int(decision.reset_time - time.time())} seconds.",
+                    "remaining_requests": decision.remaining,
+                    "limit": decision.limit,
+                    "reset_time": decision.reset_time
                 }
             )
             
             # Add CORS headers to rate limit response
             self._add_cors_headers(response)
-            return response
+            await response(scope, receive, send)
+            return
+        
+        status_code = 500
+        response_time = 0.0
+        content_length = 0
+        started = False
+        
+        async def send_with_headers(message: Message):
+            nonlocal status_code, response_time, content_length, started
+            if message["type"] == "http.response.start":
+                started = True
+                status_code = message["status"]
+                # Calculate response time
+                response_time = time.time() - start_time
+                
+                # Add security headers
+                headers = MutableHeaders(scope=message)
+                headers["X-Content-Type-Options"] = "nosniff"
+                headers["X-Frame-Options"] = "DENY"
+                headers["X-XSS-Protection"] = "1; mode=block"
+                headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
+                headers["X-Response-Time"] = f"{response_time:.3f}s"
+                
+                # Add rate limit headers
+                headers["X-RateLimit-Limit"] = str(decision.limit)
+                headers["X-RateLimit-Remaining"] = str(decision.remaining)
+                headers["X-RateLimit-Reset"] = str(int(decision.reset_time))
+            elif message["type"] == "http.response.body":
+                content_length += len(message.get("body", b""))
+            await send(message)
         
         # Process request
         try:
-            response = await call_next(request)
-            status_code = response.status_code
+            await self.app(scope, receive, send_with_headers)
         except Exception as e:
-            status_code = 500
+            if started:
+                # Part of the response is already out; nothing else can be sent
+                raise
             response = JSONResponse(
                 status_code=500,
                 content={"error": "Internal server error", "message": str(e)}
             )
             # Add CORS headers to error response
             self._add_cors_headers(response)
-            return response
-
+            await response(scope, receive, send)
+            return
         
-        # Calculate response time
-        response_time = time.time() - start_time
-        
-        # Track performance metrics
-        analytics_tracker.track_performance(
-            endpoint=str(request.url.path),
-            response_time=response_time,
-            status_code=status_code,
-            user_ip=client_ip,
-            user_agent=user_agent
-        )
+        # Capture what the bookkeeping needs; GeoIP, aggregation and the
+        # audit write happen in the ingestion consumer
+        path = request.url.path
+        record = {
+            # Track performance metrics
+            # Keyed by route template so ids in paths do not create new endpoints
+            "performance": {
+                "endpoint": route_template(scope),
+                "response_time": response_time,
+                "status_code": status_code,
+                "user_ip": client_ip,
+                "user_agent": user_agent,
+                "timestamp": start_time
+            },
+            # Log the event
+            "audit": {
+                "event_type": route.audit_event_type(status_code),
+                "user_ip": client_ip,
+                "user_agent": user_agent,
+                "endpoint": str(path),
+                "method": request.method,
+                "status_code": status_code,
+                "request_data": self._get_request_data(request),
+                # Only the response size is logged, not its content
+                "response_data": {"status_code": status_code, "content_length": content_length} if status_code < 400 else None,
+                "user_id": self._get_user_id(request),
+                "admin_action": route.admin_action,
+                "timestamp": start_time
+            }
+        }
         
         # Track page views for frontend routes
-        if self._is_frontend_route(request.url.path):
-            analytics_tracker.track_page_view(
-                page=request.url.path,
-                user_ip=client_ip,
-                user_agent=user_agent,
-                referrer=request.headers.get("Referer"),
-                session_id=request.headers.get("X-Session-ID")
-            )
+        if route.frontend_route:
+            record["page_view"] = {
+                "page": path,
+                "user_ip": client_ip,
+                "user_agent": user_agent,
+                "referrer": request.headers.get("Referer"),
+                "session_id": request.headers.get("X-Session-ID"),
+                "timestamp": start_time
+            }
         
         # Track user behavior for specific actions
-        if self._is_user_action(request.url.path, request.method):
-            analytics_tracker.track_user_behavior(
-                action=self._get_action_type(request.url.path, request.method),
-                user_ip=client_ip,
-                user_agent=user_agent,
-                session_id=request.headers.get("X-Session-ID"),
-                data=self._get_action_data(request)
-            )
-        
-        # Log the event
-        audit_logger.log_event(
-            event_type=self._get_event_type(request, status_code),
-            user_ip=client_ip,
-            user_agent=user_agent,
-            endpoint=str(request.url.path),
-            method=request.method,
-            status_code=status_code,
-            request_data=self._get_request_data(request),
-            response_data=self._get_response_data(response) if status_code < 400 else None,
-            user_id=self._get_user_id(request),
-            admin_action=endpoint.startswith("admin_")
-        )
-        
-        # Add security headers
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        response.headers["X-Frame-Options"] = "DENY"
-        response.headers["X-XSS-Protection"] = "1; mode=block"
-        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
-        response.headers["X-Response-Time"] = f"{response_time:.3f}s"
-        
-        # Add rate limit headers
-        remaining_info = rate_limiter.get_remaining_requests(request, endpoint)
-        response.headers["X-RateLimit-Limit"] = str(remaining_info["limit"])
-        response.headers["X-RateLimit-Remaining"] = str(remaining_info["remaining"])
-        response.headers["X-RateLimit-Reset"] = str(int(remaining_info["reset_time"]))
+        if route.user_action:
+            record["behavior"] = {
+                "action": route.action,
+                "user_ip": client_ip,
+                "user_agent": user_agent,
+                "session_id": request.headers.get("X-Session-ID"),
+                "data": self._get_action_data(request),
+                "timestamp": start_time
+            }
         
-        return response
+        self._submit(record)
+    
+    def _submit(self, record: dict, kind: str = "request"):
+        """Queue a request's bookkeeping, doing it inline when the queue is not running"""
+        if ingestion_queue.submit(record, kind):
+            return
+        if not ingestion_queue.running:
+            process_request_records([record])
+        else:
+            # Queue full: the analytics are dropped, but the audit trail is kept;
+            # the audit store's bounded buffer flushes inline when it fills up
+            audit_logger.log_events([record["audit"]])
     
     def _add_cors_headers(self, response: Response):
         """Add CORS headers to response"""
@@ -139,71 +222,6 @@ class SecurityMiddleware(BaseHTTPMiddleware):
         response.headers["Access-Control-Allow-Headers"] = "Content-Type, Authorization, X-Requested-With, X-Session-ID"
         response.headers["Access-Control-Allow-Credentials"] = "true"
     
-    def _get_client_ip(self, request: Request) -> str:
-        """Get client IP address"""
-        forwarded_for = request.headers.get("X-Forwarded-For")
-        if forwarded_for:
-            return forwarded_for.split(",")[0].strip()
-        
-        real_ip = request.headers.get("X-Real-IP")
-        if real_ip:
-            return real_ip
-        
-        return request.client.host if request.client else "unknown"
-    
-    def _get_endpoint_key(self, request: Request) -> str:
-        """Get endpoint key for rate limiting"""
-        path = request.url.path
-        
-        # Map specific endpoints to rate limit keys
-        if path.startswith("/api/contact/send-message"):
-            return "contact_send_message"
-        elif path.startswith("/api/contact/book-call"):
-            return "contact_book_call"
-        elif path.startswith("/api/reviews") and request.method == "POST":
-            return "review_create"
-        elif path.startswith("/api/newsletter/subscribe"):
-            return "newsletter_subscribe"
-        elif path.startswith("/api/resume/download"):
-            return "resume_download"
-        elif path.startswith("/api/auth/login"):
-            return "admin_login"
-        elif path.startswith("/api/auth/change-password"):
-            return "admin_change_password"
-        elif path.startswith("/api/analytics") and request.method == "GET":
-            return "admin_analytics"
-        elif path.startswith("/api/experience") or path.startswith("/api/projects") or path.startswith("/api/reviews/admin") or path.startswith("/api/newsletter/admin") or path.startswith("/api/contact/admin") or path.startswith("/api/leads"):
-            return "admin_dashboard"
-        elif path.startswith("/api/admin"):
-            return "admin_general"
-        else:
-            return "api_general"
-    
-    def _get_event_type(self, request: Request, status_code: int) -> str:
-        """Get event type for audit logging"""
-        path = request.url.path
-        
-        if path.startswith("/api/auth/login"):
-            return "admin_login"
-        elif path.startswith("/api/auth/change-password"):
-            return "admin_change_password"
-        elif path.startswith("/api/contact/send-message"):
-            return "contact_message"
-        elif path.startswith("/api/contact/book-call"):
-            return "call_booking"
-        elif path.startswith("/api/reviews"):
-            return "review_action"
-        elif path.startswith("/api/newsletter/subscribe"):
-            return "newsletter_subscription"
-        elif path.startswith("/api/resume/download"):
-            return "resume_download"
-        elif path.startswith("/api/admin"):
-            return "admin_action"
-        elif status_code >= 400:
-            return "error"
-        else:
-            return "api_request"
-    
     def _get_request_data(self, request: Request) -> dict:
         """Get sanitized request data for logging"""
         try:
@@ -220,67 +238,12 @@ class SecurityMiddleware(BaseHTTPMiddleware):
         except Exception:
             return {"error": "Could not parse request data"}
     
-    def _get_response_data(self, response: Response) -> dict:
-        """Get sanitized response data for logging"""
-        try:
-            if hasattr(response, 'body'):
-                # Only log response size, not content
-                return {
-                    "status_code": response.status_code,
-                    "content_length": len(response.body) if response.body else 0
-                }
-            return {"status_code": response.status_code}
-        except Exception:
-            return {"error": "Could not parse response data"}
-    
     def _get_user_id(self, request: Request) -> str:
         """Get user ID from request (if available)"""
         # This would be extracted from JWT token or session
         # For now, return None
         return None
     
-    def _is_frontend_route(self, path: str) -> bool:
-        """Check if this is a frontend route that should be tracked"""
-        # Skip admin routes - only track main website pages
-        if path.startswith("/admin"):
-            return False
-            
-        frontend_routes = [
-            "/", "/about", "/projects", "/experience", "/contact", 
-            "/resume"
-        ]
-        return path in frontend_routes
-    
-    def _is_user_action(self, path: str, method: str) -> bool:
-        """Check if this is a user action that should be tracked"""
-        # Skip admin-related actions - only track main website user actions
-        if path.startswith("/api/admin") or path.startswith("/api/auth"):
-            return False
-            
-        user_actions = [
-            ("/api/contact/send-message", "POST"),
-            ("/api/contact/book-call", "POST"),
-            ("/api/reviews", "POST"),
-            ("/api/newsletter/subscribe", "POST"),
-            ("/api/resume/download", "GET"),
-            ("/api/analytics/track/conversion", "POST"),
-            ("/api/analytics/track/behavior", "POST")
-        ]
-        return (path, method) in user_actions
-    
-    def _get_action_type(self, path: str, method: str) -> str:
-        """Get the action type for user behavior tracking"""
-        action_map = {
-            ("/api/contact/send-message", "POST"): "contact_form_submit",
-            ("/api/contact/book-call", "POST"): "call_booking",
-            ("/api/reviews", "POST"): "review_submit",
-            ("/api/newsletter/subscribe", "POST"): "newsletter_signup",
-            ("/api/resume/download", "GET"): "resume_download",
-            ("/api/analytics/track/conversion", "POST"): "conversion_tracked",
-            ("/api/analytics/track/behavior", "POST"): "behavior_tracked"
-        }
-        return action_map.get((path, method), "unknown_action")
-    
     def _get_action_data(self, request: Request) -> dict:
         """Get additional data for user action tracking"""
         try:
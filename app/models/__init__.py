@@ -4,6 +4,7 @@ from .project import Project
 from .review import Review
 from .newsletter import NewsletterSubscriber
 from .contact import ContactMessage, ChatbotReply
+from .analytics import AnalyticsEvent, PerformanceMetric, AnalyticsRollup
 
 __all__ = [
     "Resume",
@@ -12,5 +13,8 @@ __all__ = [
     "Review",
     "NewsletterSubscriber",
     "ContactMessage",
-    "ChatbotReply"
+    "ChatbotReply",
+    "AnalyticsEvent",
+    "PerformanceMetric",
+    "AnalyticsRollup"
 ] 
\ No newline at end of file
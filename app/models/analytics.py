@@ -0,0 +1,49 @@
+from sqlalchemy import Column, Integer, String, DateTime, Float, JSON, LargeBinary, UniqueConstraint
+from sqlalchemy.sql import func
+from ..core.database import Base
+
+class AnalyticsEvent(Base):
+    __tablename__ = "analytics_events"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    event_type = Column(String(32), nullable=False)  # page_view, conversion, user_behavior
+    name = Column(String(512), nullable=False)  # Page, conversion type or action
+    session_id = Column(String(128), nullable=True)
+    user_ip = Column(String(45), nullable=True)  # IPv6 compatible
+    country = Column(String(100), nullable=True)
+    city = Column(String(100), nullable=True)
+    data = Column(JSON, nullable=True)  # Referrer, metadata or behavior data
+    created_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    
+    def __repr__(self):
+        return f"<AnalyticsEvent(id={self.id}, event_type='{self.event_type}', name='{self.name}')>"
+
+class PerformanceMetric(Base):
+    __tablename__ = "performance_metrics"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    endpoint = Column(String(512), nullable=False)
+    response_time = Column(Float, nullable=False)
+    status_code = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    
+    def __repr__(self):
+        return f"<PerformanceMetric(id={self.id}, endpoint='{self.endpoint}', status_code={self.status_code})>"
+
+class AnalyticsRollup(Base):
+    __tablename__ = "analytics_rollups"
+    __table_args__ = (UniqueConstraint("period", "bucket_start", name="uq_analytics_rollups_period_bucket"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    period = Column(String(8), nullable=False)  # hour or day
+    bucket_start = Column(DateTime(timezone=True), nullable=False, index=True)
+    page_views = Column(Integer, nullable=False, default=0)
+    conversions = Column(JSON, nullable=True)  # Counts by conversion type
+    requests = Column(Integer, nullable=False, default=0)
+    errors = Column(Integer, nullable=False, default=0)
+    latency = Column(JSON, nullable=True)  # Serialized latency histogram
+    sessions = Column(LargeBinary, nullable=True)  # HyperLogLog registers
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    def __repr__(self):
+        return f"<AnalyticsRollup(period='{self.period}', bucket_start={self.bucket_start})>"
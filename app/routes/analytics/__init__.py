@@ -1,11 +1,21 @@
-from fastapi import APIRouter, Depends, Request, Query
+from fastapi import APIRouter, Depends, Request, Query, Response, HTTPException
+from fastapi.responses import StreamingResponse
 from typing import Optional
+from pydantic import ValidationError
 from app.routes.auth import get_current_admin
 from app.core.analytics import analytics_tracker
+from app.schemas.analytics import TrackingBatch
 from app.core.security import rate_limiter
+from app.middleware.security_middleware import ingestion_queue
 from sqlalchemy.orm import Session
-from app.core.database import get_db
-import time
+from app.core.database import get_db, SessionLocal
+from app.core.analytics_export import iter_event_pages, ndjson_chunks, csv_chunks, gzip_chunks
+from datetime import datetime, timezone
+import asyncio
+import json
+
+# Largest tracking batch body accepted, in bytes
+MAX_BATCH_BODY_BYTES = 64 * 1024
 
 router = APIRouter()
 
@@ -98,6 +108,61 @@ def track_user_behavior(
     
     return {"message": "Behavior tracked", "success": True}
 
+@router.post("/track/batch", summary="Track Event Batch", status_code=204)
+async def track_batch(request: Request):
+    """Track a batch of page view, conversion and behavior events.
+    
+    The body is read raw whatever its content type, so the frontend can send
+    it with ``navigator.sendBeacon`` (which posts ``text/plain``). It may be
+    ``{"session_id": ..., "events": [...]}`` or just the list of events.
+    """
+    # Refuse oversized bodies before and while reading, never buffering more than the cap
+    try:
+        declared_length = int(request.headers.get("Content-Length", "0"))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid Content-Length")
+    if declared_length > MAX_BATCH_BODY_BYTES:
+        raise HTTPException(status_code=413, detail="Tracking batch too large")
+    
+    chunks = []
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > MAX_BATCH_BODY_BYTES:
+            raise HTTPException(status_code=413, detail="Tracking batch too large")
+        chunks.append(chunk)
+    body = b"".join(chunks)
+    
+    try:
+        payload = json.loads(body)
+        if isinstance(payload, list):
+            payload = {"events": payload}
+        batch = TrackingBatch.model_validate(payload)
+    except (ValueError, ValidationError) as e:
+        raise HTTPException(status_code=422, detail=f"Invalid tracking batch: {e}")
+    
+    # Skip admin pages and actions, as the single-event endpoints do
+    events = [
+        event.model_dump() for event in batch.events
+        if not (event.type == "page_view" and event.page.startswith("/admin"))
+        and not (event.type == "behavior" and "admin" in event.action.lower())
+    ]
+    
+    if events:
+        # GeoIP lookups and aggregation run in the ingestion consumer, off the event loop
+        tracking_batch = {
+            "events": events,
+            "user_ip": request.client.host if request.client else "unknown",
+            "user_agent": request.headers.get("User-Agent", "unknown"),
+            "session_id": batch.session_id or request.headers.get("X-Session-ID")
+        }
+        if not ingestion_queue.submit({"tracking_batch": tracking_batch}, kind="tracking_batch") \
+                and not ingestion_queue.running:
+            # No consumer (e.g. before startup); still keep the work off the loop
+            await asyncio.to_thread(analytics_tracker.track_batch, **tracking_batch)
+    
+    return Response(status_code=204)
+
 @router.get("/summary", summary="Get Analytics Summary (Admin)")
 def get_analytics_summary(
     hours: int = Query(24, description="Number of hours to look back"),
@@ -138,6 +203,16 @@ def get_user_behavior_analytics(
     behavior_data = analytics_tracker.get_user_behavior_analytics(hours=hours)
     return behavior_data
 
+@router.get("/user-behavior/next-pages", summary="Get Next Page Probabilities (Admin)")
+def get_next_page_probabilities(
+    page: str = Query(..., description="Page path to analyze"),
+    hours: int = Query(24, description="Number of hours to look back"),
+    db: Session = Depends(get_db),
+    admin=Depends(get_current_admin)
+):
+    """Get where visitors go after a page, and how often they leave"""
+    return analytics_tracker.get_next_page_probabilities(page, hours=hours)
+
 @router.get("/conversions", summary="Get Conversion Analytics (Admin)")
 def get_conversion_analytics(
     hours: int = Query(24, description="Number of hours to look back"),
@@ -166,29 +241,78 @@ def get_real_time_analytics(
     admin=Depends(get_current_admin)
 ):
     """Get real-time analytics data (last hour)"""
-    real_time_data = analytics_tracker.get_analytics_summary(hours=1)
-    
-    # Add real-time specific metrics
-    real_time_data["real_time"] = {
-        "active_sessions": len([
-            s for s in analytics_tracker.user_sessions.values()
-            if (time.time() - s["start_time"].timestamp()) < 3600  # Last hour
-        ]),
-        "current_minute_requests": len([
-            e for e in analytics_tracker.events
-            if (time.time() - time.mktime(time.strptime(e["timestamp"], "%Y-%m-%dT%H:%M:%S.%f"))) < 60
-        ])
+    # Read from the sliding-window counters; nothing here scans events
+    counters = analytics_tracker.get_real_time_metrics()
+    
+    return {
+        "time_period": "Last hour",
+        "total_page_views": counters["page_views"],
+        "total_conversions": counters["conversions"],
+        "conversion_rate": counters["conversion_rate"],
+        "performance": {
+            "avg_response_time": counters["avg_response_time"],
+            "total_requests": counters["requests"],
+            "error_rate": counters["error_rate"]
+        },
+        "real_time": {
+            "active_sessions": counters["active_sessions"],
+            "active_session_window_seconds": counters["active_session_window_seconds"],
+            "current_minute_requests": counters["current_minute_requests"],
+            "current_minute_page_views": counters["current_minute_page_views"],
+            "requests_per_second": counters["requests_per_second"]
+        }
     }
+
+@router.get("/stats", summary="Get Analytics Engine Stats (Admin)")
+def get_analytics_engine_stats(
+    db: Session = Depends(get_db),
+    admin=Depends(get_current_admin)
+):
+    """Get internal statistics of the analytics storage engine"""
+    stats = analytics_tracker.get_engine_stats()
+    stats["ingestion_queue"] = ingestion_queue.get_stats()
+    return stats
+
+@router.get("/export", summary="Export Analytics Events (Admin)")
+def export_analytics_events(
+    start: datetime = Query(..., description="Start of the range (inclusive, UTC if no offset)"),
+    end: datetime = Query(..., description="End of the range (exclusive, UTC if no offset)"),
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="ndjson or csv"),
+    cursor: Optional[int] = Query(None, ge=0, description="Resume after this event id"),
+    event_type: Optional[str] = Query(None, description="Only export this event type"),
+    compress: bool = Query(False, description="Gzip the response body"),
+    admin=Depends(get_current_admin)
+):
+    """Stream persisted analytics events for a [start, end) range.
     
-    return real_time_data
+    Events are ordered by id; to resume an interrupted export pass the id of
+    the last event received as ``cursor``.
+    """
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    if end.tzinfo is None:
+        end = end.replace(tzinfo=timezone.utc)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    
+    pages = iter_event_pages(SessionLocal, start, end, cursor=cursor, event_type=event_type)
+    chunks = ndjson_chunks(pages) if format == "ndjson" else csv_chunks(pages)
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/csv"
+    filename = f"analytics-events-{start:%Y%m%dT%H%M%S}-{end:%Y%m%dT%H%M%S}.{format}"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if compress:
+        chunks = gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+    
+    return StreamingResponse(chunks, media_type=media_type, headers=headers)
 
 @router.get("/trends", summary="Get Analytics Trends (Admin)")
 def get_analytics_trends(
-    days: int = Query(7, description="Number of days to analyze"),
+    days: int = Query(7, ge=1, le=366, description="Number of days to analyze"),
     db: Session = Depends(get_db),
     admin=Depends(get_current_admin)
 ):
-    """Get analytics trends over time"""
+    """Get analytics trends over time (day 0 is today, UTC)"""
     trends = {
         "daily_page_views": [],
         "daily_conversions": [],
@@ -196,27 +320,52 @@ def get_analytics_trends(
         "daily_performance": []
     }
     
-    for day in range(days):
-        day_data = analytics_tracker.get_analytics_summary(hours=24)
+    # One pre-aggregated rollup per day, newest first
+    for day, rollup in enumerate(analytics_tracker.get_rollup_series("day", days)):
+        date = datetime.fromtimestamp(rollup["bucket_start"], tz=timezone.utc).date().isoformat()
         
         trends["daily_page_views"].append({
             "day": day,
-            "page_views": day_data["total_page_views"]
+            "date": date,
+            "page_views": rollup["page_views"],
+            "unique_sessions": rollup["unique_sessions"]
         })
         
         trends["daily_conversions"].append({
             "day": day,
-            "conversions": day_data["total_conversions"]
+            "date": date,
+            "conversions": rollup["conversions"],
+            "conversions_by_type": rollup["conversions_by_type"]
         })
         
         trends["daily_conversion_rates"].append({
             "day": day,
-            "conversion_rate": day_data["conversion_rate"]
+            "date": date,
+            "conversion_rate": rollup["conversion_rate"]
         })
         
         trends["daily_performance"].append({
             "day": day,
-            "avg_response_time": day_data["performance"]["avg_response_time"]
+            "date": date,
+            "requests": rollup["requests"],
+            "avg_response_time": rollup["avg_response_time"],
+            "p95_response_time": rollup["p95_response_time"],
+            "error_rate": rollup["error_rate"]
         })
     
-    return trends 
\ No newline at end of file
+    return trends
+
+@router.get("/trends/hourly", summary="Get Hourly Analytics Trends (Admin)")
+def get_hourly_analytics_trends(
+    hours: int = Query(24, ge=1, le=168, description="Number of hours to analyze"),
+    db: Session = Depends(get_db),
+    admin=Depends(get_current_admin)
+):
+    """Get hourly analytics rollups, newest first"""
+    return {
+        "time_period": f"Last {hours} hours",
+        "hourly": [
+            dict(rollup, hour=datetime.fromtimestamp(rollup["bucket_start"], tz=timezone.utc).isoformat())
+            for rollup in analytics_tracker.get_rollup_series("hour", hours)
+        ]
+    }
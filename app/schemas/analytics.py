@@ -0,0 +1,29 @@
+from pydantic import BaseModel, Field
+from typing import Optional, List, Dict, Any, Union, Literal, Annotated
+
+# Largest number of events accepted in one tracking batch
+MAX_BATCH_EVENTS = 100
+
+class PageViewEvent(BaseModel):
+    type: Literal["page_view"]
+    page: str = Field(..., max_length=512)
+    referrer: Optional[str] = Field(None, max_length=1024)
+    session_id: Optional[str] = Field(None, max_length=128)
+
+class ConversionEvent(BaseModel):
+    type: Literal["conversion"]
+    conversion_type: str = Field(..., max_length=100)
+    metadata: Optional[Dict[str, Any]] = None
+    session_id: Optional[str] = Field(None, max_length=128)
+
+class BehaviorEvent(BaseModel):
+    type: Literal["behavior"]
+    action: str = Field(..., max_length=100)
+    data: Optional[Dict[str, Any]] = None
+    session_id: Optional[str] = Field(None, max_length=128)
+
+TrackedEvent = Annotated[Union[PageViewEvent, ConversionEvent, BehaviorEvent], Field(discriminator="type")]
+
+class TrackingBatch(BaseModel):
+    session_id: Optional[str] = Field(None, max_length=128)
+    events: List[TrackedEvent] = Field(..., max_length=MAX_BATCH_EVENTS)
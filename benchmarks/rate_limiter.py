@@ -0,0 +1,99 @@
+"""Compare the sliding-window-counter rate limiter with a timestamp-list limiter.
+
+Usage: python benchmarks/rate_limiter.py [--clients 100000] [--requests 10]
+
+Every client makes ``--requests`` requests against the ``api_general`` limit
+(1000 per hour); the script reports the cost of one check and the memory
+held for all clients. A second pass measures a single busy client sitting
+at its limit, where the list-based limiter filters 1000 timestamps per
+check.
+"""
+import argparse
+import hashlib
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.core.rate_limit import SlidingWindowCounter  # noqa: E402
+
+LIMIT = 1000
+WINDOW = 3600
+
+
+class TimestampListLimiter:
+    """The previous limiter: a list of request times per key"""
+
+    def __init__(self):
+        self.requests = {}
+
+    def hit(self, key, limit, window, now):
+        times = [t for t in self.requests.get(key, ()) if now - t < window]
+        if len(times) >= limit:
+            self.requests[key] = times
+            return False
+        times.append(now)
+        self.requests[key] = times
+        return True
+
+
+def client_keys(count):
+    return [hashlib.md5(f"10.{i >> 16}.{(i >> 8) & 255}.{i & 255}:bench:api_general".encode()).digest()
+            for i in range(count)]
+
+
+def run(limiter, keys, requests, start):
+    began = time.perf_counter()
+    for round_number in range(requests):
+        now = start + round_number
+        for key in keys:
+            limiter.hit(key, LIMIT, WINDOW, now)
+    return (time.perf_counter() - began) / (requests * len(keys)) * 1e9
+
+
+def measure_memory(factory, keys, requests, start):
+    tracemalloc.start()
+    limiter = factory()
+    run(limiter, keys, requests, start)
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return memory
+
+
+def run_hot_key(limiter, checks, start):
+    key = b"hot-client"
+    for i in range(LIMIT):
+        limiter.hit(key, LIMIT, WINDOW, start + i * 0.001)
+    began = time.perf_counter()
+    for i in range(checks):
+        limiter.hit(key, LIMIT, WINDOW, start + 1 + i * 0.001)
+    return (time.perf_counter() - began) / checks * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=100000)
+    parser.add_argument("--requests", type=int, default=10, help="requests per client")
+    args = parser.parse_args()
+
+    keys = client_keys(args.clients)
+    start = (time.time() // WINDOW) * WINDOW + WINDOW / 2
+    limiters = (
+        ("timestamp list", TimestampListLimiter),
+        ("sliding window counter", lambda: SlidingWindowCounter(sweep_interval=float("inf")))
+    )
+
+    print(f"{args.clients} clients x {args.requests} requests, limit {LIMIT}/{WINDOW}s")
+    print(f"{'limiter':<24}{'ns/check':>12}{'memory MiB':>14}{'bytes/client':>14}{'hot key ns/check':>18}")
+    for name, factory in limiters:
+        per_check = run(factory(), keys, args.requests, start)
+        memory = measure_memory(factory, keys, args.requests, start)
+        hot = run_hot_key(factory(), 10000, start)
+        print(f"{name:<24}{per_check:>12.0f}{memory / 2 ** 20:>14.1f}"
+              f"{memory / args.clients:>14.0f}{hot:>18.0f}")
+
+
+if __name__ == "__main__":
+    main()
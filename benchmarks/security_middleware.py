@@ -0,0 +1,191 @@
+"""Compare the pure-ASGI SecurityMiddleware with the previous BaseHTTPMiddleware version.
+
+Usage: python benchmarks/security_middleware.py [--requests 5000] [--concurrency 20]
+
+Requests are driven through the full application (CORS, security
+middleware, routing) in-process, without a server or network, so the
+numbers show per-request framework and middleware cost. ``/health``
+measures the overhead on a trivial route; ``/api/projects`` lists ten
+projects from an in-memory SQLite database in place of PostgreSQL. The
+ingestion queue and audit writer run as they do in production, with the
+audit log in a temporary directory.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("AUDIT_LOG_DIR", tempfile.mkdtemp(prefix="audit-bench-"))
+os.environ.setdefault("ANALYTICS_PERSISTENCE", "false")
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from sqlalchemy.pool import StaticPool  # noqa: E402
+from starlette.middleware import Middleware  # noqa: E402
+from starlette.middleware.base import BaseHTTPMiddleware  # noqa: E402
+
+from main import app  # noqa: E402
+from app.core.database import get_db  # noqa: E402
+from app.core.security import rate_limiter, audit_logger  # noqa: E402
+from app.core.route_classifier import route_classifier, route_template  # noqa: E402
+from app.middleware.security_middleware import SecurityMiddleware, ingestion_queue  # noqa: E402
+from app.models.project import Project, ProjectThumbnail  # noqa: E402
+
+
+class BaseHTTPSecurityMiddleware(BaseHTTPMiddleware, SecurityMiddleware):
+    """The previous middleware: the same pipeline through BaseHTTPMiddleware.dispatch"""
+
+    async def dispatch(self, request, call_next):
+        start_time = time.time()
+        if request.method == "OPTIONS":
+            return await call_next(request)
+        client_ip, user_agent = rate_limiter.identify(request)
+        route = route_classifier.classify(request)
+        decision = await rate_limiter.check(request, route.rate_limit_key)
+        if not decision.allowed:
+            return JSONResponse(status_code=429, content={"error": "Rate limit exceeded"})
+
+        response = await call_next(request)
+        status_code = response.status_code
+        response_time = time.time() - start_time
+        path = request.url.path
+        self._submit({
+            "performance": {
+                "endpoint": route_template(request.scope), "response_time": response_time, "status_code": status_code,
+                "user_ip": client_ip, "user_agent": user_agent, "timestamp": start_time
+            },
+            "audit": {
+                "event_type": route.audit_event_type(status_code), "user_ip": client_ip,
+                "user_agent": user_agent, "endpoint": str(path), "method": request.method,
+                "status_code": status_code, "request_data": self._get_request_data(request),
+                "response_data": {"status_code": status_code} if status_code < 400 else None,
+                "user_id": None, "admin_action": route.admin_action, "timestamp": start_time
+            }
+        })
+        response.headers["X-Content-Type-Options"] = "nosniff"
+        response.headers["X-Frame-Options"] = "DENY"
+        response.headers["X-XSS-Protection"] = "1; mode=block"
+        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
+        response.headers["X-Response-Time"] = f"{response_time:.3f}s"
+        response.headers["X-RateLimit-Limit"] = str(decision.limit)
+        response.headers["X-RateLimit-Remaining"] = str(decision.remaining)
+        response.headers["X-RateLimit-Reset"] = str(int(decision.reset_time))
+        return response
+
+
+def use_middleware(cls):
+    """Swap the security middleware in the app's stack"""
+    app.user_middleware = [
+        Middleware(cls) if middleware.cls in (SecurityMiddleware, BaseHTTPSecurityMiddleware) else middleware
+        for middleware in app.user_middleware
+    ]
+    app.middleware_stack = None
+
+
+def use_sqlite_projects(count=10):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Project.metadata.create_all(engine, tables=[Project.__table__, ProjectThumbnail.__table__])
+    session_factory = sessionmaker(bind=engine)
+    db = session_factory()
+    for i in range(count):
+        db.add(Project(title=f"Project {i}", description="Benchmark project " * 10,
+                       technologies=["python", "fastapi"], thumbnail=f"/thumbnails/{i}.png"))
+    db.commit()
+    db.close()
+
+    def get_sqlite_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = get_sqlite_db
+
+
+async def request(path, index):
+    """Send one GET through the application; returns (status, seconds)"""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+        "headers": [(b"host", b"bench"), (b"user-agent", b"bench")],
+        "client": (f"10.0.{index >> 8 & 255}.{index & 255}", 50000), "server": ("bench", 80)
+    }
+    status = None
+    request_sent = False
+    response_done = asyncio.Event()
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # Like a server, report the disconnect only once the response is complete
+        await response_done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif not message.get("more_body", False):
+            response_done.set()
+
+    began = time.perf_counter()
+    await app(scope, receive, send)
+    return status, time.perf_counter() - began
+
+
+async def run(path, requests, concurrency):
+    latencies = []
+    statuses = set()
+
+    async def worker(worker_index):
+        for i in range(worker_index, requests, concurrency):
+            status, latency = await request(path, i)
+            statuses.add(status)
+            latencies.append(latency)
+
+    began = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - began
+    latencies.sort()
+    return {
+        "throughput": requests / elapsed,
+        "p50": statistics.median(latencies) * 1000,
+        "p99": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "statuses": statuses
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    use_sqlite_projects()
+    await ingestion_queue.start()
+    audit_logger.start()
+    try:
+        print(f"{args.requests} requests, concurrency {args.concurrency}")
+        print(f"{'route':<16}{'middleware':<20}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}  status")
+        for path in ("/health", "/api/projects/"):
+            for name, cls in (("BaseHTTPMiddleware", BaseHTTPSecurityMiddleware), ("pure ASGI", SecurityMiddleware)):
+                use_middleware(cls)
+                await run(path, min(args.requests, 500), args.concurrency)  # warm up
+                result = await run(path, args.requests, args.concurrency)
+                print(f"{path:<16}{name:<20}{result['throughput']:>10.0f}{result['p50']:>10.2f}"
+                      f"{result['p99']:>10.2f}  {sorted(result['statuses'])}")
+    finally:
+        await ingestion_queue.stop()
+        audit_logger.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
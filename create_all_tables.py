@@ -6,6 +6,7 @@ import app.models.review
 import app.models.newsletter
 import app.models.contact
 import app.models.resume
+import app.models.analytics
 
 if __name__ == "__main__":
     print("Creating all tables in the database...")
@@ -13,7 +13,11 @@ from app.routes.email import email
 from app.routes.chatbot import chatbot
 from app.routes.leads import leads
 from app.routes.admin import security
-from app.middleware.security_middleware import SecurityMiddleware
+from app.middleware.security_middleware import SecurityMiddleware, ingestion_queue
+from app.core.analytics import analytics_tracker
+from app.core.analytics_sink import analytics_sink
+from app.core.shared_metrics import SharedMetricsStore
+from app.core.security import audit_logger
 from sqlalchemy import create_engine
 from app.core.database import Base
 import app.models.experience
@@ -22,6 +26,7 @@ import app.models.review
 import app.models.newsletter
 import app.models.contact
 import app.models.resume
+import app.models.analytics
 
 # SMTP/Email startup check
 required_smtp_vars = [
@@ -78,6 +83,58 @@ app = FastAPI(
     redoc_url="/redoc"
 )
 
+@app.on_event("startup")
+async def start_ingestion():
+    # Per-request analytics and audit work runs in a background consumer
+    await ingestion_queue.start()
+
+@app.on_event("shutdown")
+async def drain_ingestion():
+    # Process what is still queued before the sinks below are flushed
+    await ingestion_queue.stop()
+
+@app.on_event("startup")
+def start_audit_writer():
+    # Audit records are buffered and written by a background thread
+    audit_logger.start()
+
+@app.on_event("shutdown")
+def stop_audit_writer():
+    # Runs after the ingestion queue has drained into the buffer
+    audit_logger.stop()
+
+@app.on_event("startup")
+def start_analytics_persistence():
+    # Analytics are written behind the request path by a background thread
+    if os.getenv("ANALYTICS_PERSISTENCE", "true").lower() == "true":
+        # Reload persisted trend rollups so restarts do not reset them
+        analytics_sink.restore_rollups(analytics_tracker.rollups, analytics_tracker.rollups.retention_days)
+        analytics_sink.track_rollups(analytics_tracker.rollups)
+        analytics_tracker.attach_sink(analytics_sink)
+        analytics_sink.start()
+
+@app.on_event("startup")
+def start_shared_analytics():
+    # With several workers, aggregate analytics through a file they all share
+    shared_path = os.getenv("ANALYTICS_SHARED_DB")
+    if shared_path:
+        shared = SharedMetricsStore(
+            shared_path,
+            flush_interval=float(os.getenv("ANALYTICS_SHARED_FLUSH_INTERVAL", "1")),
+            retention_hours=int(os.getenv("ANALYTICS_RETENTION_HOURS", "168")),
+            session_window=analytics_tracker.realtime.session_window,
+            max_names=int(os.getenv("ANALYTICS_SHARED_MAX_NAMES", "5000"))
+        )
+        analytics_tracker.attach_shared_store(shared)
+        shared.start()
+
+@app.on_event("shutdown")
+def stop_analytics_persistence():
+    # Flush whatever is still queued before the process exits
+    analytics_sink.stop()
+    if analytics_tracker.shared is not None:
+        analytics_tracker.shared.stop()
+
 # Add CORS middleware (must be first to handle preflight requests)
 app.add_middleware(
     CORSMiddleware,
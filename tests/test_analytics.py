@@ -0,0 +1,200 @@
+import sys, os, json
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fastapi.testclient import TestClient
+from main import app
+from app.core.analytics import analytics_tracker
+from app.routes.auth import get_current_admin
+
+client = TestClient(app)
+
+# Mock admin dependency for tests
+def override_get_current_admin():
+    return True
+app.dependency_overrides[get_current_admin] = override_get_current_admin
+
+def test_trends_read_daily_rollups():
+    before = analytics_tracker.rollups.series("day", 1)[0]
+    resp = client.post("/api/analytics/track/page-view", params={"page": "/trends-test", "session_id": "trends-session"})
+    assert resp.status_code == 200
+    resp = client.post("/api/analytics/track/conversion", params={"conversion_type": "contact", "session_id": "trends-session"})
+    assert resp.status_code == 200
+
+    resp = client.get("/api/analytics/trends", params={"days": 3})
+    assert resp.status_code == 200
+    trends = resp.json()
+    assert len(trends["daily_page_views"]) == 3
+    today = trends["daily_page_views"][0]
+    assert today["day"] == 0
+    assert today["page_views"] == before["page_views"] + 1
+    assert trends["daily_conversions"][0]["conversions"] == before["conversions"] + 1
+
+def test_hourly_trends():
+    resp = client.get("/api/analytics/trends/hourly", params={"hours": 6})
+    assert resp.status_code == 200
+    assert len(resp.json()["hourly"]) == 6
+
+def test_real_time_counts_from_sliding_windows():
+    before = client.get("/api/analytics/real-time").json()
+    client.post("/api/analytics/track/page-view", params={"page": "/real-time-test", "session_id": "real-time-session"})
+    client.post("/api/analytics/track/page-view", params={"page": "/real-time-test-2", "session_id": "real-time-session"})
+
+    resp = client.get("/api/analytics/real-time")
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["total_page_views"] == before["total_page_views"] + 2
+    assert data["real_time"]["active_sessions"] == before["real_time"]["active_sessions"] + 1
+    assert data["real_time"]["current_minute_requests"] >= 2
+
+def test_user_journeys_and_next_pages():
+    for page in ("/journey-a", "/journey-b", "/journey-c"):
+        client.post("/api/analytics/track/page-view", params={"page": page, "session_id": "journey-session"})
+
+    resp = client.get("/api/analytics/user-behavior")
+    assert resp.status_code == 200
+    journeys = resp.json()["user_journeys"]["most_common_journeys"]
+    assert any(j["journey"] == ["/journey-a", "/journey-b", "/journey-c"] for j in journeys)
+
+    resp = client.get("/api/analytics/user-behavior/next-pages", params={"page": "/journey-a"})
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["next_pages"][0] == {"page": "/journey-b", "probability": 1.0}
+    assert data["exit_probability"] == 0
+
+def test_track_batch_accepts_beacon_body():
+    before = analytics_tracker.get_analytics_summary(hours=1)
+    body = json.dumps({
+        "session_id": "batch-session",
+        "events": [
+            {"type": "page_view", "page": "/batch-a"},
+            {"type": "page_view", "page": "/batch-b", "referrer": "https://example.com"},
+            {"type": "conversion", "conversion_type": "batch_contact", "metadata": {"form": "footer"}},
+            {"type": "behavior", "action": "scroll", "data": {"depth": 80}},
+            {"type": "page_view", "page": "/admin/secret"}
+        ]
+    })
+    # sendBeacon posts strings as text/plain
+    resp = client.post("/api/analytics/track/batch", content=body, headers={"Content-Type": "text/plain;charset=UTF-8"})
+    assert resp.status_code == 204
+
+    summary = analytics_tracker.get_analytics_summary(hours=1)
+    assert summary["total_page_views"] == before["total_page_views"] + 2
+    assert summary["conversions"]["batch_contact"] == before["conversions"].get("batch_contact", 0) + 1
+    assert "/admin/secret" not in summary["page_views"]
+
+def test_track_batch_is_processed_by_the_ingestion_queue():
+    from app.middleware.security_middleware import ingestion_queue
+    before = analytics_tracker.get_analytics_summary(hours=1)
+    with TestClient(app) as running_client:
+        enqueued = ingestion_queue.enqueued
+        resp = running_client.post("/api/analytics/track/batch",
+                                   json=[{"type": "conversion", "conversion_type": "queued_batch"}])
+        assert resp.status_code == 204
+        # The batch and the request's own record are both queued
+        assert ingestion_queue.enqueued >= enqueued + 2
+    summary = analytics_tracker.get_analytics_summary(hours=1)
+    assert summary["conversions"]["queued_batch"] == before["conversions"].get("queued_batch", 0) + 1
+
+def test_track_batch_rejects_invalid_events():
+    resp = client.post("/api/analytics/track/batch", json=[{"type": "page_view"}])
+    assert resp.status_code == 422
+    resp = client.post("/api/analytics/track/batch", content="not json")
+    assert resp.status_code == 422
+
+def test_ingestion_queue_drains_on_shutdown():
+    from app.middleware.security_middleware import ingestion_queue
+    before = analytics_tracker.get_real_time_metrics()["requests"]
+    with TestClient(app) as running_client:
+        assert ingestion_queue.running
+        for _ in range(5):
+            assert running_client.get("/health").status_code == 200
+    # Leaving the context runs shutdown, which drains the queue
+    assert not ingestion_queue.running
+    assert analytics_tracker.get_real_time_metrics()["requests"] >= before + 5
+
+def test_export_rejects_empty_range():
+    resp = client.get("/api/analytics/export", params={"start": "2026-01-02T00:00:00", "end": "2026-01-01T00:00:00"})
+    assert resp.status_code == 400
+    resp = client.get("/api/analytics/export", params={"start": "2026-01-01T00:00:00", "end": "2026-01-02T00:00:00", "format": "xml"})
+    assert resp.status_code == 422
+
+def test_dashboard_queries_are_cached_through_http():
+    cache = analytics_tracker.query_cache
+    before = cache.get_stats()
+    paths = ("summary", "geographic", "performance", "user-behavior", "conversions")
+    for _ in range(4):
+        for path in paths:
+            assert client.get(f"/api/analytics/{path}", params={"hours": 5}).status_code == 200
+    stats = cache.get_stats()
+    # The dashboard's own requests are tracked but do not invalidate the cache
+    assert stats["hits"] - before["hits"] > 0
+    assert stats["misses"] - before["misses"] <= len(paths)
+
+    summary = client.get("/api/analytics/summary", params={"hours": 5}).json()
+    client.post("/api/analytics/track/conversion", params={"conversion_type": "cache_check"})
+    refreshed = client.get("/api/analytics/summary", params={"hours": 5}).json()
+    assert refreshed["total_conversions"] == summary["total_conversions"] + 1
+    assert "query_cache" in client.get("/api/analytics/stats").json()
+
+def test_rollup_deltas_only_kept_while_collected():
+    from app.core.rollups import RollupEngine
+    engine = RollupEngine(hourly_retention_days=1, daily_retention_days=2)
+    engine.record_page_view(1_700_000_000, "s1")
+    assert engine.get_stats()["pending"] == 0
+
+    engine.track_deltas()
+    engine.record_page_view(1_700_000_000, "s1")
+    assert engine.get_stats()["pending"] == 2
+    # Uncollected deltas expire with their buckets
+    engine.record_page_view(1_700_000_000 + 5 * 86400, "s2")
+    assert {(delta.period, delta.bucket_start) for delta in engine.collect_pending()} == {
+        ("hour", (1_700_000_000 + 5 * 86400) // 3600 * 3600),
+        ("day", (1_700_000_000 + 5 * 86400) // 86400 * 86400)
+    }
+
+def test_track_batch_rejects_oversized_bodies():
+    from app.routes.analytics import MAX_BATCH_BODY_BYTES
+    big = b"[" + b" " * MAX_BATCH_BODY_BYTES + b"]"
+    resp = client.post("/api/analytics/track/batch", content=big)
+    assert resp.status_code == 413
+
+    # Without a Content-Length the stream is cut off once it passes the cap
+    def chunks():
+        for _ in range(MAX_BATCH_BODY_BYTES // 1024 + 2):
+            yield b" " * 1024
+    resp = client.post("/api/analytics/track/batch", content=chunks())
+    assert resp.status_code == 413
+
+def test_tracker_counters_are_consistent_across_threads():
+    import threading
+    from app.core.analytics import AnalyticsTracker
+    tracker = AnalyticsTracker()
+    version = tracker.version
+
+    def record():
+        for _ in range(250):
+            tracker._record_conversion(1_700_000_000, "threaded", "10.0.0.1", None, "s1", None)
+
+    threads = [threading.Thread(target=record) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert tracker.conversions["threaded"] == 2000
+    assert tracker.version == version + 2000
+
+def test_page_keys_match_with_and_without_shared_counters(tmp_path):
+    from app.core.analytics import AnalyticsTracker
+    from app.core.shared_metrics import SharedMetricsStore
+    local, shared = AnalyticsTracker(), AnalyticsTracker()
+    shared.attach_shared_store(SharedMetricsStore(str(tmp_path / "shared.db")))
+    for tracker in (local, shared):
+        tracker.track_page_view("/projects/42?ref=home", "127.0.0.1", "test-agent", session_id="scope-session")
+        tracker.track_page_view("/projects/7", "127.0.0.1", "test-agent", session_id="scope-session")
+
+    assert local.get_analytics_summary(1)["page_views"] == {"/projects/{id}": 2}
+    assert shared.get_analytics_summary(1)["page_views"] == {"/projects/{id}": 2}
+    # Panels that are not aggregated across workers say so
+    assert "aggregation_scope" not in local.get_user_behavior_analytics(1)
+    scope = shared.get_user_behavior_analytics(1)["aggregation_scope"]
+    assert scope["per_worker_fields"] == ["sessions", "user_journeys"]
+    assert shared.get_next_page_probabilities("/projects/3")["next_pages"] == [{"page": "/projects/{id}", "probability": 0.5}]
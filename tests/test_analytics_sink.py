@@ -0,0 +1,82 @@
+import sys, os, time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.core.analytics_sink import AnalyticsSink
+from app.models.analytics import AnalyticsEvent, PerformanceMetric
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    AnalyticsEvent.metadata.create_all(engine, tables=[AnalyticsEvent.__table__, PerformanceMetric.__table__])
+    factory = sessionmaker(bind=engine)
+    sessions = []
+
+    def counting_factory():
+        sessions.append(None)
+        return factory()
+
+    counting_factory.opened = sessions
+    counting_factory.factory = factory
+    return counting_factory
+
+
+def make_sink(session_factory, **kwargs):
+    sink = AnalyticsSink(session_factory, **kwargs)
+    sink.register("performance", PerformanceMetric)
+    return sink
+
+
+def metric(i):
+    return {"endpoint": f"/endpoint-{i}", "response_time": 0.01 * i, "status_code": 200,
+            "created_at": AnalyticsSink.timestamp(time.time())}
+
+
+def stored_rows(session_factory):
+    db = session_factory.factory()
+    try:
+        return db.query(PerformanceMetric).count()
+    finally:
+        db.close()
+
+
+def test_full_queue_drops_and_counts_rows(session_factory):
+    sink = make_sink(session_factory, max_queue_size=3)
+    for i in range(5):
+        sink.enqueue("performance", metric(i))
+
+    assert sink.dropped == 2
+    assert sink.enqueued == 3
+    assert sink.get_stats()["queued"] == {"performance": 3}
+    assert sink.flush() == 3
+    assert stored_rows(session_factory) == 3
+
+
+def test_flush_writes_in_batches(session_factory):
+    sink = make_sink(session_factory, batch_size=2)
+    for i in range(5):
+        sink.enqueue("performance", metric(i))
+
+    assert sink.flush() == 5
+    # One session (and INSERT) per batch of at most two rows
+    assert len(session_factory.opened) == 3
+    assert sink.written == 5 and sink.flushes == 1
+    assert stored_rows(session_factory) == 5
+    assert sink.flush() == 0 and sink.flushes == 1
+
+
+def test_stop_drains_the_queue(session_factory):
+    sink = make_sink(session_factory, batch_size=100, flush_interval=60)
+    sink.start()
+    assert sink.running
+    for i in range(10):
+        sink.enqueue("performance", metric(i))
+    assert stored_rows(session_factory) == 0
+
+    sink.stop()
+    assert not sink.running
+    assert stored_rows(session_factory) == 10
+    assert sink.get_stats()["queued"] == {"performance": 0}
@@ -0,0 +1,104 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from array import array
+from app.core.event_store import TimeBucketedEventStore, StringDictionary
+
+# Start of a minute, so offsets below stay in known buckets
+BASE = 1_700_000_040.0
+
+
+def make_store(minutes=3, max_events_per_minute=5000):
+    return TimeBucketedEventStore({"value": "i"}, retention_hours=minutes / 60,
+                                  max_events_per_minute=max_events_per_minute)
+
+
+def test_ring_reuses_slots_as_minutes_roll_over():
+    store = make_store(minutes=3)
+    for minute in range(3):
+        store.append(BASE + minute * 60, value=minute)
+    now = BASE + 2 * 60 + 30
+    assert list(store.window(1, now=now)["value"]) == [0, 1, 2]
+
+    # Minute 3 takes minute 0's slot
+    store.append(BASE + 3 * 60, value=3)
+    now = BASE + 3 * 60 + 30
+    assert list(store.window(1, now=now)["value"]) == [1, 2, 3]
+    assert store.count(1, now=now) == 3
+    assert store.get_stats()["active_buckets"] <= 3
+
+
+def test_events_older_than_the_ring_are_dropped():
+    store = make_store(minutes=3)
+    store.append(BASE + 3 * 60, value=3)
+    # Same slot as minute 3 but older
+    store.append(BASE, value=0)
+    assert store.dropped_events == 1
+    assert list(store.window(1, now=BASE + 3 * 60 + 1)["value"]) == [3]
+
+
+def test_window_expires_events_before_the_cutoff():
+    store = make_store(minutes=10)
+    for second in (0, 20, 40, 60, 80):
+        store.append(BASE + second, value=second)
+    # The cutoff falls inside the first minute
+    now = BASE + 90
+    assert list(store.window(1 / 60, now=now)["value"]) == [40, 60, 80]
+    assert store.count(1 / 60, now=now) == 3
+    # Buckets outside the window are skipped entirely
+    assert store.count(0.5 / 60, now=BASE + 10 * 60) == 0
+
+
+def test_per_minute_cap_drops_extra_events():
+    store = make_store(max_events_per_minute=2)
+    for i in range(4):
+        store.append(BASE + i, value=i)
+    assert list(store.window(1, now=BASE + 5)["value"]) == [0, 1]
+    assert store.dropped_events == 2
+
+
+def test_columns_round_trip_epoch_floats_and_types():
+    names = StringDictionary()
+    store = TimeBucketedEventStore({"name": "i", "response_time": "d", "status_code": "H", "extra": None},
+                                   retention_hours=1)
+    events = [
+        (BASE + 0.125, "/", 0.0421, 200, {"ref": "a"}),
+        (BASE + 59.999, "/about", 1.5, 404, None),
+        (BASE + 61.5, "/", 0.003, 500, {"ref": "b"}),
+    ]
+    for timestamp, name, response_time, status_code, extra in events:
+        store.append(timestamp, name=names.encode(name), response_time=response_time,
+                     status_code=status_code, extra=extra)
+
+    columns = store.window(1, now=BASE + 120)
+    assert isinstance(columns["timestamp"], array) and columns["timestamp"].typecode == "d"
+    assert columns["status_code"].typecode == "H"
+    assert isinstance(columns["extra"], list)
+    assert list(columns["timestamp"]) == [event[0] for event in events]
+    assert [names.decode(code) for code in columns["name"]] == [event[1] for event in events]
+    assert list(columns["response_time"]) == [event[2] for event in events]
+    assert list(columns["status_code"]) == [event[3] for event in events]
+    assert columns["extra"] == [event[4] for event in events]
+    assert names.lookup("/contact") is None and len(names) == 2
+
+
+def test_late_events_keep_the_boundary_bucket_ordered():
+    store = make_store(minutes=10)
+    # Queued records arrive after direct ones from later in the same minute
+    for second in (50, 10, 40, 20, 30):
+        store.append(BASE + second, value=second)
+
+    columns = store.window(1 / 60, now=BASE + 85)
+    assert list(columns["timestamp"]) == [BASE + 30, BASE + 40, BASE + 50]
+    assert list(columns["value"]) == [30, 40, 50]
+    assert store.count(1 / 60, now=BASE + 85) == 3
+
+
+def test_count_by_reads_only_the_window():
+    store = TimeBucketedEventStore({"kind": "b", "name": "i", "extra": None}, retention_hours=1)
+    for second, kind, name in ((0, 0, 1), (30, 0, 1), (70, 1, 2), (80, 0, 1)):
+        store.append(BASE + second, kind=kind, name=name, extra={"large": "payload"})
+
+    assert store.count_by(1, ("kind", "name"), now=BASE + 90) == {(0, 1): 3, (1, 2): 1}
+    # The boundary bucket is cut at the window start
+    assert store.count_by(1 / 60, ("kind", "name"), now=BASE + 90) == {(0, 1): 2, (1, 2): 1}
+    assert list(store.window(1, now=BASE + 90, columns=("name",))) == ["name"]
@@ -0,0 +1,59 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.core.event_store import StringDictionary
+from app.core.geo_cube import GeoCube, HOUR
+
+# Start of an hour
+BASE = 1_699_999_200.0
+LONDON = {"country": "United Kingdom", "country_code": "GB", "city": "London"}
+PARIS = {"country": "France", "country_code": "FR", "city": "Paris"}
+
+
+def by_name(cube, cells):
+    return {cube.location_name(key): cell for key, cell in cells.items()}
+
+
+def test_events_are_bucketed_by_hour():
+    cube = GeoCube(StringDictionary())
+    cube.record_page_view(BASE + 10, LONDON, "s1")
+    cube.record_page_view(BASE + HOUR - 1, LONDON, "s1")
+    cube.record_page_view(BASE + HOUR, LONDON, "s2")
+    cube.record_conversion(BASE + HOUR + 5, PARIS, "contact", "s3")
+
+    now = BASE + HOUR + 60
+    current = by_name(cube, cube.window(1, now=now))
+    assert current[("United Kingdom", "London")].page_views == 1
+    assert current[("France", "Paris")].conversions == {"contact": 1}
+
+    both = by_name(cube, cube.window(2, now=now))
+    london = both[("United Kingdom", "London")]
+    assert london.page_views == 3
+    # The same session in two hours is counted once
+    assert london.sessions.count() == 2
+    assert cube.get_stats()["hours"] == 2
+    assert cube.get_stats()["cells"] == 3
+
+
+def test_hours_past_retention_are_dropped():
+    cube = GeoCube(StringDictionary(), retention_hours=2)
+    cube.record_page_view(BASE, LONDON, "s1")
+    cube.record_page_view(BASE + HOUR, LONDON, "s2")
+    assert cube.get_stats()["hours"] == 2
+
+    # A new hour expires the ones older than the retention
+    cube.record_page_view(BASE + 3 * HOUR, PARIS, "s3")
+    assert cube.get_stats()["hours"] == 2
+    now = BASE + 3 * HOUR
+    cells = by_name(cube, cube.window(10, now=now))
+    assert cells[("United Kingdom", "London")].page_views == 1
+    assert cells[("France", "Paris")].page_views == 1
+
+
+def test_window_cost_does_not_grow_with_hours():
+    cube = GeoCube(StringDictionary(), retention_hours=2)
+    cube.record_page_view(BASE, LONDON, "s1")
+    # A huge window only visits the stored hours
+    cells = by_name(cube, cube.window(10 ** 12, now=BASE + 60))
+    assert cells[("United Kingdom", "London")].page_views == 1
+    # Hours after ``now`` are not included
+    assert cube.window(1, now=BASE - HOUR) == {}
@@ -0,0 +1,116 @@
+import sys, os
+from types import SimpleNamespace
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import geoip2.errors
+import pytest
+from app.core import geoip
+from app.core.geoip import GeoIPResolver
+
+
+class FakeReader:
+    """Stands in for geoip2.database.Reader; knows the addresses in ``locations``"""
+
+    locations = {}
+    opened = []
+
+    def __init__(self, path, mode=None):
+        self.path = path
+        self.queries = 0
+        self.closed = False
+        self.locations = dict(FakeReader.locations)
+        FakeReader.opened.append(self)
+
+    def city(self, ip_address):
+        self.queries += 1
+        if ip_address not in self.locations:
+            raise geoip2.errors.AddressNotFoundError(ip_address)
+        country, city = self.locations[ip_address]
+        return SimpleNamespace(
+            country=SimpleNamespace(name=country, iso_code=country[:2].upper()),
+            city=SimpleNamespace(name=city),
+            location=SimpleNamespace(latitude=1.0, longitude=2.0, time_zone="UTC")
+        )
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_700_000_000.0]
+    monkeypatch.setattr(geoip, "time", SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    FakeReader.locations = {"1.1.1.1": ("Australia", "Sydney"), "2.2.2.2": ("France", "Paris"),
+                            "3.3.3.3": ("Germany", "Berlin")}
+    FakeReader.opened = []
+    monkeypatch.setattr(geoip.geoip2.database, "Reader", FakeReader)
+    path = tmp_path / "GeoLite2-City.mmdb"
+    path.write_bytes(b"fake")
+    return path
+
+
+def test_lookups_are_cached_until_the_ttl(database, clock):
+    resolver = GeoIPResolver(str(database), ttl=100)
+    reader = FakeReader.opened[-1]
+
+    assert resolver.lookup("1.1.1.1")["city"] == "Sydney"
+    assert resolver.lookup("1.1.1.1")["city"] == "Sydney"
+    assert reader.queries == 1 and resolver.hits == 1
+
+    clock[0] += 101
+    assert resolver.lookup("1.1.1.1")["country"] == "Australia"
+    assert reader.queries == 2 and resolver.misses == 2
+
+
+def test_unknown_addresses_are_negative_entries(database, clock):
+    resolver = GeoIPResolver(str(database), negative_ttl=10)
+    reader = FakeReader.opened[-1]
+
+    assert resolver.lookup("9.9.9.9") is None
+    assert resolver.lookup("9.9.9.9") is None
+    assert reader.queries == 1 and resolver.negative_hits == 1
+
+    clock[0] += 11
+    assert resolver.lookup("9.9.9.9") is None
+    assert reader.queries == 2
+    # Local addresses never reach the database
+    assert resolver.lookup("127.0.0.1") is None and reader.queries == 2
+
+
+def test_cache_is_bounded_by_least_recent_use(database, clock):
+    resolver = GeoIPResolver(str(database), cache_size=2)
+    reader = FakeReader.opened[-1]
+    resolver.lookup("1.1.1.1")
+    resolver.lookup("2.2.2.2")
+    resolver.lookup("1.1.1.1")
+    resolver.lookup("3.3.3.3")
+
+    assert resolver.get_stats()["cache_entries"] == 2
+    assert resolver.evictions == 1
+    queries = reader.queries
+    resolver.lookup("1.1.1.1")
+    assert reader.queries == queries
+    # 2.2.2.2 was the least recently used
+    resolver.lookup("2.2.2.2")
+    assert reader.queries == queries + 1
+
+
+def test_new_database_file_is_reloaded(database, clock):
+    resolver = GeoIPResolver(str(database), reload_interval=60)
+    first = FakeReader.opened[-1]
+    assert resolver.lookup("1.1.1.1")["city"] == "Sydney"
+
+    FakeReader.locations = {"1.1.1.1": ("Australia", "Melbourne")}
+    os.utime(database, (clock[0] + 5, clock[0] + 5))
+    # Not checked again until the reload interval has passed
+    clock[0] += 30
+    assert resolver.lookup("1.1.1.1")["city"] == "Sydney"
+
+    clock[0] += 31
+    assert resolver.lookup("1.1.1.1")["city"] == "Melbourne"
+    assert first.closed and resolver.reloads == 1
+    assert FakeReader.opened[-1] is not first
@@ -0,0 +1,44 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.core.journeys import JourneyEngine
+
+NOW = 1_699_999_200.0
+
+
+def visit(engine, pages, timestamp=NOW):
+    cursor = None
+    for page in pages:
+        cursor = engine.record_page_view(cursor, page, timestamp)
+    return cursor
+
+
+def test_paths_of_exactly_max_depth_are_not_truncated():
+    engine = JourneyEngine(max_depth=3)
+    visit(engine, [1, 2, 3])
+    visit(engine, [1, 2])
+
+    total, top = engine.top_journeys(1, NOW)
+    assert total == 2
+    assert sorted(top) == [((1, 2), 1, False), ((1, 2, 3), 1, False)]
+
+
+def test_paths_past_max_depth_are_truncated():
+    engine = JourneyEngine(max_depth=3)
+    visit(engine, [1, 2, 3])
+    visit(engine, [1, 2, 3, 4, 5])
+    visit(engine, [1, 2, 3, 6])
+
+    total, top = engine.top_journeys(1, NOW)
+    assert total == 2
+    assert sorted(top) == [((1, 2, 3), 1, False), ((1, 2, 3), 2, True)]
+
+
+def test_paths_cut_off_by_the_node_cap_are_truncated():
+    engine = JourneyEngine(max_depth=8, max_nodes=2)
+    visit(engine, [1, 2])
+    # No room for a node under (1, 2)
+    visit(engine, [1, 2, 3])
+
+    _, top = engine.top_journeys(1, NOW)
+    assert sorted(top) == [((1, 2), 1, False), ((1, 2), 1, True)]
+    assert engine.get_stats()["truncated_paths"] == 1
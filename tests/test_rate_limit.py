@@ -0,0 +1,96 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fastapi.testclient import TestClient
+from main import app
+from app.core.security import rate_limiter
+
+client = TestClient(app)
+
+def test_rate_limit_blocks_after_limit(monkeypatch):
+    monkeypatch.setenv("ENVIRONMENT", "production")
+    monkeypatch.setitem(rate_limiter.limits, "api_general", {"requests": 3, "window": 60})
+    headers = {"User-Agent": "rate-limit-test"}
+
+    remaining = []
+    for _ in range(3):
+        resp = client.get("/health", headers=headers)
+        assert resp.status_code == 200
+        assert resp.headers["X-RateLimit-Limit"] == "3"
+        remaining.append(int(resp.headers["X-RateLimit-Remaining"]))
+    assert remaining == [2, 1, 0]
+
+    resp = client.get("/health", headers=headers)
+    assert resp.status_code == 429
+    assert resp.json()["remaining_requests"] == 0
+
+    # Other clients have their own counters
+    resp = client.get("/health", headers={"User-Agent": "another-client"})
+    assert resp.status_code == 200
+
+def test_idle_clients_are_evicted():
+    from app.core.rate_limit import SlidingWindowCounter
+    limiter = SlidingWindowCounter(sweep_interval=3600)
+    for client_id in range(100):
+        assert limiter.hit(client_id, 10, 60, now=1000.0)[0]
+    assert len(limiter) == 100
+    # Still inside the previous window's overlap
+    limiter.sweep(now=1050.0)
+    assert len(limiter) == 100
+    limiter.sweep(now=1200.0)
+    assert len(limiter) == 0
+
+def test_rate_limit_headers_come_from_one_decision(monkeypatch):
+    monkeypatch.setenv("ENVIRONMENT", "production")
+    monkeypatch.setitem(rate_limiter.limits, "api_general", {"requests": 5, "window": 60})
+    checks = rate_limiter.engine.checks
+    resp = client.get("/health", headers={"User-Agent": "decision-test", "X-Forwarded-For": "203.0.113.9"})
+    assert resp.status_code == 200
+    assert resp.headers["X-RateLimit-Remaining"] == "4"
+    assert int(resp.headers["X-RateLimit-Reset"]) > 0
+    # A single counter update for the whole request
+    assert rate_limiter.engine.checks == checks + 1
+
+def test_redis_backend_shares_limits_and_falls_back():
+    import asyncio
+    import pytest
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")  # the real Lua script runs on the fake server
+    from app.core.rate_limit_redis import RedisSlidingWindowCounter
+
+    async def scenario():
+        server = fakeredis.FakeServer()
+        # Two workers talking to the same server
+        first = RedisSlidingWindowCounter(fakeredis.FakeAsyncRedis(server=server), retry_interval=30)
+        second = RedisSlidingWindowCounter(fakeredis.FakeAsyncRedis(server=server), retry_interval=30)
+        assert await first.hit(b"client", 3, 60, now=1000.0) == (True, 2, 1020)
+        assert (await second.hit(b"client", 3, 60, now=1001.0))[0]
+        assert await first.peek(b"client", 3, 60, now=1001.5) == (1, 1020)
+        assert (await first.hit(b"client", 3, 60, now=1002.0))[0]
+        assert not (await second.hit(b"client", 3, 60, now=1003.0))[0]
+        assert second.get_stats()["rejected"] == 1
+
+        # Concurrent checks share one pipelined round trip
+        round_trips = first.round_trips
+        results = await asyncio.gather(*(first.hit(f"burst-{i}".encode(), 3, 60, now=1004.0) for i in range(20)))
+        assert all(allowed for allowed, _, _ in results)
+        assert first.round_trips == round_trips + 1
+
+        server.connected = False
+        assert (await first.hit(b"client", 3, 60, now=1004.0))[0]
+        assert first.get_stats()["fallback_checks"] == 1
+        assert first.errors == 1
+        # The server is not retried until the retry interval has passed
+        server.connected = True
+        await first.hit(b"client", 3, 60, now=1005.0)
+        assert first.errors == 1 and first.get_stats()["fallback_checks"] == 2
+
+    asyncio.run(scenario())
+
+def test_redis_backend_without_package_fails_at_startup(monkeypatch):
+    import pytest
+    from app.core import security
+    monkeypatch.setenv("RATE_LIMIT_BACKEND", "redis")
+    monkeypatch.setattr(security, "redis_client", None)
+    with pytest.raises(RuntimeError):
+        security.RateLimiter()
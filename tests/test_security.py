@@ -0,0 +1,218 @@
+import sys
+import os
+import json
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fastapi.testclient import TestClient
+from main import app
+from app.routes.auth import get_current_admin
+from datetime import datetime
+from app.core.audit_store import AuditLogStore
+from app.core.security_alerts import SecurityAlertEngine
+from app.core.security import audit_logger
+
+app.dependency_overrides[get_current_admin] = lambda: {"email": "admin@example.com"}
+client = TestClient(app)
+
+def test_audit_log_stats_report_buffered_records():
+    resp = client.get("/api/security/audit-log-stats")
+    assert resp.status_code == 200
+    assert "buffered_records" in resp.json()
+
+def test_audit_store_buffers_and_rotates(tmp_path):
+    store = AuditLogStore(str(tmp_path), flush_interval=60, fsync="always", max_bytes=100, compress=True)
+    store.start()
+    try:
+        store.write_records([(1000.0 + i, json.dumps({"timestamp": datetime.utcfromtimestamp(1000 + i).isoformat(), "n": i}) + "\n")
+                            for i in range(10)])
+        assert store.pending == 10
+        assert store.flush() == 10
+        store.write_records([(1010.0, json.dumps({"timestamp": datetime.utcfromtimestamp(1010).isoformat(), "n": 10}) + "\n")])
+    finally:
+        store.stop()
+    assert store.pending == 0
+
+    segments = store.segments()
+    assert segments[0].path.endswith("1970010100-000.log.gz")
+    assert all(segment.compressed for segment in segments[:-1])
+    newest_first = [record["n"] for _, record in store.iter_records(0)]
+    assert newest_first == list(range(10, -1, -1))
+
+def test_audit_store_window_query_reads_newest_first(tmp_path):
+    store = AuditLogStore(str(tmp_path), index_interval=200)
+    start = 1_700_000_000 - 1_700_000_000 % 3600
+    records = []
+    for i in range(600):
+        timestamp = start + i * 30  # five hours
+        entry = {"timestamp": datetime.utcfromtimestamp(timestamp).isoformat(), "n": i}
+        records.append((timestamp, json.dumps(entry) + "\n"))
+    store.write_records(records)
+    assert len(store.segments()) == 5
+
+    since = start + 4 * 3600 + 600
+    found = [record["n"] for _, record in store.iter_records(since)]
+    assert found == list(range(599, 499, -1))
+    # The index lets the read start past most of the last hour
+    assert store.segments()[-1].start_offset(since) > 0
+
+def test_alert_engine_flags_ips_incrementally():
+    engine = SecurityAlertEngine(window_hours=2)
+    now = time.time()
+    def event(ip, event_type="api_access", status_code=200, user_agent="ua"):
+        return {"user_ip": ip, "event_type": event_type, "status_code": status_code, "user_agent": user_agent}
+
+    for i in range(60):
+        engine.record(now, event("10.0.0.1"))
+    for i in range(6):
+        engine.record(now, event("10.0.0.2", "admin_login", 401))
+    for i in range(4):
+        engine.record(now, event("10.0.0.3", user_agent=f"agent-{i}"))
+    engine.record(now, event("10.0.0.4", "rate_limit_exceeded", 429))
+    engine.record(now, event("10.0.0.5"))
+    # Outside the window
+    for i in range(60):
+        engine.record(now - 3 * 3600, event("10.0.0.6"))
+
+    found = {(item["type"], item["ip"]) for item in engine.get_suspicious_activity(2)}
+    assert found == {("high_activity", "10.0.0.1"), ("failed_logins", "10.0.0.2"),
+                     ("multiple_user_agents", "10.0.0.3"), ("rate_limit_violations", "10.0.0.4")}
+    assert engine.get_stats()["flagged_ips"] == 4
+    high = [item for item in engine.get_suspicious_activity(2) if item["type"] == "high_activity"][0]
+    assert high["count"] == 60 and len(high["events"]) == 5
+
+    # Wider windows merge the hourly buckets
+    assert {"type": "high_activity", "ip": "10.0.0.6", "count": 60,
+            "description": "High activity detected from IP 10.0.0.6: 60 requests"} in engine.get_alerts(4)
+    assert {alert["type"] for alert in engine.get_alerts(2)} == {"high_activity", "rate_limit_violations"}
+
+def test_user_agents_are_counted_once_across_the_window():
+    engine = SecurityAlertEngine(window_hours=24)
+    now = time.time()
+    def event(ip, user_agent):
+        return {"user_ip": ip, "event_type": "api_access", "status_code": 200, "user_agent": user_agent}
+
+    # One agent every hour is still one agent
+    for hour in range(6):
+        engine.record(now - hour * 3600, event("10.0.1.1", "same-agent"))
+    # Four agents in four different hours are four agents
+    for hour in range(4):
+        engine.record(now - hour * 3600, event("10.0.1.2", f"agent-{hour}"))
+
+    for hours in (24, 6):
+        found = {(item["type"], item["ip"]) for item in engine.get_suspicious_activity(hours)}
+        assert found == {("multiple_user_agents", "10.0.1.2")}
+    assert engine.get_stats()["flagged_ips"] == 1
+
+    # Once the oldest hours leave the window only two agents remain
+    engine._advance(int(now // 3600) + 22)
+    assert engine.get_stats()["flagged_ips"] == 0
+
+def test_security_endpoints_share_one_summary():
+    before = client.get("/api/security/audit-log-stats").json()["summary_cache"]
+    for path in ("activity-summary?hours=3", "rate-limit-stats?hours=3", "activity-summary?hours=3"):
+        assert client.get(f"/api/security/{path}").status_code == 200
+    after = client.get("/api/security/audit-log-stats").json()["summary_cache"]
+    assert after["misses"] - before["misses"] <= 1
+    assert after["hits"] - before["hits"] >= 2
+
+    # Alerts come from the alert engine without building a summary
+    for path in ("security-alerts?hours=5", "suspicious-activity?hours=5"):
+        assert client.get(f"/api/security/{path}").status_code == 200
+    assert client.get("/api/security/audit-log-stats").json()["summary_cache"]["misses"] == after["misses"]
+
+def test_audit_logs_paginate_with_cursor_and_stream(tmp_path, monkeypatch):
+    monkeypatch.setattr(audit_logger, "store", AuditLogStore(str(tmp_path)))
+    ip = "203.0.113.77"
+    for i in range(5):
+        audit_logger.log_event("api_access", ip, "pytest", f"/api/projects/{i}", "GET", 200 if i % 2 else 404)
+    audit_logger.log_event("api_access", ip, "pytest", "/api/contact", "POST", 200)
+
+    params = {"hours": 1, "ip": ip, "endpoint_prefix": "/api/projects", "limit": 2, "fields": "endpoint,status_code"}
+    pages = []
+    cursor = None
+    while True:
+        resp = client.get("/api/security/audit-logs", params={**params, **({"cursor": cursor} if cursor else {})})
+        assert resp.status_code == 200
+        body = resp.json()
+        pages.append(body["events"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert [event["endpoint"] for page in pages for event in page] == [f"/api/projects/{i}" for i in range(4, -1, -1)]
+    assert set(pages[0][0]) == {"endpoint", "status_code"}
+
+    resp = client.get("/api/security/audit-logs", params={"hours": 1, "ip": ip, "status_min": 400, "format": "ndjson",
+                                                          "fields": "endpoint,cursor"})
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    assert [line["endpoint"] for line in lines] == ["/api/projects/4", "/api/projects/2", "/api/projects/0"]
+    assert all(line["cursor"] for line in lines)
+
+    assert client.get("/api/security/audit-logs", params={"fields": "password"}).status_code == 400
+
+def test_security_middleware_streams_without_buffering(monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.responses import StreamingResponse
+    from app.middleware import security_middleware
+
+    records = []
+    monkeypatch.setattr(security_middleware, "process_request_records", records.extend)
+    streaming_app = FastAPI()
+    streaming_app.add_middleware(security_middleware.SecurityMiddleware)
+
+    @streaming_app.get("/stream")
+    def stream():
+        return StreamingResponse((b"x" * 1000 for _ in range(5)), media_type="application/octet-stream")
+
+    resp = TestClient(streaming_app).get("/stream")
+    assert resp.status_code == 200
+    assert len(resp.content) == 5000
+    assert resp.headers["X-Content-Type-Options"] == "nosniff"
+    assert "X-RateLimit-Remaining" in resp.headers
+    assert records[0]["audit"]["response_data"] == {"status_code": 200, "content_length": 5000}
+
+def test_route_classifier_matches_rule_order():
+    from app.core.route_classifier import RouteClassifier
+    classifier = RouteClassifier()
+
+    assert classifier.lookup("POST", "/api/reviews/admin/3").rate_limit_key == "review_create"
+    assert classifier.lookup("GET", "/api/reviews/admin/3").rate_limit_key == "admin_dashboard"
+    assert classifier.lookup("GET", "/api/analytics/summary").rate_limit_key == "admin_analytics"
+    assert classifier.lookup("GET", "/api/unknown").rate_limit_key == "api_general"
+    assert classifier.lookup("DELETE", "/api/admin/users").admin_action
+
+    login = classifier.lookup("POST", "/api/auth/login")
+    assert (login.rate_limit_key, login.audit_event_type(401)) == ("admin_login", "admin_login")
+    other = classifier.lookup("GET", "/api/projects/1")
+    assert (other.audit_event_type(200), other.audit_event_type(404)) == ("api_request", "error")
+
+    conversion = classifier.lookup("POST", "/api/analytics/track/conversion")
+    assert conversion.user_action and conversion.action == "conversion_tracked"
+    assert conversion.rate_limit_key == "api_general"
+    assert classifier.lookup("GET", "/about").frontend_route
+    assert not classifier.lookup("GET", "/admin").frontend_route
+
+    # Descriptors are shared and frozen
+    assert classifier.lookup("GET", "/api/projects/1") is classifier.lookup("GET", "/api/projects/2")
+    try:
+        other.rate_limit_key = "api_general"
+        assert False, "descriptor was modified"
+    except AttributeError:
+        pass
+
+def test_audit_events_survive_a_full_ingestion_queue(monkeypatch):
+    from app.middleware import security_middleware
+
+    class FullQueue:
+        running = True
+
+        def submit(self, record, kind="request"):
+            return False
+
+    logged = []
+    monkeypatch.setattr(security_middleware, "ingestion_queue", FullQueue())
+    monkeypatch.setattr(security_middleware, "process_request_records", lambda records: logged.append("analytics"))
+    monkeypatch.setattr(audit_logger, "log_events", logged.extend)
+
+    assert client.get("/health").status_code == 200
+    assert [event["endpoint"] for event in logged] == ["/health"]
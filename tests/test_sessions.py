@@ -0,0 +1,79 @@
+import sys, os, time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.core.sessions import SessionStore
+
+BASE = 1_700_000_040.0
+
+
+def test_idle_sessions_are_evicted():
+    store = SessionStore(idle_timeout=60, max_sessions=100)
+    store.record_page_view("old", BASE, "1.1.1.1", None)
+    store.record_page_view("recent", BASE + 30, "1.1.1.2", None)
+
+    # "recent" is 60s idle at this point, not past the timeout
+    store.record_page_view("new", BASE + 90, "1.1.1.3", None)
+    assert store.get("old") is None
+    assert store.get("recent") is not None
+    assert len(store) == 2
+    assert store.evicted_idle == 1
+
+
+def test_activity_keeps_a_session_alive():
+    store = SessionStore(idle_timeout=60, max_sessions=100)
+    store.record_page_view("a", BASE, "1.1.1.1", None)
+    store.record_page_view("b", BASE + 10, "1.1.1.2", None)
+    store.record_page_view("a", BASE + 50, "1.1.1.1", None)
+
+    store.record_page_view("c", BASE + 100, "1.1.1.3", None)
+    assert store.get("b") is None
+    assert store.get("a").page_count == 2
+    assert store.get("a").duration == 50
+
+
+def test_max_sessions_evicts_least_recently_seen():
+    store = SessionStore(idle_timeout=3600, max_sessions=3)
+    for i, session_id in enumerate(("a", "b", "c")):
+        store.record_page_view(session_id, BASE + i, "1.1.1.1", None)
+    store.record_page_view("a", BASE + 3, "1.1.1.1", None)
+    store.record_page_view("d", BASE + 4, "1.1.1.1", None)
+
+    assert len(store) == 3
+    assert store.get("b") is None
+    assert {"a", "c", "d"} == {session_id for session_id in "abcd" if store.get(session_id)}
+    assert store.evicted_overflow == 1
+
+
+def test_eviction_keeps_window_totals():
+    store = SessionStore(idle_timeout=60, max_sessions=1)
+    store.record_page_view("a", BASE, "1.1.1.1", None)
+    store.record_page_view("a", BASE + 20, "1.1.1.1", None)
+    store.record_page_view("b", BASE + 30, "1.1.1.2", None)
+
+    summary = store.get_window_summary(1, now=BASE + 60)
+    assert store.get("a") is None
+    assert summary["total_sessions"] == 2
+    assert summary["avg_pages_per_session"] == 1.5
+    assert summary["bounce_rate"] == 50.0
+    assert store.active_count(60, now=BASE + 60) == 1
+
+
+def test_overflow_eviction_takes_back_active_sessions():
+    from app.core.realtime import RealTimeCounters
+    realtime = RealTimeCounters(window=3600, session_window=3600)
+    store = SessionStore(idle_timeout=3600, max_sessions=2, on_activity=realtime.record_session_seen,
+                         on_overflow=realtime.record_session_evicted)
+    now = int(time.time())
+    for i in range(10):
+        # Three ids cycling through a store with room for two
+        store.record_page_view(("a", "b", "c")[i % 3], now - 10 + i, "1.1.1.1", None)
+
+    assert store.evicted_overflow == 8
+    # Each returning id was counted as new, so the evictions must be taken back
+    assert realtime.snapshot(now=now)["active_sessions"] == len(store) == 2
+
+
+def test_window_summary_is_clamped_to_retention():
+    store = SessionStore(retention_hours=1)
+    store.record_page_view("a", BASE, "1.1.1.1", None)
+    summary = store.get_window_summary(10 ** 9, now=BASE + 60)
+    assert summary["total_sessions"] == 1
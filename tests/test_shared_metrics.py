@@ -0,0 +1,97 @@
+import sys, os, time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.core.shared_metrics import SharedMetricsStore
+from app.core.route_classifier import normalize_page
+
+
+def test_totals_aggregate_across_instances(tmp_path):
+    path = str(tmp_path / "shared.db")
+    first = SharedMetricsStore(path)
+    second = SharedMetricsStore(path)
+    now = time.time()
+
+    first.add("page_view:/", now)
+    first.add("page_view:/about", now)
+    second.add("page_view:/", now, 2)
+    second.add("request:/health", now)
+    first.touch_session("a", now)
+    second.touch_session("a", now)
+    second.touch_session("b", now)
+    first.flush()
+    second.flush()
+
+    for store in (first, second):
+        assert store.totals(300, "page_view:", now=now) == {"page_view:/": 3, "page_view:/about": 1}
+        assert store.totals(300, now=now)["request:/health"] == 1
+        assert store.active_sessions(now=now) == 2
+
+
+def test_reads_include_unflushed_deltas_without_writing(tmp_path):
+    path = str(tmp_path / "shared.db")
+    store = SharedMetricsStore(path)
+    other = SharedMetricsStore(path)
+    now = time.time()
+
+    other.add("conversion:contact", now)
+    other.touch_session("a", now)
+    other.flush()
+    store.add("conversion:contact", now)
+    store.touch_session("a", now)
+    store.touch_session("b", now)
+
+    assert store.totals(300, "conversion:", now=now) == {"conversion:contact": 2}
+    assert store.active_sessions(now=now) == 2
+    # Other workers only see what has been published
+    assert other.totals(300, "conversion:", now=now) == {"conversion:contact": 1}
+    assert store.flushes == 0
+
+
+def test_prune_drops_minutes_past_retention(tmp_path):
+    store = SharedMetricsStore(str(tmp_path / "shared.db"), retention_hours=1, session_window=60)
+    now = time.time()
+    store.add("page_view:/", now - 2 * 3600)
+    store.add("page_view:/", now)
+    store.touch_session("stale", now - 120)
+    store.touch_session("live", now)
+    store.flush()
+
+    store.add("page_view:/", now)
+    store._next_prune = 0
+    store.flush()
+
+    rows = store._connection.execute("SELECT COUNT(*) FROM counter_deltas").fetchone()[0]
+    assert rows == 1
+    assert store.totals(3 * 3600, "page_view:", now=now) == {"page_view:/": 2}
+    assert store.active_sessions(3600, now=now) == 1
+
+
+def test_stop_publishes_pending_deltas(tmp_path):
+    path = str(tmp_path / "shared.db")
+    store = SharedMetricsStore(path, flush_interval=60)
+    other = SharedMetricsStore(path)
+    store.start()
+    now = time.time()
+    store.add("action:download", now)
+    store.touch_session("a", now)
+    assert other.totals(300, "action:", now=now) == {}
+
+    store.stop()
+    assert not store.running
+    assert other.totals(300, "action:", now=now) == {"action:download": 1}
+    assert other.active_sessions(now=now) == 1
+
+
+def test_distinct_names_are_capped(tmp_path):
+    store = SharedMetricsStore(str(tmp_path / "shared.db"), max_names=2)
+    now = time.time()
+    for page in ("/a", "/b", "/c", "/d"):
+        store.add("page_view:" + page, now)
+
+    assert store.totals(300, "page_view:", now=now) == {"page_view:/a": 1, "page_view:/b": 1, "page_view:other": 2}
+    assert store.get_stats()["overflowed_names"] == 2
+
+
+def test_page_names_are_normalized():
+    assert normalize_page("/projects/42?ref=home#top") == "/projects/{id}"
+    assert normalize_page("/reviews/3f2b6c1e-8a4d-4e7b-9c1a-2d3e4f5a6b7c") == "/reviews/{id}"
+    assert normalize_page("/about") == "/about"
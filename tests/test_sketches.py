@@ -0,0 +1,95 @@
+import sys, os, random
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.core.sketches import LatencyHistogram, HyperLogLog
+
+
+def exact_quantile(values, q):
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+def test_histogram_quantiles_within_relative_error():
+    rng = random.Random(7)
+    # Latencies spanning four orders of magnitude
+    values = [rng.lognormvariate(-3, 1.5) for _ in range(20000)]
+    histogram = LatencyHistogram(accuracy=0.01)
+    for value in values:
+        histogram.add(value)
+
+    for q in (0.01, 0.25, 0.5, 0.9, 0.99, 0.999):
+        expected = exact_quantile(values, q)
+        assert abs(histogram.quantile(q) - expected) <= 0.01 * expected
+    assert histogram.quantile(0) == min(values)
+    assert histogram.quantile(1) == max(values)
+    assert histogram.count == len(values)
+
+
+def test_merged_histograms_keep_the_error_bound():
+    rng = random.Random(11)
+    first_values = [rng.uniform(0.001, 0.05) for _ in range(5000)]
+    second_values = [rng.uniform(0.2, 2.0) for _ in range(5000)]
+    first, second = LatencyHistogram(), LatencyHistogram()
+    for value in first_values:
+        first.add(value)
+    for value in second_values:
+        second.add(value)
+    first.merge(second)
+
+    values = first_values + second_values
+    for q in (0.1, 0.5, 0.75, 0.99):
+        expected = exact_quantile(values, q)
+        assert abs(first.quantile(q) - expected) <= 0.01 * expected
+    restored = LatencyHistogram.from_dict(first.to_dict())
+    assert restored.quantiles((0.5, 0.99)) == first.quantiles((0.5, 0.99))
+
+
+def test_histogram_bucket_cap():
+    histogram = LatencyHistogram(accuracy=0.01, max_buckets=64)
+    values = [i / 1000 for i in range(1, 10000)]
+    for value in values:
+        histogram.add(value)
+    assert len(histogram.buckets) <= 64
+    # Collapsing folds the lowest buckets, so high quantiles stay accurate
+    expected = exact_quantile(values, 0.99)
+    assert abs(histogram.quantile(0.99) - expected) <= 0.01 * expected
+    assert LatencyHistogram().quantile(0.5) is None
+
+
+def test_hyperloglog_counts_in_sparse_and_dense_modes():
+    small = HyperLogLog(precision=12)
+    for i in range(50):
+        small.add(f"session-{i}")
+    # 4096 registers stay sparse until 64 are touched
+    assert small.sparse is not None
+    assert abs(small.count() - 50) <= 2
+
+    large = HyperLogLog(precision=12)
+    for i in range(100000):
+        large.add(f"session-{i}")
+    assert large.sparse is None
+    # Standard error is about 1.6% at this precision; allow three of them
+    assert abs(large.count() - 100000) <= 0.05 * 100000
+
+
+def test_hyperloglog_merge_matches_the_union():
+    sparse, dense, overlap = HyperLogLog(10), HyperLogLog(10), HyperLogLog(10)
+    for i in range(10):
+        sparse.add(f"a-{i}")
+    for i in range(5000):
+        dense.add(f"b-{i}")
+    for i in range(5):
+        overlap.add(f"a-{i}")
+
+    # Sparse into sparse stays sparse
+    sparse.merge(overlap)
+    assert sparse.sparse is not None and abs(sparse.count() - 10) <= 1
+    # Dense into sparse densifies
+    union = HyperLogLog(10)
+    union.merge(sparse)
+    union.merge(dense)
+    assert union.sparse is None
+    assert abs(union.count() - 5010) <= 0.1 * 5010
+    # Sparse into dense
+    dense.merge(sparse)
+    assert dense.count() == union.count()
+    assert HyperLogLog.from_bytes(union.to_bytes()).count() == union.count()